@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+bench_importtime.py – custo de import dos pontos de entrada (servidor e Streamlit).
+
+Para cada módulo o script executa ``python -X importtime -c "import <módulo>"``
+em um processo novo (várias vezes, usando a mediana) e mostra o tempo total
+de import e os módulos de primeiro nível mais caros.
+
+Também serve de guarda contra regressões: LangChain, LangGraph e o cliente
+da OpenAI devem ser importados sob demanda pelo servidor, e o app Streamlit
+não deve importar gRPC, DuckDB nem LangChain ao carregar. Se algum desses
+módulos aparecer no import, ou se o tempo passar de ``--budget``, o script
+termina com código 1 (código 2 se o import falhar).
+
+Uso:
+    python src/bench/bench_importtime.py
+    python src/bench/bench_importtime.py --modules server --runs 10 --budget server=1500
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+CHAT_DIR = Path(__file__).resolve().parents[1] / "chat"
+
+# Dependências que cada ponto de entrada só pode importar sob demanda.
+LAZY_MODULES = {
+    "server": ("langchain_core", "langchain_openai", "langgraph", "openai"),
+    "main": ("grpc", "duckdb", "langchain_core", "langgraph"),
+}
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)$")
+
+
+def measure(module: str) -> tuple[float, dict[str, float], set[str]]:
+    """Importa ``module`` em um processo novo.
+
+    Returns:
+        Tempo total (ms), tempo cumulativo dos imports de primeiro nível (ms) e módulos importados.
+    """
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(CHAT_DIR), env.get("PYTHONPATH")]))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=CHAT_DIR, env=env, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "falhou")
+    # Cada import aparece depois dos que ele disparou; os de primeiro nível do
+    # módulo são as linhas com um nível a mais logo antes da linha dele.
+    total, children, pending, imported = 0.0, {}, {}, set()
+    for line in process.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        imported.add(name)
+        if len(indent) == 3:
+            pending[name] = int(cumulative) / 1000
+        elif len(indent) == 1:
+            if name == module:
+                total, children = int(cumulative) / 1000, pending
+            pending = {}
+    return total, children, imported
+
+
+def forbidden_imports(module: str, imported: set[str]) -> list[str]:
+    lazy = LAZY_MODULES.get(module, ())
+    return sorted({name.split(".")[0] for name in imported if name.split(".")[0] in lazy})
+
+
+def parse_budgets(values: list[str]) -> dict[str, float]:
+    budgets = {}
+    for value in values:
+        module, _, ms = value.partition("=")
+        budgets[module] = float(ms)
+    return budgets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["server", "main"], help="Módulos de src/chat a medir.")
+    parser.add_argument("--runs", type=int, default=5, help="Imports por módulo (usa a mediana).")
+    parser.add_argument("--top", type=int, default=8, help="Imports de primeiro nível listados por módulo.")
+    parser.add_argument(
+        "--budget", nargs="*", default=[], metavar="MÓDULO=MS",
+        help="Tempo máximo de import, em ms (ex.: server=1500).",
+    )
+    args = parser.parse_args()
+    budgets = parse_budgets(args.budget)
+
+    status = 0
+    for module in args.modules:
+        try:
+            runs = [measure(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{module}: import falhou: {e}")
+            status = max(status, 2)
+            continue
+        total = statistics.median(run[0] for run in runs)
+        _, children, imported = runs[-1]
+        print(f"{module}: {total:.0f} ms (mediana de {args.runs}), {len(imported)} módulos")
+        for name, ms in sorted(children.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {ms:>8.1f} ms  {name}")
+        forbidden = forbidden_imports(module, imported)
+        if forbidden:
+            print(f"  REGRESSÃO: {module} importa no carregamento: {', '.join(forbidden)}")
+            status = max(status, 1)
+        if module in budgets and total > budgets[module]:
+            print(f"  REGRESSÃO: {total:.0f} ms acima do limite de {budgets[module]:.0f} ms")
+            status = max(status, 1)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+bench_load.py – teste de carga ponta a ponta das perguntas, com LLM simulado.
+
+Inicia ``stub_llm_server.py`` (o servidor real com o LLM trocado por um
+modelo local determinístico, com latência configurável) e envia perguntas de
+um corpus. O corpus padrão tem ~190 perguntas com as SQLs que o modelo
+simulado devolve; ``--corpus`` aceita um JSONL ``{"question", "sql"}``. As
+perguntas são sorteadas com popularidade de Zipf (``--zipf``), como em
+produção, então parte delas é respondida pelos caches. Nada sai da máquina.
+
+Dois modos de carga:
+
+- fechado (padrão): ``--concurrency`` perguntas em andamento o tempo todo;
+  mede a vazão máxima;
+- aberto (``--rate``): chegadas de Poisson na taxa dada, limitadas a
+  ``--concurrency`` em andamento. A latência conta a partir da chegada
+  prevista, então o tempo esperando vaga entra na medida.
+
+Com ``--rpc stream`` (padrão) a pergunta vai pelo ``AskQuestionStream`` e os
+eventos de etapa dão a duração de cada nó do grafo; o erro de uma pergunta é
+atribuído à etapa que falhou (``execute_query`` quando a consulta falha, ou a
+etapa seguinte à última concluída). Com ``--rpc ask`` só há a latência total.
+O relatório traz vazão, p50/p95/p99 e taxa de erros no total e por etapa;
+``--json`` grava o resumo para comparar execuções.
+
+Uso (no diretório onde está o dados_empresas.duckdb):
+    python src/bench/bench_load.py --requests 2000 --concurrency 32
+    python src/bench/bench_load.py --rate 20 --requests 1200 --llm-latency 1.0 --workers 2 --json carga.json
+    python src/bench/bench_load.py --external --address servidor:50051 --rate 5 --requests 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import grpc
+from grpc import aio
+
+BENCH_DIR = Path(__file__).resolve().parent
+CHAT_DIR = BENCH_DIR.parent / "chat"
+sys.path.insert(0, str(CHAT_DIR))
+
+import genai_pb2  # noqa: E402
+import genai_pb2_grpc  # noqa: E402
+from bench_workers import stop_server, wait_ready  # noqa: E402
+from question_corpus import load_corpus, sample_questions  # noqa: E402
+
+Event = genai_pb2.AnswerEvent
+
+PERCENTILES = (50, 95, 99)
+# Etapas do grafo na ordem de execução; a seguinte à última concluída é a que falhou.
+STAGE_ORDER = [
+    "cnpj_lookup", "search_engineer", "sql_cache", "sql_writer", "execute_query",
+    "render_answer", "interpret_results", "human_intervention",
+]
+NEXT_STAGE = {
+    "": "search_engineer",
+    "search_engineer": "sql_cache",
+    "sql_cache": "sql_writer",
+    "sql_writer": "execute_query",
+    "execute_query": "interpret_results",
+}
+SQL_CACHE_HIT = "SQL encontrada no cache."
+QUERY_ERROR_PREFIX = "Erro na consulta"
+ANSWER_ERROR_PREFIX = "Erro:"
+
+
+class Sample(NamedTuple):
+    """Resultado de uma pergunta."""
+
+    latency: float  # Da chegada prevista (ou do envio, no modo fechado) até a resposta
+    ok: bool
+    failed_stage: str  # Etapa que falhou; "rpc" para erros do gRPC
+    stages: dict  # Etapa -> duração (s)
+    first_token: Optional[float]  # Do envio até o primeiro trecho da resposta
+    send_lag: float  # Atraso do envio em relação à chegada prevista
+
+
+async def ask_stream(stub, question: str, timeout: float) -> tuple[bool, str, dict, Optional[float]]:
+    start = time.perf_counter()
+    stages, last, previous, first_token, failed = {}, "", 0.0, None, ""
+    request = genai_pb2.QuestionRequest(question=question)
+    async for event in stub.AskQuestionStream(request, timeout=timeout):
+        if event.type == Event.STAGE:
+            stages[event.stage] = event.elapsed_seconds - previous
+            previous, last = event.elapsed_seconds, event.stage
+            if event.stage == "sql_cache" and event.detail == SQL_CACHE_HIT:
+                last = "sql_writer"  # A próxima etapa é a execução
+            if event.stage == "execute_query" and event.detail.startswith(QUERY_ERROR_PREFIX):
+                failed = "execute_query"
+        elif event.type == Event.TOKEN and first_token is None:
+            first_token = time.perf_counter() - start
+        elif event.type == Event.ERROR:
+            return False, NEXT_STAGE.get(last, last), stages, first_token
+    return not failed, failed, stages, first_token
+
+
+async def ask_unary(stub, question: str, timeout: float) -> tuple[bool, str, dict, Optional[float]]:
+    response = await stub.AskQuestion(genai_pb2.QuestionRequest(question=question), timeout=timeout)
+    # O AskQuestion devolve a falha no texto da resposta, sem indicar a etapa
+    if response.answer.startswith(ANSWER_ERROR_PREFIX):
+        return False, "servidor", {}, None
+    return True, "", {}, None
+
+
+ASK = {"stream": ask_stream, "ask": ask_unary}
+
+
+async def client_loop(
+    address: str, questions: list[str], concurrency: int, rate: float, rpc: str, timeout: float, seed: int
+) -> tuple[list[Sample], float]:
+    """Envia as perguntas e retorna as amostras e a duração da medida."""
+    loop = asyncio.get_running_loop()
+    # Um canal por vaga: cada canal é uma conexão TCP, distribuída pelo kernel entre os workers.
+    channels = [aio.insecure_channel(address) for _ in range(concurrency)]
+    stubs = [genai_pb2_grpc.GenAiServiceStub(channel) for channel in channels]
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, pending = [], set()
+    rng = random.Random(seed)
+
+    async def one(index: int, question: str, due: Optional[float]) -> None:
+        if due is not None:
+            await semaphore.acquire()
+        try:
+            sent = loop.time()
+            try:
+                ok, failed, stages, first_token = await ASK[rpc](stubs[index % len(stubs)], question, timeout)
+            except grpc.RpcError:
+                ok, failed, stages, first_token = False, "rpc", {}, None
+            begin = due if due is not None else sent
+            samples.append(Sample(loop.time() - begin, ok, failed, stages, first_token, sent - begin))
+        finally:
+            semaphore.release()
+
+    start = due = loop.time()
+    try:
+        for index, question in enumerate(questions):
+            if rate > 0:
+                due += rng.expovariate(rate)
+                await asyncio.sleep(max(0.0, due - loop.time()))
+                task = asyncio.create_task(one(index, question, due))
+            else:
+                await semaphore.acquire()
+                task = asyncio.create_task(one(index, question, None))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.gather(*pending)
+        return samples, loop.time() - start
+    finally:
+        for channel in channels:
+            await channel.close()
+
+
+def client_process(address, questions, concurrency, rate, rpc, timeout, seed, results):
+    results.put(asyncio.run(client_loop(address, questions, concurrency, rate, rpc, timeout, seed)))
+
+
+def run_clients(args, questions: list[str], rate: float) -> tuple[list[Sample], float]:
+    """Divide as perguntas, a taxa e a concorrência entre ``--clients`` processos."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    clients = max(1, min(args.clients, len(questions)))
+    concurrency = max(1, args.concurrency // clients)
+    processes = [
+        context.Process(target=client_process, args=(
+            args.address, questions[i::clients], concurrency, rate / clients, args.rpc, args.timeout,
+            args.seed + i, results,
+        ))
+        for i in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    samples, elapsed = [], 0.0
+    for _ in processes:
+        part, seconds = results.get()
+        samples.extend(part)
+        elapsed = max(elapsed, seconds)
+    for process in processes:
+        process.join()
+    return samples, elapsed
+
+
+def start_server(args) -> subprocess.Popen:
+    command = [
+        sys.executable, str(BENCH_DIR / "stub_llm_server.py"),
+        "--llm-latency", str(args.llm_latency), "--llm-token-latency", str(args.llm_token_latency),
+        "--llm-jitter", str(args.llm_jitter), "--llm-error-rate", str(args.llm_error_rate),
+        "--workers", str(args.workers),
+    ]
+    if args.corpus:
+        command += ["--corpus", args.corpus]
+    # Sem chave da API: qualquer chamada que escapasse do modelo simulado falharia em vez de sair da máquina
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    log = open(args.server_log, "ab") if args.server_log else subprocess.DEVNULL
+    return subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    values = sorted(values)
+    if not values:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": values[min(len(values) - 1, int(len(values) * p / 100))] for p in PERCENTILES}
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict:
+    """Vazão, latências e erros no total e por etapa."""
+    errors = sum(not sample.ok for sample in samples)
+    stages = {}
+    names = {name for sample in samples for name in sample.stages} | {s.failed_stage for s in samples if s.failed_stage}
+    for name in sorted(names, key=lambda n: (STAGE_ORDER.index(n) if n in STAGE_ORDER else len(STAGE_ORDER), n)):
+        durations = [sample.stages[name] for sample in samples if name in sample.stages]
+        failed = sum(sample.failed_stage == name for sample in samples)
+        # Uma etapa que falha com evento de erro não aparece nas durações
+        attempts = len(durations) + sum(s.failed_stage == name and name not in s.stages for s in samples)
+        stages[name] = {
+            "count": len(durations), "errors": failed,
+            "error_rate": failed / attempts if attempts else 0.0, **percentiles(durations),
+        }
+    return {
+        "requests": len(samples),
+        "seconds": elapsed,
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "latency": percentiles([sample.latency for sample in samples]),
+        "first_token": percentiles([s.first_token for s in samples if s.first_token is not None]),
+        "send_lag": percentiles([sample.send_lag for sample in samples]),
+        "stages": stages,
+    }
+
+
+def print_summary(summary: dict, rate: float) -> None:
+    def ms(values: dict) -> str:
+        return "  ".join(f"{key} {value * 1000:>8.1f}" for key, value in values.items())
+
+    print(
+        f"{summary['requests']} perguntas em {summary['seconds']:.1f}s: {summary['throughput']:.1f} req/s, "
+        f"{summary['errors']} erros ({summary['error_rate']:.2%})"
+    )
+    print(f"  latência (ms)         {ms(summary['latency'])}")
+    if any(summary["first_token"].values()):
+        print(f"  primeiro trecho (ms)  {ms(summary['first_token'])}")
+    if rate > 0:
+        print(f"  atraso de envio (ms)  {ms(summary['send_lag'])}")
+        if summary["send_lag"]["p99"] > 0.05:
+            print("  AVISO: o cliente não acompanhou a taxa pedida; aumente --clients ou --concurrency.")
+    if summary["stages"]:
+        print(f"\n  {'etapa':<18} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>6} {'taxa':>7}")
+        for name, stage in summary["stages"].items():
+            print(
+                f"  {name:<18} {stage['count']:>7} {stage['p50'] * 1000:>9.1f} {stage['p95'] * 1000:>9.1f} "
+                f"{stage['p99'] * 1000:>9.1f} {stage['errors']:>6} {stage['error_rate']:>7.2%}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="Perguntas na medida.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Perguntas em andamento (somando os clientes).")
+    parser.add_argument("--rate", type=float, default=0.0, help="Chegadas por segundo (0: modo fechado).")
+    parser.add_argument("--warmup-requests", type=int, default=None, help="Perguntas descartadas antes da medida (padrão: 2x a concorrência).")
+    parser.add_argument("--clients", type=int, default=1, help="Processos clientes.")
+    parser.add_argument("--rpc", choices=sorted(ASK), default="stream", help="AskQuestionStream (com etapas) ou AskQuestion.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Prazo de cada pergunta (s).")
+    parser.add_argument("--corpus", help="Corpus JSONL {\"question\", \"sql\"} (padrão: corpus embutido).")
+    parser.add_argument("--zipf", type=float, default=1.0, help="Expoente da popularidade das perguntas (0: uniforme).")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do sorteio de perguntas e chegadas.")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do servidor iniciado.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Latência de cada chamada ao LLM simulado (s).")
+    parser.add_argument("--llm-token-latency", type=float, default=0.02, help="Intervalo entre trechos no streaming (s).")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Variação relativa da latência do LLM.")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fração das chamadas ao LLM que falham.")
+    parser.add_argument("--external", action="store_true", help="Usa o servidor já em execução em --address.")
+    parser.add_argument("--address", default="localhost:50051", help="Endereço do servidor.")
+    parser.add_argument("--server-log", help="Arquivo para a saída do servidor iniciado.")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Espera máxima pelo servidor (s).")
+    parser.add_argument("--json", help="Grava o resumo (e a configuração) neste arquivo.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    warmup_requests = args.concurrency * 2 if args.warmup_requests is None else args.warmup_requests
+    questions = sample_questions(corpus, warmup_requests + args.requests, args.zipf, args.seed)
+    print(
+        f"{len(corpus)} perguntas no corpus; {args.requests} enviadas "
+        f"({'%.1f/s' % args.rate if args.rate > 0 else 'modo fechado'}, até {args.concurrency} em andamento)."
+    )
+
+    server = None if args.external else start_server(args)
+    try:
+        wait_ready(args.address, args.startup_timeout)
+        if warmup_requests:
+            run_clients(args, questions[:warmup_requests], 0.0)
+        samples, elapsed = run_clients(args, questions[warmup_requests:], args.rate)
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    summary = summarize(samples, elapsed)
+    print_summary(summary, args.rate)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "summary": summary}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
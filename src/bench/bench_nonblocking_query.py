@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+bench_nonblocking_query.py – mede se requisições concorrentes ficam presas
+atrás de uma consulta longa do DuckDB.
+
+Simula N requisições curtas (espera de LLM + consulta pontual) disparadas
+enquanto uma varredura longa está em andamento, em dois modos:
+
+    bloqueante  – consulta executada direto no event loop (comportamento antigo);
+    executor    – consulta executada via DuckDBConnectionPool.run.
+
+Uso:
+    python src/bench/bench_nonblocking_query.py --requests 20 --scan-rows 30000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "chat"))
+
+from db_pool import DuckDBConnectionPool  # noqa: E402
+
+LONG_QUERY = (
+    "SELECT COUNT(*) FROM range({n}) a, range({n}) b "
+    "WHERE (a.range * 31 + b.range) % 97 = 3"
+)
+SHORT_QUERY = "SELECT 42"
+
+
+def execute(conn, sql: str):
+    return conn.execute(sql).fetchall()
+
+
+async def request(pool: DuckDBConnectionPool, blocking: bool, llm_latency: float) -> float:
+    start = time.perf_counter()
+    await asyncio.sleep(llm_latency)           # espera simulada pelo LLM
+    if blocking:
+        with pool.connection() as conn:
+            execute(conn, SHORT_QUERY)
+    else:
+        await pool.run(execute, SHORT_QUERY)
+    return time.perf_counter() - start
+
+
+async def scenario(pool: DuckDBConnectionPool, blocking: bool, args) -> tuple[float, list[float]]:
+    long_sql = LONG_QUERY.format(n=args.scan_rows)
+
+    async def long_request() -> float:
+        start = time.perf_counter()
+        if blocking:
+            with pool.connection() as conn:
+                execute(conn, long_sql)
+        else:
+            await pool.run(execute, long_sql)
+        return time.perf_counter() - start
+
+    # As requisições curtas chegam primeiro e ficam aguardando o "LLM";
+    # a varredura longa começa logo em seguida.
+    short_tasks = [
+        asyncio.create_task(request(pool, blocking, args.llm_latency))
+        for _ in range(args.requests)
+    ]
+    await asyncio.sleep(0)
+    long_time = await long_request()
+    latencies = await asyncio.gather(*short_tasks)
+    return long_time, list(latencies)
+
+
+def report(label: str, long_time: float, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"{label:<11} varredura={long_time:6.2f}s  "
+        f"curtas: p50={statistics.median(latencies) * 1000:8.1f}ms  "
+        f"p95={p95 * 1000:8.1f}ms  max={latencies[-1] * 1000:8.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Requisições curtas concorrentes.")
+    parser.add_argument("--scan-rows", type=int, default=30_000, help="Lado do produto cartesiano da varredura longa.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Espera simulada do LLM (s).")
+    parser.add_argument("--connections", type=int, default=4, help="Conexões do pool.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = DuckDBConnectionPool(os.path.join(tmp, "bench.duckdb"), max_connections=args.connections)
+        try:
+            for label, blocking in (("bloqueante", True), ("executor", False)):
+                long_time, latencies = asyncio.run(scenario(pool, blocking, args))
+                report(label, long_time, latencies)
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+bench_workers.py – vazão do servidor gRPC em função do número de workers.
+
+Para cada valor de ``--workers`` o script inicia ``src/chat/server.py
+--workers N``, aguarda o servidor responder e dispara requisições a partir
+de vários processos clientes (o próprio cliente asyncio também disputa um
+GIL). A medida começa depois que o health check do gRPC responde SERVING,
+isto é, depois do aquecimento do servidor. As perguntas citam CNPJs reais do banco e são respondidas pela
+consulta direta, sem LLM; assim a medida reflete o custo do servidor (gRPC,
+orquestração, DuckDB e montagem da resposta) e não a latência da API.
+
+Uso (no diretório onde está o dados_empresas.duckdb):
+    python src/bench/bench_workers.py --workers 1 2 4 --requests 4000 --concurrency 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import duckdb
+import grpc
+from grpc import aio
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+CHAT_DIR = Path(__file__).resolve().parents[1] / "chat"
+sys.path.insert(0, str(CHAT_DIR))
+
+import genai_pb2  # noqa: E402
+import genai_pb2_grpc  # noqa: E402
+
+
+def sample_cnpjs(db_path: str, count: int) -> list[str]:
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        rows = conn.execute(
+            f"SELECT DISTINCT CNPJ_BASICO FROM resultados_consulta USING SAMPLE {int(count)} ROWS"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+
+async def client_loop(address: str, cnpjs: list[str], requests: int, concurrency: int, rpc: str):
+    # Um canal por tarefa: cada canal é uma conexão TCP, distribuída pelo kernel entre os workers.
+    channels = [aio.insecure_channel(address) for _ in range(concurrency)]
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker(channel):
+        nonlocal errors
+        stub = genai_pb2_grpc.GenAiServiceStub(channel)
+        for i in counter:
+            cnpj = cnpjs[i % len(cnpjs)]
+            start = time.perf_counter()
+            try:
+                if rpc == "lookup":
+                    await stub.LookupCnpj(genai_pb2.CnpjRequest(cnpj=cnpj))
+                else:
+                    await stub.AskQuestion(genai_pb2.QuestionRequest(question=f"Dados do CNPJ {cnpj}"))
+                latencies.append(time.perf_counter() - start)
+            except grpc.RpcError:
+                errors += 1
+
+    try:
+        await asyncio.gather(*(worker(channel) for channel in channels))
+    finally:
+        for channel in channels:
+            await channel.close()
+    return latencies, errors
+
+
+def client_process(address, cnpjs, requests, concurrency, rpc, results):
+    results.put(asyncio.run(client_loop(address, cnpjs, requests, concurrency, rpc)))
+
+
+def run_clients(args, cnpjs: list[str], requests: int) -> tuple[float, list[float], int]:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    per_client = max(1, requests // args.clients)
+    concurrency = max(1, args.concurrency // args.clients)
+    start = time.perf_counter()
+    processes = [
+        context.Process(target=client_process, args=(args.address, cnpjs, per_client, concurrency, args.rpc, results))
+        for _ in range(args.clients)
+    ]
+    for process in processes:
+        process.start()
+    latencies, errors = [], 0
+    for _ in processes:
+        part, failed = results.get()
+        latencies.extend(part)
+        errors += failed
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return elapsed, latencies, errors
+
+
+def wait_ready(address: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    request = health_pb2.HealthCheckRequest(service="genai.GenAiService")
+    while time.monotonic() < deadline:
+        try:
+            with grpc.insecure_channel(address) as channel:
+                grpc.channel_ready_future(channel).result(timeout=1)
+                response = health_pb2_grpc.HealthStub(channel).Check(request, timeout=5)
+                if response.status == health_pb2.HealthCheckResponse.SERVING:
+                    return
+        except grpc.FutureTimeoutError:
+            continue
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.UNAVAILABLE:
+                raise
+        time.sleep(0.5)
+    raise TimeoutError(f"Servidor não ficou pronto em {timeout:.0f}s.")
+
+
+def start_server(workers: int) -> subprocess.Popen:
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench")}
+    return subprocess.Popen(
+        [sys.executable, str(CHAT_DIR / "server.py"), "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Números de workers a medir.")
+    parser.add_argument("--requests", type=int, default=4000, help="Requisições por medida.")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requisições simultâneas (somando os clientes).")
+    parser.add_argument("--clients", type=int, default=4, help="Processos clientes.")
+    parser.add_argument("--rpc", choices=("ask", "lookup"), default="ask", help="AskQuestion com CNPJ ou LookupCnpj.")
+    parser.add_argument("--db", default="dados_empresas.duckdb", help="Banco usado pelo servidor (para sortear CNPJs).")
+    parser.add_argument("--address", default="localhost:50051", help="Endereço do servidor.")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Espera máxima pelo servidor (s).")
+    args = parser.parse_args()
+
+    cnpjs = sample_cnpjs(args.db, 1000)
+    print(f"{'workers':>7}  {'req/s':>9}  {'p50 ms':>8}  {'p99 ms':>8}  {'erros':>6}")
+    for workers in args.workers:
+        server = start_server(workers)
+        try:
+            wait_ready(args.address, args.startup_timeout)
+            run_clients(args, cnpjs, args.concurrency * 4)  # aquecimento
+            elapsed, latencies, errors = run_clients(args, cnpjs, args.requests)
+        finally:
+            stop_server(server)
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+        print(
+            f"{workers:>7}  {len(latencies) / elapsed:>9.1f}  "
+            f"{(statistics.median(latencies) if latencies else 0.0) * 1000:>8.1f}  {p99 * 1000:>8.1f}  {errors:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
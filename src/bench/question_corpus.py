@@ -0,0 +1,119 @@
+# question_corpus.py
+"""
+Corpus de perguntas do teste de carga, cada uma com a SQL que o LLM simulado devolve.
+
+O corpus padrão combina modelos de pergunta com as UFs, gerando perguntas
+distintas que exercitam os caminhos do servidor: contagens respondidas pelo
+rollup, buscas por nome (índice de nomes), agregações por município e listas
+que vão para o ``interpret_results``. Um corpus próprio é um arquivo JSONL com
+``{"question": ..., "sql": ...}`` por linha (``sql`` opcional: sem ela o LLM
+simulado devolve ``FALLBACK_SQL``).
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+CHAT_DIR = Path(__file__).resolve().parents[1] / "chat"
+sys.path.insert(0, str(CHAT_DIR))
+
+from question_cache import normalize_question  # noqa: E402
+
+UFS = [
+    "SP", "MG", "RJ", "PR", "RS", "SC", "BA", "GO", "PE", "CE", "PA", "ES", "MT", "DF",
+    "MA", "MS", "PB", "RN", "AM", "AL", "PI", "SE", "RO", "TO", "AC", "AP", "RR",
+]
+
+TEMPLATES = [
+    (
+        "Quantas empresas ativas existem em {uf}?",
+        "SELECT COUNT(DISTINCT CNPJ_BASICO) AS EMPRESAS FROM resultados_consulta "
+        "WHERE UF = '{uf}' AND SITUACAO_CADASTRAL = '02'",
+    ),
+    (
+        "Quantas empresas de desenvolvimento de software existem em {uf}?",
+        "SELECT COUNT(DISTINCT CNPJ_BASICO) AS EMPRESAS FROM resultados_consulta "
+        "WHERE UF = '{uf}' AND CNAE_FISCAL_PRINCIPAL LIKE '62%'",
+    ),
+    (
+        "Qual a distribuição das empresas de {uf} por porte?",
+        "SELECT PORTE_EMPRESA, COUNT(DISTINCT CNPJ_BASICO) AS EMPRESAS FROM resultados_consulta "
+        "WHERE UF = '{uf}' GROUP BY PORTE_EMPRESA ORDER BY EMPRESAS DESC",
+    ),
+    (
+        "Quais os 10 municípios de {uf} com mais empresas?",
+        "SELECT NOME_MUNICIPIO, COUNT(DISTINCT CNPJ_BASICO) AS EMPRESAS FROM resultados_consulta "
+        "WHERE UF = '{uf}' GROUP BY NOME_MUNICIPIO ORDER BY EMPRESAS DESC LIMIT 10",
+    ),
+    (
+        "Quais empresas de {uf} têm BRASIL no nome?",
+        "SELECT DISTINCT RAZAO_SOCIAL, NOME_MUNICIPIO FROM resultados_consulta "
+        "WHERE RAZAO_SOCIAL LIKE '%BRASIL%' AND UF = '{uf}' LIMIT 20",
+    ),
+    (
+        "Quais as 20 empresas com maior capital social em {uf}?",
+        "SELECT DISTINCT RAZAO_SOCIAL, CAPITAL_SOCIAL FROM resultados_consulta "
+        "WHERE UF = '{uf}' ORDER BY CAPITAL_SOCIAL DESC LIMIT 20",
+    ),
+    (
+        "Quantas empresas de {uf} têm sócios estrangeiros?",
+        "SELECT COUNT(DISTINCT CNPJ_BASICO) AS EMPRESAS FROM resultados_consulta "
+        "WHERE UF = '{uf}' AND IDENTIFICADOR_SOCIO = '3'",
+    ),
+]
+
+FALLBACK_SQL = "SELECT COUNT(DISTINCT CNPJ_BASICO) AS EMPRESAS FROM resultados_consulta"
+
+
+class CorpusEntry(NamedTuple):
+    question: str
+    sql: str
+
+
+def default_corpus() -> list[CorpusEntry]:
+    return [
+        CorpusEntry(question.format(uf=uf), sql.format(uf=uf))
+        for question, sql in TEMPLATES
+        for uf in UFS
+    ]
+
+
+def load_corpus(path: str | None = None) -> list[CorpusEntry]:
+    """Lê o corpus JSONL em ``path`` (ou devolve o padrão)."""
+    if not path:
+        return default_corpus()
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                entries.append(CorpusEntry(item["question"], item.get("sql") or FALLBACK_SQL))
+    if not entries:
+        raise ValueError(f"Corpus vazio: {path}")
+    return entries
+
+
+def sql_lookup(corpus: list[CorpusEntry]) -> Callable[[str], str]:
+    """Função pergunta -> SQL usada pelo LLM simulado (comparando perguntas normalizadas)."""
+    by_question = {normalize_question(entry.question): entry.sql for entry in corpus}
+    return lambda question: by_question.get(normalize_question(question), FALLBACK_SQL)
+
+
+def sample_questions(corpus: list[CorpusEntry], count: int, zipf: float, seed: int) -> list[str]:
+    """Sorteia ``count`` perguntas; com ``zipf > 0`` poucas perguntas concentram o tráfego, como em produção.
+
+    Args:
+        corpus (list[CorpusEntry]): Perguntas disponíveis.
+        count (int): Perguntas sorteadas.
+        zipf (float): Expoente da popularidade (0: uniforme).
+        seed (int): Semente do sorteio (a popularidade de cada pergunta também depende dela).
+    """
+    rng = random.Random(seed)
+    questions = [entry.question for entry in corpus]
+    rng.shuffle(questions)
+    weights = [1 / rank ** zipf for rank in range(1, len(questions) + 1)]
+    return rng.choices(questions, weights=weights, k=count)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+stub_llm_server.py – servidor gRPC com um LLM simulado, para testes de carga offline.
+
+Inicia o mesmo servidor de ``src/chat/server.py`` (todos os argumentos dele
+valem aqui, como ``--workers`` e ``--checkpointer``), trocando o
+``ChatOpenAI`` do ``llm_pool`` por ``StubChatModel``: um modelo local e
+determinístico que devolve a SQL do corpus para a pergunta e uma
+interpretação fixa, com latência configurável. Nenhuma chamada sai da
+máquina e ``OPENAI_API_KEY`` não é necessária; todo o resto (grafo, caches,
+escalonador, DuckDB, fila do LLM) é o código real.
+
+Uso (no diretório onde está o dados_empresas.duckdb):
+    python src/bench/stub_llm_server.py --llm-latency 0.8 --llm-token-latency 0.02 --workers 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import zlib
+from pathlib import Path
+from typing import Callable
+
+CHAT_DIR = Path(__file__).resolve().parents[1] / "chat"
+sys.path.insert(0, str(CHAT_DIR))
+
+from question_corpus import load_corpus, sql_lookup  # noqa: E402
+
+SQL_WRITER_MARKER = "expert in DuckDB SQL"
+
+
+class StubMessage:
+    """Resposta (ou trecho) do modelo, com o ``content`` e o ``usage_metadata`` que o servidor lê."""
+
+    __slots__ = ("content", "usage_metadata")
+
+    def __init__(self, content: str, usage_metadata: dict | None = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+class StubLLMError(RuntimeError):
+    """Falha simulada do LLM (``--llm-error-rate``)."""
+
+
+class StubChatModel:
+    """Substituto determinístico do ``ChatOpenAI`` com ``ainvoke`` e ``astream``."""
+
+    def __init__(
+        self,
+        sql_for: Callable[[str], str],
+        latency: float = 0.5,
+        token_latency: float = 0.02,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        answer_tokens: int = 40,
+    ):
+        """Inicializa o modelo simulado.
+
+        Args:
+            sql_for: Devolve a SQL para a pergunta.
+            latency (float): Segundos até a resposta (ou até o primeiro trecho no streaming).
+            token_latency (float): Segundos entre trechos no streaming.
+            jitter (float): Variação relativa da latência (0.2: ±20%), fixa para cada prompt.
+            error_rate (float): Fração dos prompts que falham.
+            answer_tokens (int): Palavras da interpretação.
+        """
+        self.sql_for = sql_for
+        self.latency = latency
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.answer_tokens = answer_tokens
+
+    def _respond(self, messages) -> tuple[str, float]:
+        """Texto da resposta e latência; o mesmo prompt sempre produz o mesmo resultado."""
+        prompt = messages[-1].content
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        delay = self.latency * (1 + self.jitter * (2 * rng.random() - 1))
+        if rng.random() < self.error_rate:
+            raise StubLLMError("Falha simulada do LLM.")
+        if SQL_WRITER_MARKER in messages[0].content:
+            # A pergunta é a última linha da instrução do sql_writer
+            return self.sql_for(prompt.strip().splitlines()[-1]), delay
+        words = ["Resposta", "simulada:"] + ["dados"] * max(0, self.answer_tokens - 2)
+        return " ".join(words), delay
+
+    @staticmethod
+    def _usage(messages, text: str) -> dict:
+        # ~4 caracteres por token na entrada, uma palavra por token na saída
+        input_tokens = sum(len(message.content) for message in messages) // 4
+        output_tokens = len(text.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    async def ainvoke(self, messages, **kwargs) -> StubMessage:
+        text, delay = self._respond(messages)
+        await asyncio.sleep(delay)
+        return StubMessage(text, self._usage(messages, text))
+
+    async def astream(self, messages, **kwargs):
+        text, delay = self._respond(messages)
+        await asyncio.sleep(delay)
+        for i, word in enumerate(text.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield StubMessage(word if i == 0 else f" {word}")
+        # Como o ChatOpenAI com stream_usage: o uso vem em um último trecho vazio
+        yield StubMessage("", self._usage(messages, text))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter, add_help=False
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Latência de cada chamada ao LLM (s).")
+    parser.add_argument("--llm-token-latency", type=float, default=0.02, help="Intervalo entre trechos no streaming (s).")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Variação relativa da latência.")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fração das chamadas que falham.")
+    parser.add_argument("--corpus", help="Corpus JSONL com as SQLs devolvidas (padrão: corpus embutido).")
+    args, server_args = parser.parse_known_args()
+    if "-h" in server_args or "--help" in server_args:
+        parser.print_help()  # Em seguida o servidor mostra as opções dele
+
+    import server
+
+    server.llm_pool.model = StubChatModel(
+        sql_lookup(load_corpus(args.corpus)),
+        latency=args.llm_latency,
+        token_latency=args.llm_token_latency,
+        jitter=args.llm_jitter,
+        error_rate=args.llm_error_rate,
+    )
+    server.run_cli(server_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+synthetic_dataset.py – dump sintético dos dados abertos do CNPJ para benchmarks locais.
+
+Gera arquivos no mesmo formato do dump mensal da Receita Federal, como o
+``src/download_empresa/convert_toparquet.py`` os lê: sem cabeçalho, latin-1,
+separados por ``;``, todos os campos entre aspas, com os nomes e extensões
+originais (``*.EMPRECSV``, ``*.ESTABELE``, ``*.SOCIOCSV``, ``*.MUNICCSV``,
+``*.PAISCSV``, ``*.QUALSCSV``, ``*.NATJUCSV``, ``*.CNAECSV``). Com ``--zip``
+cada arquivo vai dentro de um zip com o nome usado no site (``Empresas0.zip``,
+``Estabelecimentos0.zip``...), como após o download.
+
+As distribuições imitam as do dump real, em vez de valores uniformes:
+
+- natureza jurídica: maioria de empresários individuais (MEI), seguidos de
+  sociedades limitadas; poucas S.A., associações e cooperativas;
+- sócios por empresa conforme a natureza: nenhum para o MEI, 1 a 3 na
+  limitada típica e cauda longa (até centenas) nas S.A.;
+- estabelecimentos por empresa: quase todas só com a matriz, algumas redes
+  com milhares de filiais;
+- UF proporcional ao número de empresas de cada estado, municípios e CNAEs
+  com distribuição de Zipf (a capital e o comércio varejista concentram);
+- situação cadastral com ~metade das empresas baixadas;
+- uma fração de linhas malformadas (``--malformed-rate``), todas com campos
+  a mais, que é o que o ``read_csv`` do conversor descarta: campo extra no
+  fim, aspas sem escape com ``;`` dentro do nome, nome sem aspas contendo
+  ``;`` e linha truncada emendada no registro seguinte. Linhas com campos a
+  menos ou quebra de linha dentro de aspas não entram na conta, pois o
+  conversor as aceita.
+
+Os códigos de municípios e países são fictícios; CNPJs têm dígitos
+verificadores válidos. Com a mesma ``--seed`` a saída é idêntica.
+
+Uso:
+    python src/bench/synthetic_dataset.py --companies 1000000 --parts 10 --out data/unzipped_files_2025_01
+    python src/bench/synthetic_dataset.py --companies 200000 --zip --out downloads/2025-01
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import io
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+CHAT_DIR = Path(__file__).resolve().parents[1] / "chat"
+sys.path.insert(0, str(CHAT_DIR))
+
+from cnpj_lookup import check_digits  # noqa: E402
+
+# =============================================================================
+# Tabelas de domínio (código, descrição, peso)
+# =============================================================================
+NATUREZAS = [
+    ("2135", "Empresário (Individual)", 55.0),
+    ("2062", "Sociedade Empresária Limitada", 30.0),
+    ("2305", "Empresa Individual de Responsabilidade Limitada (de Natureza Empresária)", 4.0),
+    ("2240", "Sociedade Simples Limitada", 2.0),
+    ("3999", "Associação Privada", 4.5),
+    ("3220", "Organização Religiosa", 1.5),
+    ("2054", "Sociedade Anônima Fechada", 0.8),
+    ("2046", "Sociedade Anônima Aberta", 0.05),
+    ("2143", "Cooperativa", 0.4),
+    ("1244", "Município", 0.1),
+    ("4014", "Empresa Individual Imobiliária", 0.5),
+    ("0000", "Natureza Jurídica não informada", 1.15),
+]
+
+QUALIFICACOES = [
+    ("00", "Não informada"),
+    ("05", "Administrador"),
+    ("10", "Diretor"),
+    ("16", "Presidente"),
+    ("22", "Sócio"),
+    ("37", "Sócio Pessoa Jurídica Domiciliado no Exterior"),
+    ("49", "Sócio-Administrador"),
+    ("50", "Empresário"),
+    ("54", "Fundador"),
+    ("65", "Titular Pessoa Física Residente ou Domiciliado no Brasil"),
+]
+
+PAISES = [
+    ("105", "BRASIL"), ("249", "ESTADOS UNIDOS"), ("607", "PORTUGAL"), ("063", "ARGENTINA"),
+    ("386", "ITALIA"), ("023", "ALEMANHA"), ("245", "ESPANHA"), ("399", "JAPAO"),
+    ("160", "CHINA"), ("767", "SUICA"),
+]
+
+# Em ordem de frequência: o peso de cada CNAE segue Zipf pela posição.
+CNAES = [
+    ("4781400", "Comércio varejista de artigos do vestuário e acessórios"),
+    ("9602501", "Cabeleireiros, manicure e pedicure"),
+    ("5611203", "Lanchonetes, casas de chá, de sucos e similares"),
+    ("4712100", "Comércio varejista de mercadorias em geral, com predominância de produtos alimentícios - minimercados, mercearias e armazéns"),
+    ("7319002", "Promoção de vendas"),
+    ("8219999", "Preparação de documentos e serviços especializados de apoio administrativo não especificados anteriormente"),
+    ("4399103", "Obras de alvenaria"),
+    ("5611201", "Restaurantes e similares"),
+    ("4930202", "Transporte rodoviário de carga, exceto produtos perigosos e mudanças, intermunicipal, interestadual e internacional"),
+    ("5620104", "Fornecimento de alimentos preparados preponderantemente para consumo domiciliar"),
+    ("4723700", "Comércio varejista de bebidas"),
+    ("9430800", "Atividades de associações de defesa de direitos sociais"),
+    ("4744099", "Comércio varejista de materiais de construção em geral"),
+    ("8599699", "Outras atividades de ensino não especificadas anteriormente"),
+    ("4520001", "Serviços de manutenção e reparação mecânica de veículos automotores"),
+    ("7020400", "Atividades de consultoria em gestão empresarial, exceto consultoria técnica específica"),
+    ("4789099", "Comércio varejista de outros produtos não especificados anteriormente"),
+    ("4321500", "Instalação e manutenção elétrica"),
+    ("9491000", "Atividades de organizações religiosas ou filosóficas"),
+    ("4771701", "Comércio varejista de produtos farmacêuticos, sem manipulação de fórmulas"),
+    ("6911701", "Serviços advocatícios"),
+    ("8630503", "Atividade médica ambulatorial restrita a consultas"),
+    ("8211300", "Serviços combinados de escritório e apoio administrativo"),
+    ("4729699", "Comércio varejista de produtos alimentícios em geral ou especializado em produtos alimentícios não especificados anteriormente"),
+    ("1412601", "Confecção de peças do vestuário, exceto roupas íntimas e as confeccionadas sob medida"),
+    ("6920601", "Atividades de contabilidade"),
+    ("4120400", "Construção de edifícios"),
+    ("6201501", "Desenvolvimento de programas de computador sob encomenda"),
+    ("6202300", "Desenvolvimento e licenciamento de programas de computador customizáveis"),
+    ("9492800", "Atividades de organizações políticas"),
+]
+
+# UF, capital e participação aproximada no número de empresas (%).
+UFS = [
+    ("SP", "SAO PAULO", 29.0), ("MG", "BELO HORIZONTE", 10.5), ("RJ", "RIO DE JANEIRO", 8.5),
+    ("PR", "CURITIBA", 6.7), ("RS", "PORTO ALEGRE", 6.5), ("SC", "FLORIANOPOLIS", 5.0),
+    ("BA", "SALVADOR", 5.0), ("GO", "GOIANIA", 3.5), ("PE", "RECIFE", 3.3),
+    ("CE", "FORTALEZA", 3.2), ("PA", "BELEM", 2.5), ("ES", "VITORIA", 2.0),
+    ("MT", "CUIABA", 2.0), ("DF", "BRASILIA", 1.8), ("MA", "SAO LUIS", 1.8),
+    ("MS", "CAMPO GRANDE", 1.4), ("PB", "JOAO PESSOA", 1.4), ("RN", "NATAL", 1.3),
+    ("AM", "MANAUS", 1.2), ("AL", "MACEIO", 1.0), ("PI", "TERESINA", 1.0),
+    ("SE", "ARACAJU", 0.8), ("RO", "PORTO VELHO", 0.8), ("TO", "PALMAS", 0.6),
+    ("AC", "RIO BRANCO", 0.3), ("AP", "MACAPA", 0.3), ("RR", "BOA VISTA", 0.3),
+]
+MUNICIPIOS_POR_UF = 60
+
+SITUACOES = [("02", "00", 45.0), ("08", "01", 45.0), ("04", "63", 8.5), ("03", "71", 0.8), ("01", "80", 0.7)]
+PORTES = [("01", 65.0), ("03", 10.0), ("05", 24.0), ("00", 1.0)]
+
+PRENOMES = (
+    "MARIA JOSE ANA JOAO ANTONIO FRANCISCA CARLOS PAULO PEDRO LUCAS LUIZ MARCOS LUIS GABRIEL RAFAEL "
+    "ADRIANA JULIANA MARCIA FERNANDA PATRICIA ALINE SANDRA CAMILA AMANDA BRUNA JESSICA LETICIA JULIA "
+    "DANIEL MARCELO BRUNO EDUARDO FELIPE RAIMUNDO RODRIGO MANOEL MATEUS ANDRE FERNANDO FABIO LEONARDO"
+).split()
+SOBRENOMES = (
+    "SILVA SANTOS OLIVEIRA SOUZA RODRIGUES FERREIRA ALVES PEREIRA LIMA GOMES COSTA RIBEIRO MARTINS "
+    "CARVALHO ALMEIDA LOPES SOARES FERNANDES VIEIRA BARBOSA ROCHA DIAS NASCIMENTO ANDRADE MOREIRA "
+    "NUNES MARQUES MACHADO MENDES FREITAS CARDOSO RAMOS GONCALVES SANTANA TEIXEIRA ARAUJO CONCEIÇÃO"
+).split()
+PALAVRAS = (
+    "COMERCIO SERVICOS TRANSPORTES ALIMENTOS CONSTRUTORA BRASIL NORTE SUL NORDESTE CENTRAL NACIONAL "
+    "DISTRIBUIDORA MATERIAIS CONSTRUÇÃO AUTO PEÇAS TECNOLOGIA SISTEMAS INFORMATICA CONSULTORIA "
+    "ENGENHARIA LOGISTICA AGROPECUARIA INDUSTRIA CONFECÇÕES MODAS BELEZA ESTETICA SAUDE CLINICA "
+    "ODONTOLOGIA EDUCAÇÃO ESCOLA IMOVEIS EMPREENDIMENTOS PARTICIPAÇÕES ADMINISTRAÇÃO EVENTOS "
+    "RESTAURANTE PADARIA MERCADO SUPERMERCADO FARMACIA DROGARIA POSTO COMBUSTIVEIS METALURGICA "
+    "MADEIRAS MOVEIS VIDROS ELETRICA HIDRAULICA SEGURANÇA LIMPEZA GRAFICA EDITORA MARKETING DIGITAL"
+).split()
+TIPOS_LOGRADOURO = ["RUA", "AVENIDA", "TRAVESSA", "ALAMEDA", "RODOVIA", "ESTRADA", "PRACA", "QUADRA"]
+BAIRROS = ["CENTRO", "JARDIM AMERICA", "VILA NOVA", "BELA VISTA", "SANTA CRUZ", "BOA VISTA", "SAO JOSE", "INDUSTRIAL"]
+
+# Layout dos arquivos: as colunas na ordem lida pelo convert_toparquet.py e a
+# posição da coluna de nome (RAZAO_SOCIAL, NOME_FANTASIA, NOME_SOCIO), a única
+# que as linhas malformadas corrompem.
+EMPRESA_FIELDS = 7
+ESTABELECIMENTO_FIELDS = 30
+SOCIO_FIELDS = 11
+EMPRESA_NAME = 1
+ESTABELECIMENTO_NAME = 4
+SOCIO_NAME = 2
+
+
+class Weighted:
+    """Sorteio com pesos por busca binária na soma acumulada."""
+
+    def __init__(self, items, weights):
+        self.items = list(items)
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def pick(self, rng: random.Random):
+        return self.items[bisect.bisect_right(self.cumulative, rng.random() * self.total)]
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> list[float]:
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def municipios() -> list[tuple[str, str, str]]:
+    """(código, nome, UF) dos municípios sintéticos: a capital e ``MUNICIPIOS_POR_UF - 1`` cidades por UF."""
+    result = []
+    for uf_index, (uf, capital, _) in enumerate(UFS):
+        for n in range(MUNICIPIOS_POR_UF):
+            code = f"{uf_index * 200 + n + 1:04d}"
+            result.append((code, capital if n == 0 else f"{capital.split()[0]} {uf} {n:02d}", uf))
+    return result
+
+
+# =============================================================================
+# Geração das linhas
+# =============================================================================
+class Generator:
+    """Gera as linhas de uma parte do dump (empresas e seus estabelecimentos e sócios)."""
+
+    def __init__(self, seed: int, malformed_rate: float):
+        self.rng = random.Random(seed)
+        self.malformed_rate = malformed_rate
+        self.natureza = Weighted([code for code, _, _ in NATUREZAS], [w for _, _, w in NATUREZAS])
+        self.uf = Weighted(range(len(UFS)), [w for _, _, w in UFS])
+        self.municipio = Weighted(range(MUNICIPIOS_POR_UF), zipf_weights(MUNICIPIOS_POR_UF))
+        self.cnae = Weighted([code for code, _ in CNAES], zipf_weights(len(CNAES), 0.9))
+        self.situacao = Weighted(SITUACOES, [w for _, _, w in SITUACOES])
+        self.porte = Weighted([code for code, _ in PORTES], [w for _, w in PORTES])
+        self.codes = [code for code, _, _ in municipios()]
+        self.malformed = 0
+
+    # --- valores -------------------------------------------------------------
+    def person(self) -> str:
+        rng = self.rng
+        return f"{rng.choice(PRENOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+
+    def company_name(self, natureza: str) -> str:
+        rng = self.rng
+        if natureza == "2135":
+            # Razão social do MEI: nome do titular seguido do CPF.
+            return f"{self.person()} {rng.randrange(10 ** 10, 10 ** 11)}"
+        words = " ".join(rng.sample(PALAVRAS, rng.choice((1, 2, 2, 3))))
+        suffix = {"2062": "LTDA", "2240": "LTDA", "2305": "EIRELI", "2054": "S.A.", "2046": "S.A.",
+                  "2143": "COOPERATIVA", "3999": "ASSOCIACAO"}.get(natureza, "")
+        return f"{words} {suffix}".strip()
+
+    def date(self, start_year: int, end_year: int = 2025) -> str:
+        # Anos recentes são mais frequentes (a abertura de empresas cresce desde o MEI).
+        year = end_year - min(int(self.rng.expovariate(1 / 7)), end_year - start_year)
+        return f"{year}{self.rng.randint(1, 12):02d}{self.rng.randint(1, 28):02d}"
+
+    def capital(self, natureza: str) -> str:
+        if natureza == "2135":
+            value = self.rng.choice((0, 0, 1000, 5000, 10000))
+        else:
+            value = round(self.rng.lognormvariate(10.5, 2.0), 2)
+        return f"{value:.2f}".replace(".", ",")
+
+    def socios_count(self, natureza: str) -> int:
+        rng = self.rng
+        if natureza in ("2135", "4014", "1244"):
+            return 0
+        if natureza in ("2305",):
+            return 1
+        if natureza in ("2054", "2046"):
+            return min(int(rng.paretovariate(1.2)) + 2, 500)
+        if natureza in ("3999", "3220", "2143"):
+            return rng.randint(1, 8)
+        return min(1 + int(rng.expovariate(1 / 0.9)), 40)
+
+    def filiais_count(self, natureza: str) -> int:
+        rng = self.rng
+        if natureza == "2135" or rng.random() < 0.93:
+            return 0
+        # Cauda longa: poucas redes com centenas ou milhares de filiais.
+        return min(int(rng.paretovariate(1.1)), 5000)
+
+    # --- linhas --------------------------------------------------------------
+    def line(self, fields: list[str], name_index: int) -> str:
+        if self.malformed_rate and self.rng.random() < self.malformed_rate:
+            self.malformed += 1
+            return self.malformed_line(fields, name_index)
+        return ";".join(f'"{value}"' for value in fields) + "\n"
+
+    def malformed_line(self, fields: list[str], name_index: int) -> str:
+        """Linha que o conversor descarta: todas as variantes resultam em campos a mais.
+
+        Args:
+            fields (list[str]): Campos da linha correta.
+            name_index (int): Posição da coluna de nome no layout.
+        """
+        kind = self.rng.randrange(4)
+        quoted = [f'"{value}"' for value in fields]
+        if kind == 0:  # Campo a mais no fim
+            quoted.append('""')
+        elif kind == 1:  # Aspas sem escape dentro do nome, com ";" entre elas
+            quoted[name_index] = f'"{fields[name_index]} "FILIAL; CENTRO" "'
+        elif kind == 2:  # Nome sem aspas contendo ";"
+            quoted[name_index] = f"{fields[name_index]}; ME"
+        else:  # Linha truncada, emendada no registro seguinte
+            quoted = quoted[: max(2, len(quoted) // 2)] + quoted
+        return ";".join(quoted) + "\n"
+
+    def company(self, basico: str, empresas: io.TextIOBase, estabelecimentos: io.TextIOBase, socios: io.TextIOBase) -> None:
+        rng = self.rng
+        natureza = self.natureza.pick(rng)
+        razao = self.company_name(natureza)
+        porte = "01" if natureza == "2135" else self.porte.pick(rng)
+        empresas.write(self.line([
+            basico, razao, natureza, "50" if natureza == "2135" else "49", self.capital(natureza), porte,
+            "BRASIL" if natureza == "1244" else "",
+        ], EMPRESA_NAME))
+
+        uf_index = self.uf.pick(rng)
+        inicio = self.date(1966)
+        cnae = self.cnae.pick(rng)
+        for ordem in range(1, 2 + self.filiais_count(natureza)):
+            cnpj_ordem = f"{ordem:04d}"
+            situacao, motivo, _ = self.situacao.pick(rng)
+            # Filiais de redes se espalham por outras UFs.
+            uf_est = uf_index if ordem == 1 or rng.random() < 0.6 else self.uf.pick(rng)
+            municipio = self.codes[uf_est * MUNICIPIOS_POR_UF + self.municipio.pick(rng)]
+            secundarias = ",".join(rng.sample([code for code, _ in CNAES], rng.choice((0, 0, 1, 2, 3))))
+            estabelecimentos.write(self.line([
+                basico, cnpj_ordem, check_digits(basico + cnpj_ordem), "1" if ordem == 1 else "2",
+                rng.choice(("", "", razao.split()[0] + " " + rng.choice(PALAVRAS))),
+                situacao, inicio if situacao == "02" else self.date(int(inicio[:4])), motivo, "", "",
+                inicio, cnae, secundarias,
+                rng.choice(TIPOS_LOGRADOURO), f"{rng.choice(SOBRENOMES)} {rng.choice(PRENOMES)}",
+                rng.choice((str(rng.randint(1, 5000)), "SN")), rng.choice(("", "", "SALA 1", "LOJA 2", "APTO 101")),
+                rng.choice(BAIRROS), f"{rng.randrange(10 ** 7, 10 ** 8)}", UFS[uf_est][0], municipio,
+                f"{rng.randint(11, 99)}", f"{rng.randrange(10 ** 7, 10 ** 8)}", "", "", "", "",
+                rng.choice(("", f"CONTATO{rng.randint(1, 99999)}@EXEMPLO.COM.BR")), "", "",
+            ], ESTABELECIMENTO_NAME))
+
+        for _ in range(self.socios_count(natureza)):
+            kind = rng.random()
+            entrada = self.date(int(inicio[:4]))
+            if kind < 0.90:  # Pessoa física
+                socios.write(self.line([
+                    basico, "2", self.person(), f"***{rng.randrange(10 ** 5, 10 ** 6)}**",
+                    rng.choice(("49", "49", "22", "05")), entrada, "", "***000000**", "", "00",
+                    str(rng.randint(1, 9)),
+                ], SOCIO_NAME))
+            elif kind < 0.99:  # Pessoa jurídica
+                raiz = f"{rng.randrange(10 ** 8):08d}"
+                socios.write(self.line([
+                    basico, "1", self.company_name("2062"), raiz + "0001" + check_digits(raiz + "0001"),
+                    "22", entrada, "", "***000000**", self.person(), "05", "0",
+                ], SOCIO_NAME))
+            else:  # Estrangeiro
+                codigo, _ = rng.choice(PAISES[1:])
+                socios.write(self.line([
+                    basico, "3", self.person(), "***999999**", "37", entrada, codigo,
+                    "***000000**", self.person(), "05", "0",
+                ], SOCIO_NAME))
+
+
+def basico_for(index: int) -> str:
+    """CNPJ_BASICO único e espalhado para a i-ésima empresa (bijeção em 0..10^8-1)."""
+    return f"{(index * 7_654_321 + 12_345_678) % 10 ** 8:08d}"
+
+
+# =============================================================================
+# Arquivos
+# =============================================================================
+def dump_name(kind: str, part: int | None, date_code: str) -> str:
+    """Nome do arquivo no padrão do dump (``K3241.K03200Y0.D50111.EMPRECSV``)."""
+    if part is None:
+        return f"F.K03200$Z.{date_code}.{kind}"
+    return f"K3241.K03200Y{part}.{date_code}.{kind}"
+
+
+class Output:
+    """Arquivo de saída em latin-1, direto no disco ou dentro de um zip."""
+
+    def __init__(self, out_dir: Path, zip_name: str | None, file_name: str):
+        self.zip = None
+        if zip_name:
+            self.zip = zipfile.ZipFile(out_dir / zip_name, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+            raw = self.zip.open(file_name, "w", force_zip64=True)
+        else:
+            raw = open(out_dir / file_name, "wb")
+        # Caracteres fora do latin-1 viram "?", como no dump original.
+        self.file = io.TextIOWrapper(raw, encoding="latin-1", errors="replace", newline="")
+
+    def __enter__(self) -> io.TextIOBase:
+        return self.file
+
+    def __exit__(self, *exc) -> None:
+        self.file.close()
+        if self.zip is not None:
+            self.zip.close()
+
+
+def write_part(task: tuple) -> tuple[int, int, int, int, int]:
+    """Escreve empresas, estabelecimentos e sócios de uma parte; retorna as contagens de linhas."""
+    part, first, last, out_dir, use_zip, seed, malformed_rate, date_code = task
+    generator = Generator(seed * 1_000_003 + part, malformed_rate)
+    names = [("EMPRECSV", "Empresas"), ("ESTABELE", "Estabelecimentos"), ("SOCIOCSV", "Socios")]
+    outputs = [
+        Output(out_dir, f"{zip_prefix}{part}.zip" if use_zip else None, dump_name(kind, part, date_code))
+        for kind, zip_prefix in names
+    ]
+    with outputs[0] as empresas, outputs[1] as estabelecimentos, outputs[2] as socios:
+        writers = [LineCounter(f) for f in (empresas, estabelecimentos, socios)]
+        for index in range(first, last):
+            generator.company(basico_for(index), *writers)
+    return part, writers[0].lines, writers[1].lines, writers[2].lines, generator.malformed
+
+
+class LineCounter:
+    """Conta as linhas escritas em um arquivo (cada ``write`` é uma linha do dump)."""
+
+    def __init__(self, file: io.TextIOBase):
+        self.file = file
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        self.lines += 1
+        self.file.write(text)
+
+
+def write_domains(out_dir: Path, use_zip: bool, date_code: str) -> None:
+    """Tabelas de domínio: municípios, países, qualificações, naturezas e CNAEs."""
+    tables = [
+        ("MUNICCSV", "Municipios", [(code, name) for code, name, _ in municipios()]),
+        ("PAISCSV", "Paises", PAISES),
+        ("QUALSCSV", "Qualificacoes", QUALIFICACOES),
+        ("NATJUCSV", "Naturezas", [(code, name) for code, name, _ in NATUREZAS]),
+        ("CNAECSV", "Cnaes", CNAES),
+    ]
+    for kind, zip_name, rows in tables:
+        with Output(out_dir, f"{zip_name}.zip" if use_zip else None, dump_name(kind, None, date_code)) as f:
+            for row in rows:
+                f.write(";".join(f'"{value}"' for value in row) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=100_000, help="Número de empresas (o dump real tem ~60 milhões).")
+    parser.add_argument("--parts", type=int, default=10, help="Partes (arquivos) por tipo, como Empresas0..9.")
+    parser.add_argument("--out", default="data/unzipped_files_2025_01", help="Diretório de saída.")
+    parser.add_argument("--zip", action="store_true", help="Grava cada arquivo dentro de um zip, como no download.")
+    parser.add_argument("--seed", type=int, default=42, help="Semente (mesma semente, mesma saída).")
+    parser.add_argument("--malformed-rate", type=float, default=0.0005, help="Fração de linhas malformadas.")
+    parser.add_argument("--month", default="2025-01", help="Mês de referência usado nos nomes dos arquivos.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Processos geradores.")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    year, month = (int(value) for value in args.month.split("-"))
+    date_code = f"D{year % 10}{month:02d}11"
+    parts = max(1, min(args.parts, args.companies))
+    bounds = [args.companies * part // parts for part in range(parts + 1)]
+    tasks = [
+        (part, bounds[part], bounds[part + 1], out_dir, args.zip, args.seed, args.malformed_rate, date_code)
+        for part in range(parts)
+    ]
+
+    start = time.perf_counter()
+    write_domains(out_dir, args.zip, date_code)
+    totals = [0, 0, 0, 0]
+    with multiprocessing.Pool(max(1, min(args.jobs, parts))) as pool:
+        for part, companies, establishments, partners, malformed in pool.imap_unordered(write_part, tasks):
+            for i, value in enumerate((companies, establishments, partners, malformed)):
+                totals[i] += value
+            print(f"Parte {part}: {companies} empresas, {establishments} estabelecimentos, {partners} sócios.")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{totals[0]} empresas, {totals[1]} estabelecimentos, {totals[2]} sócios "
+        f"({totals[3]} linhas malformadas) em {out_dir} em {elapsed:.1f}s."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# answer_templates.py
+"""
+Respostas determinísticas para formatos simples de resultado.
+
+Quando a query devolve um escalar (ex.: um COUNT), uma única linha ou uma
+tabela pequena, transformar os números em texto não precisa de uma segunda
+chamada ao LLM: a resposta é montada aqui, a partir de modelos fixos. Os
+demais resultados continuam indo para o ``interpret_results_node``.
+"""
+
+import datetime
+import decimal
+import re
+from typing import Any, List, Optional
+
+DEFAULT_MAX_ROWS = 10
+DEFAULT_MAX_COLUMNS = 4
+
+_AGGREGATE_LABELS = (
+    (re.compile(r"^count", re.IGNORECASE), "Total"),
+    (re.compile(r"^sum", re.IGNORECASE), "Soma"),
+    (re.compile(r"^(avg|mean)", re.IGNORECASE), "Média"),
+    (re.compile(r"^min", re.IGNORECASE), "Mínimo"),
+    (re.compile(r"^max", re.IGNORECASE), "Máximo"),
+)
+
+
+def column_label(name: str) -> str:
+    """Converte o nome de uma coluna do resultado em um rótulo legível."""
+    for pattern, label in _AGGREGATE_LABELS:
+        if pattern.match(name) and "(" in name:
+            return label
+    return name.replace("_", " ").strip().capitalize()
+
+
+def format_value(value: Any) -> str:
+    """Formata um valor no padrão brasileiro (milhar com ponto, decimal com vírgula)."""
+    if value is None:
+        return "—"
+    if isinstance(value, bool):
+        return "sim" if value else "não"
+    if isinstance(value, int):
+        return f"{value:,}".replace(",", ".")
+    if isinstance(value, (float, decimal.Decimal)):
+        text = f"{value:,.2f}"
+        return text.replace(",", "_").replace(".", ",").replace("_", ".")
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, datetime.date):
+        return value.strftime("%d/%m/%Y")
+    return str(value)
+
+
+def qualifies(
+    columns: List[str],
+    rows: List[tuple],
+    total_rows: int,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_columns: int = DEFAULT_MAX_COLUMNS,
+) -> bool:
+    """Indica se o resultado tem um formato que dispensa a interpretação pelo LLM."""
+    if total_rows != len(rows) or not columns:
+        return False
+    if len(rows) <= 1:
+        return True
+    return len(rows) <= max_rows and len(columns) <= max_columns
+
+
+def render_answer(
+    columns: List[str],
+    rows: List[tuple],
+    total_rows: int,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_columns: int = DEFAULT_MAX_COLUMNS,
+) -> Optional[str]:
+    """Monta a resposta em texto para resultados simples.
+
+    Args:
+        columns (List[str]): Nomes das colunas do resultado.
+        rows (List[tuple]): Linhas do resultado.
+        total_rows (int): Total de linhas (maior que ``len(rows)`` se o resultado foi truncado).
+        max_rows (int): Máximo de linhas para a forma de tabela.
+        max_columns (int): Máximo de colunas para a forma de tabela.
+
+    Returns:
+        Optional[str]: A resposta em Markdown, ou None se o formato exigir o LLM.
+    """
+    if not qualifies(columns, rows, total_rows, max_rows, max_columns):
+        return None
+    if not rows:
+        return "Nenhum registro foi encontrado para esta pergunta."
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{column_label(columns[0])}: **{format_value(rows[0][0])}**."
+    if len(rows) == 1:
+        return "\n".join(
+            f"- **{column_label(name)}**: {format_value(value)}" for name, value in zip(columns, rows[0])
+        )
+    lines = [
+        "| " + " | ".join(column_label(name) for name in columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    lines.extend("| " + " | ".join(format_value(value) for value in row) + " |" for row in rows)
+    return f"Foram encontrados {format_value(len(rows))} registros:\n\n" + "\n".join(lines)
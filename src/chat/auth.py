@@ -2,7 +2,8 @@
 
 import logging
 import re
-from authenticate import UserAuthenticator, DatabaseManager
+from typing import Optional
+from authenticate import UserAuthenticator, DatabaseManager, get_database_manager
 
 class AuthManager:
     """Gerencia a autenticação de usuários no aplicativo Chat X.
@@ -10,16 +11,19 @@ class AuthManager:
     Esta classe fornece métodos para registrar novos usuários e autenticar usuários existentes.
     """
 
-    def __init__(self):
+    def __init__(self, db_manager: Optional[DatabaseManager] = None):
         """Inicializa o AuthManager.
 
         Configura os atributos de email e chave de thread, além do logger.
+
+        Args:
+            db_manager (Optional[DatabaseManager]): Banco de usuários; por padrão, o compartilhado do processo.
         """
         self.user_email = None
         self.thread_key = None
         self.logger = logging.getLogger(__name__)
         self.logger.debug("AuthManager inicializado.")
-        self.db_manager = DatabaseManager()
+        self.db_manager = db_manager or get_database_manager()
         self.authenticator = UserAuthenticator(self.db_manager)
 
     def is_valid_email(self, email: str) -> bool:
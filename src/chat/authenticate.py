@@ -1,3 +1,4 @@
+import os
 import sqlite3
 from contextlib import contextmanager
 from typing import List, Optional, Tuple, Dict
@@ -11,7 +12,8 @@ MESSAGE_LIMIT = 20  # Defina o limite de mensagens aqui
 
 # Configuração do Logging
 def setup_logging(log_file: str = LOG_FILE):
-    """Configura o sistema de logging."""
+    """Configura o sistema de logging (chamada no primeiro uso do banco, não no import)."""
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -21,8 +23,6 @@ def setup_logging(log_file: str = LOG_FILE):
         ]
     )
 
-# Inicializa o sistema de logging
-setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -306,15 +306,24 @@ class MessageService:
         return messages
 
 
-# Inicialização dos componentes
-db_manager = DatabaseManager()
-authenticator = UserAuthenticator(db_manager)
-message_service = MessageService(db_manager)
+# Inicialização dos componentes (no primeiro uso, compartilhados entre os reruns do Streamlit)
+@st.cache_resource
+def get_database_manager() -> DatabaseManager:
+    """DatabaseManager único do processo; cria as tabelas uma só vez."""
+    setup_logging()
+    return DatabaseManager()
+
+
+def get_services() -> Tuple[DatabaseManager, UserAuthenticator, MessageService]:
+    """Gerenciador do banco, autenticador e serviço de mensagens."""
+    db_manager = get_database_manager()
+    return db_manager, UserAuthenticator(db_manager), MessageService(db_manager)
 
 
 # Interface do Streamlit
 def main():
     st.title("Aplicação Streamlit com SQLite e Logging")
+    _, authenticator, _ = get_services()
 
     menu = ["Login", "Registro"]
     choice = st.sidebar.selectbox("Menu", menu)
@@ -345,6 +354,7 @@ def main():
 
 def user_session(useremail: str):
     st.write(f"Bem-vindo, {useremail}!")
+    db_manager, _, message_service = get_services()
 
     # Gerenciar limites de mensagens
     is_allowed, count = db_manager.get_message_limit(useremail)
@@ -0,0 +1,87 @@
+# batch.py
+"""
+Execução de lotes de perguntas (RPC ``AskQuestions``).
+
+Os jobs de retaguarda enviavam centenas de perguntas uma a uma, cada uma em
+um canal gRPC novo e esperando a anterior terminar. Um lote chega em uma
+única chamada e é processado aqui:
+
+- perguntas iguais após a normalização (acentos, pontuação, caixa, espaços)
+  são respondidas uma única vez e a resposta vale para todas as posições;
+- as perguntas distintas rodam concorrentemente, até um limite por lote; os
+  limites globais do servidor (escalonador de consultas, governador de
+  memória e fila do LLM) continuam valendo dentro de cada pergunta;
+- SQLs idênticas geradas por perguntas diferentes do mesmo lote são
+  executadas uma vez (``shared_queries``, um ``SingleFlight`` que guarda os
+  resultados), mesmo que o resultado não caiba no cache de resultados;
+- os resultados são produzidos na ordem em que ficam prontos.
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple
+
+from question_cache import normalize_question
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem(NamedTuple):
+    """Resposta de uma pergunta distinta do lote."""
+
+    indices: List[int]  # Posições do lote com a mesma pergunta normalizada
+    answer: str
+    error: str
+    seconds: float
+
+
+def shared_queries() -> SingleFlight:
+    """Execuções de SQL compartilhadas pelas perguntas de um lote (resultados guardados até o fim do lote)."""
+    return SingleFlight("lote", keep_results=True)
+
+
+def group_questions(questions: List[str]) -> List[List[int]]:
+    """Agrupa as posições das perguntas iguais após a normalização, na ordem da primeira ocorrência."""
+    groups: Dict[str, List[int]] = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), []).append(index)
+    return list(groups.values())
+
+
+async def run_batch(
+    questions: List[str],
+    answer: Callable[[str], Awaitable[str]],
+    max_concurrency: int,
+) -> AsyncIterator[BatchItem]:
+    """Responde às perguntas distintas do lote concorrentemente, produzindo cada uma ao terminar.
+
+    Args:
+        questions (List[str]): Perguntas do lote, na ordem recebida.
+        answer: Corrotina que responde a uma pergunta.
+        max_concurrency (int): Perguntas em andamento ao mesmo tempo.
+
+    Yields:
+        BatchItem: Resposta (ou erro) com as posições a que se aplica.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_one(indices: List[int]) -> BatchItem:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                text = await answer(questions[indices[0]])
+                return BatchItem(indices, text, "", time.perf_counter() - start)
+            except Exception as e:
+                logger.error("Erro na pergunta %d do lote: %s", indices[0], e)
+                return BatchItem(indices, "", str(e), time.perf_counter() - start)
+
+    tasks = [asyncio.create_task(run_one(indices)) for indices in group_questions(questions)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Cliente desconectado ou lote cancelado: nada continua rodando em segundo plano.
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,217 @@
+# checkpointer.py
+"""
+Checkpointers do LangGraph com política de retenção.
+
+O ``MemorySaver`` padrão guarda todos os checkpoints de todas as threads
+enquanto o processo estiver vivo. Aqui há duas alternativas limitadas:
+
+- ``BoundedMemorySaver``: em memória, mantém apenas os checkpoints mais
+  recentes de cada thread, descarta threads ociosas e limita o número de
+  threads (LRU);
+- modo SQLite (``AsyncSqliteSaver``, extra opcional ``sqlite`` do projeto, que
+  instala ``langgraph-checkpoint-sqlite`` e ``aiosqlite``): o estado sobrevive a
+  reinícios sem ocupar a RAM, e ``prune_sqlite_checkpoints`` aplica a mesma
+  retenção às tabelas.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTER_MODES = ("memory", "sqlite")
+
+DEFAULT_MAX_THREADS = 1000
+DEFAULT_MAX_CHECKPOINTS_PER_THREAD = 20
+DEFAULT_IDLE_SECONDS = 24 * 60 * 60
+
+
+class BoundedMemorySaver(MemorySaver):
+    """``MemorySaver`` com limite de threads, de checkpoints por thread e de ociosidade."""
+
+    def __init__(
+        self,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_checkpoints_per_thread: int = DEFAULT_MAX_CHECKPOINTS_PER_THREAD,
+        idle_seconds: Optional[float] = DEFAULT_IDLE_SECONDS,
+    ):
+        """Inicializa o checkpointer.
+
+        Args:
+            max_threads (int): Número máximo de threads mantidas; as menos recentes são descartadas.
+            max_checkpoints_per_thread (int): Checkpoints mantidos por thread (os mais recentes).
+            idle_seconds (Optional[float]): Threads sem atividade por mais tempo são descartadas.
+                None desativa a expiração.
+        """
+        super().__init__()
+        self.max_threads = max_threads
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.idle_seconds = idle_seconds
+        self._last_used = OrderedDict()           # thread_id -> instante do último checkpoint
+        self._blob_keys = defaultdict(set)        # thread_id -> chaves em self.blobs
+        self._lock = threading.Lock()
+        self.evicted_threads = 0
+        self.pruned_checkpoints = 0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._blob_keys[thread_id].update(
+                (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+            )
+            self._last_used[thread_id] = time.monotonic()
+            self._last_used.move_to_end(thread_id)
+            self._trim_thread(thread_id, checkpoint_ns)
+            self._evict_threads()
+        return result
+
+    def _trim_thread(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+        # Os ids são UUIDv6: a ordem lexicográfica é a ordem cronológica.
+        ordered = sorted(checkpoints)
+        for checkpoint_id in ordered[:-self.max_checkpoints_per_thread]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            self.pruned_checkpoints += 1
+        # Mantém apenas os valores de canal referenciados pelos checkpoints restantes.
+        referenced = set()
+        for saved_checkpoint, _, _ in checkpoints.values():
+            versions = self.serde.loads_typed(saved_checkpoint)["channel_versions"]
+            referenced.update((thread_id, checkpoint_ns, channel, version) for channel, version in versions.items())
+        keys = self._blob_keys[thread_id]
+        for key in [key for key in keys if key[1] == checkpoint_ns and key not in referenced]:
+            self.blobs.pop(key, None)
+            keys.discard(key)
+
+    def _evict_threads(self) -> None:
+        now = time.monotonic()
+        while self._last_used:
+            thread_id, last_used = next(iter(self._last_used.items()))
+            idle = self.idle_seconds is not None and now - last_used > self.idle_seconds
+            if not idle and len(self._last_used) <= self.max_threads:
+                return
+            self._drop_thread(thread_id)
+
+    def _drop_thread(self, thread_id: str) -> None:
+        for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id in checkpoints:
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        self._last_used.pop(thread_id, None)
+        self.evicted_threads += 1
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+
+    def stats(self) -> dict:
+        """Retorna a ocupação atual e os contadores de retenção."""
+        with self._lock:
+            return {
+                "threads": len(self._last_used),
+                "checkpoints": sum(
+                    len(checkpoints) for namespaces in self.storage.values() for checkpoints in namespaces.values()
+                ),
+                "blobs": len(self.blobs),
+                "evicted_threads": self.evicted_threads,
+                "pruned_checkpoints": self.pruned_checkpoints,
+            }
+
+
+async def prune_sqlite_checkpoints(
+    saver,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_checkpoints_per_thread: int = DEFAULT_MAX_CHECKPOINTS_PER_THREAD,
+) -> int:
+    """Aplica a política de retenção às tabelas de um ``AsyncSqliteSaver``.
+
+    Mantém os ``max_checkpoints_per_thread`` checkpoints mais recentes de cada
+    thread e as ``max_threads`` threads com atividade mais recente, removendo
+    também as escritas pendentes órfãs.
+
+    Returns:
+        int: Quantidade de checkpoints removidos.
+    """
+    await saver.setup()
+    async with saver.lock:
+        cursor = await saver.conn.execute(
+            """
+            DELETE FROM checkpoints WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (
+                        PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                    ) AS posicao
+                    FROM checkpoints
+                ) WHERE posicao > ?
+            )
+            """,
+            (max_checkpoints_per_thread,)
+        )
+        removed = cursor.rowcount
+        cursor = await saver.conn.execute(
+            """
+            DELETE FROM checkpoints WHERE thread_id IN (
+                SELECT thread_id FROM checkpoints
+                GROUP BY thread_id
+                ORDER BY MAX(checkpoint_id) DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (max_threads,)
+        )
+        removed += cursor.rowcount
+        await saver.conn.execute(
+            """
+            DELETE FROM writes WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c
+                WHERE c.thread_id = writes.thread_id
+                  AND c.checkpoint_ns = writes.checkpoint_ns
+                  AND c.checkpoint_id = writes.checkpoint_id
+            )
+            """
+        )
+        await saver.conn.commit()
+    if removed:
+        logger.info("Retenção de checkpoints: %d checkpoint(s) removido(s) do SQLite.", removed)
+    return removed
+
+
+@asynccontextmanager
+async def open_checkpointer(
+    mode: str = "memory",
+    sqlite_path: str = "checkpoints.sqlite",
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_checkpoints_per_thread: int = DEFAULT_MAX_CHECKPOINTS_PER_THREAD,
+    idle_seconds: Optional[float] = DEFAULT_IDLE_SECONDS,
+):
+    """Abre o checkpointer do modo escolhido (``memory`` ou ``sqlite``).
+
+    Raises:
+        RuntimeError: Se o modo ``sqlite`` for pedido sem o pacote ``langgraph-checkpoint-sqlite``.
+        ValueError: Se o modo for desconhecido.
+    """
+    if mode == "memory":
+        yield BoundedMemorySaver(max_threads, max_checkpoints_per_thread, idle_seconds)
+    elif mode == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError as e:
+            raise RuntimeError(
+                "O modo sqlite requer o pacote langgraph-checkpoint-sqlite (instale o extra: uv sync --extra sqlite)."
+            ) from e
+        async with AsyncSqliteSaver.from_conn_string(sqlite_path) as saver:
+            logger.info("Checkpoints do LangGraph persistidos em %s.", sqlite_path)
+            yield saver
+    else:
+        raise ValueError(f"Modo de checkpointer desconhecido: {mode}")
@@ -0,0 +1,251 @@
+# cnpj_lookup.py
+"""
+Consulta direta por CNPJ, sem passar pelo LLM.
+
+Boa parte das perguntas é alguém colando um CNPJ (formatado ou só dígitos) e
+perguntando sobre a empresa. Pelo grafo isso custa duas chamadas ao LLM e um
+``LIKE`` sobre o join inteiro. Aqui o CNPJ é reconhecido na pergunta e a
+empresa, seus estabelecimentos e sócios são lidos diretamente de
+``resultados_consulta``, que é materializada ordenada por CNPJ_BASICO.
+
+Na materialização é gravada a tabela ``cnpj_row_groups`` com o intervalo de
+CNPJ_BASICO de cada row group. Com ela a consulta localiza por busca binária
+as linhas (``rowid``) que podem conter o CNPJ e lê apenas esse trecho.
+"""
+
+import logging
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, NamedTuple, Optional
+
+import duckdb
+
+from answer_templates import column_label, format_value
+from question_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TABLE = "resultados_consulta"
+ROW_GROUP_TABLE = "cnpj_row_groups"
+ROW_GROUP_SIZE = 122_880  # Tamanho padrão do row group do DuckDB
+DEFAULT_MAX_ESTABLISHMENTS = 20
+
+EMPRESA_COLUMNS = (
+    "RAZAO_SOCIAL", "NATUREZA_JURIDICA", "QUALIFICACAO_RESPONSAVEL", "CAPITAL_SOCIAL",
+    "PORTE_EMPRESA", "ENTE_FEDERATIVO_RESPONSAVEL",
+)
+ESTABELECIMENTO_COLUMNS = (
+    "CNPJ_ORDEM", "CNPJ_DV", "IDENTIFICADOR_MATRIZ_FILIAL", "NOME_FANTASIA", "SITUACAO_CADASTRAL",
+    "DATA_SITUACAO_CADASTRAL", "DATA_INICIO_ATIVIDADE", "CNAE_FISCAL_PRINCIPAL", "TIPO_LOGRADOURO",
+    "LOGRADOURO", "NUMERO", "COMPLEMENTO", "BAIRRO", "CEP", "NOME_MUNICIPIO", "UF", "DDD_1",
+    "TELEFONE_1", "CORREIO_ELETRONICO",
+)
+SOCIO_COLUMNS = (
+    "NOME_SOCIO", "IDENTIFICADOR_SOCIO", "QUALIFICACAO_SOCIO", "DATA_ENTRADA_SOCIEDADE", "FAIXA_ETARIA",
+)
+
+_CNPJ = re.compile(r"(?<![\d./-])(\d{2})\.?(\d{3})\.?(\d{3})(?:/?(\d{4})-?(\d{2}))?(?![\d./-])")
+# Palavras que indicam uma pergunta sobre outras empresas a partir do CNPJ
+# ("empresas no mesmo endereço de ..."), que continua indo para o grafo.
+_RELATIONAL_WORDS = set(
+    "MESMO MESMA MESMOS MESMAS OUTRO OUTRA OUTROS OUTRAS SEMELHANTE SEMELHANTES PARECIDA PARECIDAS "
+    "CONCORRENTE CONCORRENTES COMPARE COMPARAR VIZINHA VIZINHAS PROXIMA PROXIMAS".split()
+)
+
+
+class CnpjKey(NamedTuple):
+    """CNPJ reconhecido: raiz de 8 dígitos e, se informados, ordem e dígitos verificadores."""
+
+    basico: str
+    ordem: str = ""
+    dv: str = ""
+
+    def formatted(self) -> str:
+        base = f"{self.basico[:2]}.{self.basico[2:5]}.{self.basico[5:]}"
+        return f"{base}/{self.ordem}-{self.dv}" if self.ordem else base
+
+
+class CompanyRecord(NamedTuple):
+    """Dados da empresa, dos estabelecimentos e do quadro societário."""
+
+    key: CnpjKey
+    empresa: Dict[str, object]
+    estabelecimentos: List[Dict[str, object]]
+    socios: List[Dict[str, object]]
+
+
+def check_digits(first12: str) -> str:
+    """Calcula os dois dígitos verificadores de um CNPJ a partir dos 12 primeiros dígitos."""
+    digits = [int(d) for d in first12]
+    for weights in ((5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2), (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)):
+        remainder = sum(d * w for d, w in zip(digits, weights)) % 11
+        digits.append(0 if remainder < 2 else 11 - remainder)
+    return f"{digits[-2]}{digits[-1]}"
+
+
+def parse_cnpj(text: str) -> Optional[CnpjKey]:
+    """Reconhece um único CNPJ no texto.
+
+    CNPJs completos (14 dígitos) precisam ter dígitos verificadores válidos.
+    A raiz de 8 dígitos é aceita se vier formatada (``12.345.678``) ou se o
+    texto mencionar "CNPJ"; assim números quaisquer não são confundidos com CNPJ.
+
+    Returns:
+        Optional[CnpjKey]: O CNPJ, ou None se não houver exatamente um.
+    """
+    found = set()
+    mentions_cnpj = "CNPJ" in text.upper()
+    for match in _CNPJ.finditer(text):
+        basico = "".join(match.group(1, 2, 3))
+        if match.group(4):
+            if check_digits(basico + match.group(4)) != match.group(5):
+                continue
+            found.add(CnpjKey(basico, match.group(4), match.group(5)))
+        elif mentions_cnpj or "." in match.group(0):
+            found.add(CnpjKey(basico))
+    return found.pop() if len(found) == 1 else None
+
+
+def parse_lookup_question(question: str) -> Optional[CnpjKey]:
+    """Retorna o CNPJ se a pergunta for sobre a própria empresa (respondível pela consulta direta)."""
+    key = parse_cnpj(question)
+    if key is None:
+        return None
+    words = set(normalize_question(_CNPJ.sub(" ", question)).split())
+    if words & _RELATIONAL_WORDS:
+        return None
+    return key
+
+
+class CnpjLookup:
+    """Consulta por CNPJ usando o índice CNPJ_BASICO -> intervalo de linhas."""
+
+    def __init__(self, boundaries: Optional[List[tuple]] = None, max_establishments: int = DEFAULT_MAX_ESTABLISHMENTS):
+        """Inicializa a consulta.
+
+        Args:
+            boundaries (Optional[List[tuple]]): Linhas ``(cnpj_inicial, cnpj_final, primeira_linha, ultima_linha)``
+                de ``cnpj_row_groups``, em ordem. Sem elas a consulta conta só com os zonemaps.
+            max_establishments (int): Estabelecimentos incluídos na resposta em texto.
+        """
+        boundaries = boundaries or []
+        self.first_keys = [row[0] for row in boundaries]
+        self.last_keys = [row[1] for row in boundaries]
+        self.first_rows = [row[2] for row in boundaries]
+        self.last_rows = [row[3] for row in boundaries]
+        self.max_establishments = max_establishments
+
+    @classmethod
+    def load(cls, conn: duckdb.DuckDBPyConnection, **kwargs) -> "CnpjLookup":
+        """Carrega o índice gravado na materialização, se estiver consistente com a tabela."""
+        try:
+            boundaries = conn.execute(
+                f"SELECT cnpj_inicial, cnpj_final, primeira_linha, ultima_linha FROM {ROW_GROUP_TABLE} ORDER BY grupo"
+            ).fetchall()
+            total = conn.execute(f"SELECT COUNT(*) FROM {SOURCE_TABLE}").fetchone()[0]
+        except duckdb.Error:
+            logger.info("Índice de row groups por CNPJ indisponível; a consulta direta usará só o filtro.")
+            return cls(**kwargs)
+        if not boundaries or boundaries[-1][3] + 1 != total:
+            logger.warning("Índice %s não corresponde a %s; ignorando.", ROW_GROUP_TABLE, SOURCE_TABLE)
+            return cls(**kwargs)
+        logger.info("Índice de CNPJ carregado com %d row groups.", len(boundaries))
+        return cls(boundaries, **kwargs)
+
+    def row_range(self, basico: str) -> Optional[tuple]:
+        """Intervalo de ``rowid`` que pode conter o CNPJ_BASICO (None sem índice)."""
+        if not self.first_keys:
+            return None
+        start = bisect_left(self.last_keys, basico)
+        end = bisect_right(self.first_keys, basico)
+        if start >= end:
+            return (0, -1)
+        return (self.first_rows[start], self.last_rows[end - 1])
+
+    def _select(self, conn: duckdb.DuckDBPyConnection, columns, key: CnpjKey, extra: str = "", order: str = ""):
+        where, params = "CNPJ_BASICO = ?", [key.basico]
+        rows = self.row_range(key.basico)
+        if rows is not None:
+            where = "rowid BETWEEN ? AND ? AND " + where
+            params = [*rows, *params]
+        sql = f"SELECT DISTINCT {', '.join(columns)} FROM {SOURCE_TABLE} WHERE {where}{extra}"
+        if order:
+            sql += f" ORDER BY {order}"
+        return [dict(zip(columns, row)) for row in conn.execute(sql, params).fetchall()]
+
+    def lookup(self, conn: duckdb.DuckDBPyConnection, key: CnpjKey) -> Optional[CompanyRecord]:
+        """Lê a empresa, os estabelecimentos e os sócios do CNPJ.
+
+        Returns:
+            Optional[CompanyRecord]: Os dados, ou None se o CNPJ não existir na base.
+        """
+        empresa = self._select(conn, EMPRESA_COLUMNS, key)
+        if not empresa:
+            return None
+        branch = ""
+        if key.ordem:
+            branch = f" AND CNPJ_ORDEM = '{key.ordem}' AND CNPJ_DV = '{key.dv}'"
+        estabelecimentos = self._select(
+            conn, ESTABELECIMENTO_COLUMNS, key, f" AND CNPJ_ORDEM IS NOT NULL{branch}", "CNPJ_ORDEM"
+        )
+        socios = self._select(conn, SOCIO_COLUMNS, key, " AND NOME_SOCIO IS NOT NULL", "NOME_SOCIO")
+        return CompanyRecord(key, empresa[0], estabelecimentos, socios)
+
+    def render(self, key: CnpjKey, record: Optional[CompanyRecord]) -> str:
+        """Monta a resposta em Markdown para o resultado da consulta."""
+        if record is None:
+            return f"Nenhuma empresa com o CNPJ {key.formatted()} foi encontrada na base."
+        empresa = record.empresa
+        lines = [f"**{empresa['RAZAO_SOCIAL']}** — CNPJ {key.formatted()}", ""]
+        lines += [
+            f"- **{column_label(name)}**: {format_value(empresa[name])}"
+            for name in EMPRESA_COLUMNS[1:] if empresa[name] not in (None, "")
+        ]
+        if key.ordem and not record.estabelecimentos:
+            lines += ["", f"O estabelecimento {key.formatted()} não foi encontrado; a empresa existe na base."]
+        elif record.estabelecimentos:
+            total = len(record.estabelecimentos)
+            lines += ["", f"**Estabelecimentos** ({format_value(total)}):"]
+            for est in record.estabelecimentos[:self.max_establishments]:
+                cnpj = CnpjKey(key.basico, est["CNPJ_ORDEM"], est["CNPJ_DV"]).formatted()
+                address = ", ".join(
+                    str(est[name]) for name in ("TIPO_LOGRADOURO", "LOGRADOURO", "NUMERO", "BAIRRO")
+                    if est[name] not in (None, "")
+                )
+                city = "/".join(str(est[name]) for name in ("NOME_MUNICIPIO", "UF") if est[name])
+                details = [
+                    f"{column_label(name)}: {format_value(est[name])}"
+                    for name in ("IDENTIFICADOR_MATRIZ_FILIAL", "NOME_FANTASIA", "SITUACAO_CADASTRAL",
+                                 "DATA_INICIO_ATIVIDADE", "CNAE_FISCAL_PRINCIPAL")
+                    if est[name] not in (None, "")
+                ]
+                lines.append(f"- {cnpj}: " + "; ".join(details + [part for part in (address, city) if part]))
+            if total > self.max_establishments:
+                lines.append(f"- … e mais {format_value(total - self.max_establishments)} estabelecimento(s).")
+        if record.socios:
+            lines += ["", f"**Sócios** ({format_value(len(record.socios))}):"]
+            for socio in record.socios:
+                details = [
+                    f"{column_label(name)}: {format_value(socio[name])}"
+                    for name in SOCIO_COLUMNS[1:] if socio[name] not in (None, "")
+                ]
+                lines.append(f"- {socio['NOME_SOCIO']}" + (f" ({'; '.join(details)})" if details else ""))
+        return "\n".join(lines)
+
+
+def build_row_group_index(conn: duckdb.DuckDBPyConnection) -> None:
+    """Grava ``cnpj_row_groups`` com o intervalo de CNPJ_BASICO de cada row group da tabela ordenada."""
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {ROW_GROUP_TABLE} AS
+        SELECT
+            rowid // {ROW_GROUP_SIZE} AS grupo,
+            MIN(rowid) AS primeira_linha,
+            MAX(rowid) AS ultima_linha,
+            MIN(CNPJ_BASICO) AS cnpj_inicial,
+            MAX(CNPJ_BASICO) AS cnpj_final
+        FROM {SOURCE_TABLE}
+        GROUP BY grupo
+        ORDER BY grupo
+    """)
+    total = conn.execute(f"SELECT COUNT(*) FROM {ROW_GROUP_TABLE}").fetchone()[0]
+    logger.info("Índice %s gravado com %d row groups.", ROW_GROUP_TABLE, total)
@@ -0,0 +1,259 @@
+# cost_gate.py
+"""
+Controle de custo das SQLs geradas pelo LLM, aplicado antes da execução.
+
+A SQL passa por ``EXPLAIN (FORMAT JSON)``: do plano saem as tabelas
+varridas, a cardinalidade estimada de cada operador e a presença de LIMIT,
+agregações e produtos cartesianos. Com essas estimativas a política decide:
+
+- ``refuse``: o plano é caro demais (produto cartesiano ou operador com mais
+  de ``refuse_rows`` linhas estimadas); a consulta é recusada com uma
+  mensagem que orienta o usuário a refinar a pergunta;
+- ``limit``: a consulta devolveria mais de ``limit_rows`` linhas e não tem
+  LIMIT; um LIMIT é injetado;
+- ``approximate``: as varreduras produzem mais de ``approx_rows`` linhas
+  (estimativa depois dos filtros do WHERE, não o tamanho da tabela) e a
+  consulta usa ``COUNT(DISTINCT ...)``; a contagem é trocada por
+  ``approx_count_distinct``. Consultas seletivas continuam exatas.
+"""
+
+import json
+import logging
+import threading
+from typing import List, NamedTuple, Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+OK = ""
+LIMIT = "limit"
+APPROXIMATE = "approximate"
+REFUSE = "refuse"
+
+_NESTED_LOOP_OPERATORS = {"CROSS_PRODUCT", "NESTED_LOOP_JOIN", "BLOCKWISE_NL_JOIN", "PIECEWISE_MERGE_JOIN"}
+_LIMIT_OPERATORS = {"LIMIT", "STREAMING_LIMIT", "TOP_N", "LIMIT_PERCENT"}
+_AGGREGATE_OPERATORS = {"HASH_GROUP_BY", "PERFECT_HASH_GROUP_BY", "UNGROUPED_AGGREGATE", "SIMPLE_AGGREGATE"}
+
+
+class QueryRefusedError(Exception):
+    """A consulta foi recusada pelo controle de custo."""
+
+
+class PlanEstimate(NamedTuple):
+    """Estimativas extraídas do plano de execução."""
+
+    tables: List[str]
+    scanned_rows: int
+    peak_rows: int
+    output_rows: int
+    has_limit: bool
+    has_aggregate: bool
+    nested_loop_rows: int
+
+
+class GateDecision(NamedTuple):
+    """SQL a executar e o ajuste aplicado (``OK``, ``LIMIT``, ``APPROXIMATE``)."""
+
+    sql: str
+    action: str
+    estimate: Optional[PlanEstimate]
+
+
+def _cardinality(node: dict, default: int = 0) -> int:
+    try:
+        return int(node.get("extra_info", {}).get("Estimated Cardinality", default))
+    except (TypeError, ValueError):
+        return default
+
+
+def explain(conn: duckdb.DuckDBPyConnection, sql: str) -> PlanEstimate:
+    """Executa ``EXPLAIN`` e resume o plano físico.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Conexão com o banco.
+        sql (str): SQL a analisar.
+
+    Returns:
+        PlanEstimate: Tabelas varridas, linhas que saem das varreduras (já com os filtros
+        aplicados no scan), maior cardinalidade estimada entre os operadores e cardinalidade
+        estimada da saída.
+    """
+    plan = json.loads(conn.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()[0][1])
+    table_sizes = dict(conn.execute(
+        "SELECT database_name || '.' || schema_name || '.' || table_name, estimated_size FROM duckdb_tables()"
+    ).fetchall())
+    tables, state = [], {"scanned": 0, "peak": 0, "limit": False, "aggregate": False, "nested": 0}
+
+    def walk(node: dict) -> int:
+        name = node.get("name", "")
+        children = [walk(child) for child in node.get("children", [])]
+        rows = _cardinality(node)
+        if name in _NESTED_LOOP_OPERATORS and children:
+            product = 1
+            for child_rows in children:
+                product *= max(child_rows, 1)
+            rows = max(rows, product)
+            state["nested"] = max(state["nested"], product)
+        table = node.get("extra_info", {}).get("Table")
+        if table:
+            tables.append(table)
+            # Estimativa do scan depois dos filtros empurrados para ele; o tamanho da
+            # tabela só quando o plano não traz estimativa.
+            state["scanned"] += _cardinality(node, int(table_sizes.get(table, 0) or 0))
+        state["limit"] |= name in _LIMIT_OPERATORS
+        state["aggregate"] |= name in _AGGREGATE_OPERATORS and bool(node.get("extra_info", {}).get("Aggregates"))
+        state["peak"] = max(state["peak"], rows)
+        return rows
+
+    roots = [walk(node) for node in plan]
+
+    # A estimativa na raiz costuma ser 0; usa o primeiro operador com estimativa.
+    def output(node: dict) -> int:
+        rows = _cardinality(node)
+        if rows or not node.get("children"):
+            return rows
+        return max(output(child) for child in node["children"])
+
+    output_rows = max((output(node) for node in plan), default=0) or max(roots, default=0)
+    return PlanEstimate(
+        tables, state["scanned"], state["peak"], output_rows,
+        state["limit"], state["aggregate"], state["nested"],
+    )
+
+
+def _modify(conn: duckdb.DuckDBPyConnection, sql: str, change) -> Optional[str]:
+    """Aplica ``change`` à árvore da SQL, preservando os nomes das colunas de saída."""
+    tree = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+    if tree.get("error") or len(tree["statements"]) != 1:
+        return None
+    node = tree["statements"][0]["node"]
+    if not change(conn, node):
+        return None
+    if node.get("type") == "SELECT_NODE":
+        names = [row[0] for row in conn.execute(f"DESCRIBE {sql}").fetchall()]
+        if len(names) == len(node["select_list"]):
+            for item, name in zip(node["select_list"], names):
+                if not item.get("alias"):
+                    item["alias"] = name
+    return conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0]
+
+
+def _add_limit(limit: int):
+    def change(conn: duckdb.DuckDBPyConnection, node: dict) -> bool:
+        modifier = json.loads(conn.execute(
+            "SELECT json_serialize_sql(?)", [f"SELECT 1 LIMIT {int(limit)}"]
+        ).fetchone()[0])["statements"][0]["node"]["modifiers"][0]
+        node["modifiers"].append(modifier)
+        return True
+    return change
+
+
+def _approximate_distinct(conn: duckdb.DuckDBPyConnection, node) -> bool:
+    changed = False
+
+    def visit(value):
+        nonlocal changed
+        if isinstance(value, list):
+            for item in value:
+                visit(item)
+        elif isinstance(value, dict):
+            if (value.get("class") == "FUNCTION" and value.get("function_name", "").lower() == "count"
+                    and value.get("distinct") and len(value.get("children", [])) == 1):
+                value["function_name"] = "approx_count_distinct"
+                value["distinct"] = False
+                changed = True
+            for item in value.values():
+                visit(item)
+
+    visit(node)
+    return changed
+
+
+class CostGate:
+    """Aplica a política de custo e mantém as métricas de decisões."""
+
+    def __init__(
+        self,
+        limit_rows: int = 10_000,
+        approx_rows: int = 5_000_000,
+        refuse_rows: int = 200_000_000,
+    ):
+        """Inicializa o controle de custo.
+
+        Args:
+            limit_rows (int): Saída estimada a partir da qual um LIMIT é injetado.
+            approx_rows (int): Linhas estimadas na saída das varreduras (após os filtros) a partir das
+                quais ``COUNT(DISTINCT)`` vira aproximado.
+            refuse_rows (int): Cardinalidade estimada (em qualquer operador) que leva à recusa.
+        """
+        self.limit_rows = limit_rows
+        self.approx_rows = approx_rows
+        self.refuse_rows = refuse_rows
+        self._lock = threading.Lock()
+        self.counters = {"checked": 0, LIMIT: 0, APPROXIMATE: 0, REFUSE: 0, "explain_errors": 0}
+        self.max_estimated_rows = 0
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+    def check(self, conn: duckdb.DuckDBPyConnection, sql: str) -> GateDecision:
+        """Analisa a SQL e devolve a versão a executar.
+
+        Raises:
+            QueryRefusedError: Se o custo estimado exceder ``refuse_rows``.
+        """
+        self._count("checked")
+        try:
+            estimate = explain(conn, sql)
+        except duckdb.Error as e:
+            # Erros de sintaxe/binder aparecem de novo na execução, com a mensagem original.
+            logger.debug("EXPLAIN falhou: %s", e)
+            self._count("explain_errors")
+            return GateDecision(sql, OK, None)
+        with self._lock:
+            self.max_estimated_rows = max(self.max_estimated_rows, estimate.peak_rows)
+        logger.info(
+            "Estimativa: %d linhas varridas, pico de %d, saída de %d (tabelas: %s).",
+            estimate.scanned_rows, estimate.peak_rows, estimate.output_rows, ", ".join(estimate.tables) or "-"
+        )
+
+        if estimate.peak_rows > self.refuse_rows or estimate.nested_loop_rows > self.refuse_rows:
+            self._count(REFUSE)
+            logger.warning("Consulta recusada pelo controle de custo (pico estimado de %d linhas).", estimate.peak_rows)
+            rows = f"{estimate.peak_rows:,}".replace(",", ".")
+            raise QueryRefusedError(
+                f"A consulta processaria cerca de {rows} linhas e foi recusada. "
+                "Refine a pergunta com filtros como estado (UF), município, atividade (CNAE), "
+                "situação cadastral ou período de abertura."
+            )
+
+        if (estimate.scanned_rows > self.approx_rows and estimate.has_aggregate
+                and "DISTINCT" in sql.upper()):
+            approximated = self._rewrite(conn, sql, _approximate_distinct)
+            if approximated is not None:
+                self._count(APPROXIMATE)
+                logger.info("COUNT(DISTINCT) trocado por approx_count_distinct: %s", approximated)
+                return GateDecision(approximated, APPROXIMATE, estimate)
+
+        if not estimate.has_limit and not estimate.has_aggregate and estimate.output_rows > self.limit_rows:
+            limited = self._rewrite(conn, sql, _add_limit(self.limit_rows))
+            if limited is not None:
+                self._count(LIMIT)
+                logger.info("LIMIT %d injetado (saída estimada de %d linhas).", self.limit_rows, estimate.output_rows)
+                return GateDecision(limited, LIMIT, estimate)
+
+        return GateDecision(sql, OK, estimate)
+
+    def _rewrite(self, conn: duckdb.DuckDBPyConnection, sql: str, change) -> Optional[str]:
+        try:
+            return _modify(conn, sql, change)
+        except (duckdb.Error, KeyError, IndexError) as e:
+            logger.debug("Não foi possível reescrever a SQL: %s", e)
+            return None
+
+    def stats(self) -> dict:
+        """Retorna os contadores de decisões e a maior estimativa observada."""
+        with self._lock:
+            return {**self.counters, "max_estimated_rows": self.max_estimated_rows}
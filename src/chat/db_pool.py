@@ -0,0 +1,70 @@
+# db_pool.py
+"""
+Pool de conexões do DuckDB com executor dedicado.
+
+As consultas são executadas em threads próprias do pool, dimensionadas pelo
+número de conexões, e expostas como corrotinas. Assim uma varredura longa não
+bloqueia o event loop do asyncio nem disputa threads com as chamadas ao LLM.
+"""
+
+import asyncio
+import concurrent.futures
+import queue
+from contextlib import contextmanager
+from typing import Any, Callable
+
+import duckdb
+
+
+class DuckDBConnectionPool:
+    def __init__(self, db_path: str, max_connections: int = 4, read_only: bool = False):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.read_only = read_only
+        self.pool = queue.Queue(max_connections)
+        for _ in range(max_connections):
+            # Somente leitura, vários processos podem abrir o mesmo arquivo.
+            conn = duckdb.connect(db_path, read_only=read_only)
+            self.pool.put(conn)
+        # Uma thread por conexão: quem entra no executor nunca espera pelo pool.
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_connections, thread_name_prefix="duckdb"
+        )
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            self.pool.put(conn)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Executa ``fn(conn, *args)`` em uma thread do pool e aguarda o resultado.
+
+        Se a corrotina for cancelada, a consulta em andamento é interrompida.
+        """
+        loop = asyncio.get_running_loop()
+        holder = {}
+
+        def call():
+            with self.connection() as conn:
+                holder['conn'] = conn
+                try:
+                    return fn(conn, *args)
+                finally:
+                    holder.pop('conn', None)
+
+        try:
+            return await loop.run_in_executor(self.executor, call)
+        except asyncio.CancelledError:
+            conn = holder.get('conn')
+            if conn is not None:
+                conn.interrupt()
+            raise
+
+    def close(self) -> None:
+        """Encerra o executor e fecha todas as conexões."""
+        self.executor.shutdown(wait=True)
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
@@ -24,17 +24,35 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bgenai.proto\x12\x05genai\"#\n\x0fQuestionRequest\x12\x10\n\x08question\x18\x01 \x01(\t\" \n\x0e\x41nswerResponse\x12\x0e\n\x06\x61nswer\x18\x01 \x01(\t2L\n\x0cGenAiService\x12<\n\x0b\x41skQuestion\x12\x16.genai.QuestionRequest\x1a\x15.genai.AnswerResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bgenai.proto\x12\x05genai\"H\n\x0fQuestionRequest\x12\x10\n\x08question\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x12\n\nthread_key\x18\x03 \x01(\t\" \n\x0e\x41nswerResponse\x12\x0e\n\x06\x61nswer\x18\x01 \x01(\t\"\xc8\x01\n\x0b\x41nswerEvent\x12*\n\x04type\x18\x01 \x01(\x0e\x32\x1c.genai.AnswerEvent.EventType\x12\r\n\x05stage\x18\x02 \x01(\t\x12\x0e\n\x06\x64\x65tail\x18\x03 \x01(\t\x12\x17\n\x0f\x65lapsed_seconds\x18\x04 \x01(\x01\x12\r\n\x05token\x18\x05 \x01(\t\x12\x0e\n\x06\x61nswer\x18\x06 \x01(\t\"6\n\tEventType\x12\t\n\x05STAGE\x10\x00\x12\t\n\x05TOKEN\x10\x01\x12\x08\n\x04\x44ONE\x10\x02\x12\t\n\x05\x45RROR\x10\x03\",\n\x0b\x43npjRequest\x12\x0c\n\x04\x63npj\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\"b\n\x06Record\x12)\n\x06\x66ields\x18\x01 \x03(\x0b\x32\x19.genai.Record.FieldsEntry\x1a-\n\x0b\x46ieldsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\xa3\x01\n\x0c\x43npjResponse\x12\r\n\x05\x66ound\x18\x01 \x01(\x08\x12\x0c\n\x04\x63npj\x18\x02 \x01(\t\x12\x1e\n\x07\x65mpresa\x18\x03 \x01(\x0b\x32\r.genai.Record\x12\'\n\x10\x65stabelecimentos\x18\x04 \x03(\x0b\x32\r.genai.Record\x12\x1d\n\x06socios\x18\x05 \x03(\x0b\x32\r.genai.Record\x12\x0e\n\x06\x61nswer\x18\x06 \x01(\t\"K\n\x0c\x42\x61tchRequest\x12\x11\n\tquestions\x18\x01 \x03(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x17\n\x0fmax_concurrency\x18\x03 \x01(\r\"y\n\x0b\x42\x61tchAnswer\x12\r\n\x05index\x18\x01 \x01(\r\x12\x10\n\x08question\x18\x02 \x01(\t\x12\x0e\n\x06\x61nswer\x18\x03 \x01(\t\x12\n\n\x02ok\x18\x04 \x01(\x08\x12\x17\n\x0f\x65lapsed_seconds\x18\x05 \x01(\x01\x12\x14\n\x0c\x64\x65\x64uplicated\x18\x06 \x01(\x08\x32\x81\x02\n\x0cGenAiService\x12<\n\x0b\x41skQuestion\x12\x16.genai.QuestionRequest\x1a\x15.genai.AnswerResponse\x12\x41\n\x11\x41skQuestionStream\x12\x16.genai.QuestionRequest\x1a\x12.genai.AnswerEvent0\x01\x12\x35\n\nLookupCnpj\x12\x12.genai.CnpjRequest\x1a\x13.genai.CnpjResponse\x12\x39\n\x0c\x41skQuestions\x12\x13.genai.BatchRequest\x1a\x12.genai.BatchAnswer0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'genai_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_RECORD_FIELDSENTRY']._loaded_options = None
+  _globals['_RECORD_FIELDSENTRY']._serialized_options = b'8\001'
   _globals['_QUESTIONREQUEST']._serialized_start=22
-  _globals['_QUESTIONREQUEST']._serialized_end=57
-  _globals['_ANSWERRESPONSE']._serialized_start=59
-  _globals['_ANSWERRESPONSE']._serialized_end=91
-  _globals['_GENAISERVICE']._serialized_start=93
-  _globals['_GENAISERVICE']._serialized_end=169
+  _globals['_QUESTIONREQUEST']._serialized_end=94
+  _globals['_ANSWERRESPONSE']._serialized_start=96
+  _globals['_ANSWERRESPONSE']._serialized_end=128
+  _globals['_ANSWEREVENT']._serialized_start=131
+  _globals['_ANSWEREVENT']._serialized_end=331
+  _globals['_ANSWEREVENT_EVENTTYPE']._serialized_start=277
+  _globals['_ANSWEREVENT_EVENTTYPE']._serialized_end=331
+  _globals['_CNPJREQUEST']._serialized_start=333
+  _globals['_CNPJREQUEST']._serialized_end=377
+  _globals['_RECORD']._serialized_start=379
+  _globals['_RECORD']._serialized_end=477
+  _globals['_RECORD_FIELDSENTRY']._serialized_start=432
+  _globals['_RECORD_FIELDSENTRY']._serialized_end=477
+  _globals['_CNPJRESPONSE']._serialized_start=480
+  _globals['_CNPJRESPONSE']._serialized_end=643
+  _globals['_BATCHREQUEST']._serialized_start=645
+  _globals['_BATCHREQUEST']._serialized_end=720
+  _globals['_BATCHANSWER']._serialized_start=722
+  _globals['_BATCHANSWER']._serialized_end=843
+  _globals['_GENAISERVICE']._serialized_start=846
+  _globals['_GENAISERVICE']._serialized_end=1103
 # @@protoc_insertion_point(module_scope)
@@ -1,6 +1,7 @@
 # Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
 """Client and server classes corresponding to protobuf-defined services."""
 import grpc
+import warnings
 
 import genai_pb2 as genai__pb2
 
@@ -38,6 +39,21 @@ class GenAiServiceStub(object):
                 request_serializer=genai__pb2.QuestionRequest.SerializeToString,
                 response_deserializer=genai__pb2.AnswerResponse.FromString,
                 _registered_method=True)
+        self.AskQuestionStream = channel.unary_stream(
+                '/genai.GenAiService/AskQuestionStream',
+                request_serializer=genai__pb2.QuestionRequest.SerializeToString,
+                response_deserializer=genai__pb2.AnswerEvent.FromString,
+                _registered_method=True)
+        self.LookupCnpj = channel.unary_unary(
+                '/genai.GenAiService/LookupCnpj',
+                request_serializer=genai__pb2.CnpjRequest.SerializeToString,
+                response_deserializer=genai__pb2.CnpjResponse.FromString,
+                _registered_method=True)
+        self.AskQuestions = channel.unary_stream(
+                '/genai.GenAiService/AskQuestions',
+                request_serializer=genai__pb2.BatchRequest.SerializeToString,
+                response_deserializer=genai__pb2.BatchAnswer.FromString,
+                _registered_method=True)
 
 
 class GenAiServiceServicer(object):
@@ -49,6 +65,26 @@ class GenAiServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AskQuestionStream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def LookupCnpj(self, request, context):
+        """Consulta direta, sem LLM
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AskQuestions(self, request, context):
+        """Lote; respostas na ordem em que ficam prontas
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_GenAiServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -57,6 +93,21 @@ def add_GenAiServiceServicer_to_server(servicer, server):
                     request_deserializer=genai__pb2.QuestionRequest.FromString,
                     response_serializer=genai__pb2.AnswerResponse.SerializeToString,
             ),
+            'AskQuestionStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.AskQuestionStream,
+                    request_deserializer=genai__pb2.QuestionRequest.FromString,
+                    response_serializer=genai__pb2.AnswerEvent.SerializeToString,
+            ),
+            'LookupCnpj': grpc.unary_unary_rpc_method_handler(
+                    servicer.LookupCnpj,
+                    request_deserializer=genai__pb2.CnpjRequest.FromString,
+                    response_serializer=genai__pb2.CnpjResponse.SerializeToString,
+            ),
+            'AskQuestions': grpc.unary_stream_rpc_method_handler(
+                    servicer.AskQuestions,
+                    request_deserializer=genai__pb2.BatchRequest.FromString,
+                    response_serializer=genai__pb2.BatchAnswer.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'genai.GenAiService', rpc_method_handlers)
@@ -94,3 +145,84 @@ class GenAiService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def AskQuestionStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/genai.GenAiService/AskQuestionStream',
+            genai__pb2.QuestionRequest.SerializeToString,
+            genai__pb2.AnswerEvent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def LookupCnpj(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/genai.GenAiService/LookupCnpj',
+            genai__pb2.CnpjRequest.SerializeToString,
+            genai__pb2.CnpjResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AskQuestions(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/genai.GenAiService/AskQuestions',
+            genai__pb2.BatchRequest.SerializeToString,
+            genai__pb2.BatchAnswer.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
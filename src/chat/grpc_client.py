@@ -1,9 +1,11 @@
 # grpc_client.py
 
 import logging
+from typing import AsyncIterator
 from grpc import aio
 import genai_pb2
 import genai_pb2_grpc
+from tracing import TRACE_METADATA_KEY, new_trace_id
 
 
 class GRPCClient:
@@ -14,16 +16,56 @@ class GRPCClient:
         self.logger = logging.getLogger(__name__)
         self.logger.debug(f"GRPCClient inicializado com endereço {self.address}.")
 
-    async def ask_question(self, question: str) -> str:
+    def _metadata(self, trace_id: str) -> tuple:
+        """Metadata com o trace id da requisição (novo se não informado), que o servidor usa nos logs."""
+        trace_id = trace_id or new_trace_id()
+        self.logger.debug(f"Trace id da requisição: {trace_id}")
+        return ((TRACE_METADATA_KEY, trace_id),)
+
+    async def ask_question(self, question: str, user_id: str = "", thread_key: str = "", trace_id: str = "") -> str:
         """Envia uma pergunta ao serviço gRPC e retorna a resposta."""
         self.logger.info(f"Enviando pergunta via gRPC: {question}")
         try:
             async with aio.insecure_channel(self.address) as channel:
                 stub = genai_pb2_grpc.GenAiServiceStub(channel)
-                request = genai_pb2.QuestionRequest(question=question)
-                response = await stub.AskQuestion(request)
+                request = genai_pb2.QuestionRequest(question=question, user_id=user_id, thread_key=thread_key)
+                response = await stub.AskQuestion(request, metadata=self._metadata(trace_id))
                 self.logger.debug(f"Recebida resposta do gRPC: {response.answer}")
                 return response.answer
         except Exception as e:
             self.logger.error(f"Erro na comunicação gRPC: {e}", exc_info=True)
             return "Desculpe, ocorreu um erro ao processar sua pergunta."
+
+    async def ask_question_stream(
+        self, question: str, user_id: str = "", thread_key: str = "", trace_id: str = ""
+    ) -> AsyncIterator[genai_pb2.AnswerEvent]:
+        """Envia uma pergunta ao serviço gRPC e produz os eventos de progresso e os trechos da resposta."""
+        self.logger.info(f"Enviando pergunta via gRPC (stream): {question}")
+        async with aio.insecure_channel(self.address) as channel:
+            stub = genai_pb2_grpc.GenAiServiceStub(channel)
+            request = genai_pb2.QuestionRequest(question=question, user_id=user_id, thread_key=thread_key)
+            async for event in stub.AskQuestionStream(request, metadata=self._metadata(trace_id)):
+                yield event
+
+    async def lookup_cnpj(self, cnpj: str, user_id: str = "", trace_id: str = "") -> genai_pb2.CnpjResponse:
+        """Consulta uma empresa diretamente pelo CNPJ (sem LLM)."""
+        self.logger.info(f"Consultando CNPJ via gRPC: {cnpj}")
+        async with aio.insecure_channel(self.address) as channel:
+            stub = genai_pb2_grpc.GenAiServiceStub(channel)
+            return await stub.LookupCnpj(
+                genai_pb2.CnpjRequest(cnpj=cnpj, user_id=user_id), metadata=self._metadata(trace_id)
+            )
+
+    async def ask_questions(
+        self, questions: list[str], user_id: str = "", max_concurrency: int = 0, trace_id: str = ""
+    ) -> AsyncIterator[genai_pb2.BatchAnswer]:
+        """Envia um lote de perguntas em uma única chamada e produz as respostas à medida que ficam prontas.
+
+        Cada resposta traz ``index``, a posição da pergunta no lote.
+        """
+        self.logger.info(f"Enviando lote de {len(questions)} perguntas via gRPC.")
+        async with aio.insecure_channel(self.address) as channel:
+            stub = genai_pb2_grpc.GenAiServiceStub(channel)
+            request = genai_pb2.BatchRequest(questions=questions, user_id=user_id, max_concurrency=max_concurrency)
+            async for answer in stub.AskQuestions(request, metadata=self._metadata(trace_id)):
+                yield answer
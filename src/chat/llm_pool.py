@@ -0,0 +1,175 @@
+# llm_pool.py
+"""
+Chamadas assíncronas ao LLM com limite de concorrência próprio.
+
+Os nós do grafo chamavam ``model.invoke`` dentro de um ``ThreadPoolExecutor``
+global de 4 workers, o que limitava o servidor inteiro a quatro chamadas
+simultâneas ao LLM. Aqui as chamadas usam ``ainvoke``/``astream`` sobre um
+único ``httpx.AsyncClient`` com conexões keep-alive, e um semáforo separado do
+DuckDB define quantas podem estar em andamento. As demais aguardam na fila,
+com métricas de profundidade e tempo de espera.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Optional
+
+import tracing
+
+if TYPE_CHECKING:
+    from langchain_openai.chat_models import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+WAIT_SAMPLES = 1000
+
+
+def build_chat_model(
+    model_name: str = "gpt-4o-mini",
+    temperature: float = 0,
+    max_tokens: Optional[int] = None,
+    max_connections: int = 32,
+    timeout: float = 60.0,
+) -> "ChatOpenAI":
+    """Cria o ``ChatOpenAI`` com um pool HTTP assíncrono compartilhado.
+
+    Args:
+        model_name (str): Modelo da OpenAI.
+        temperature (float): Temperatura de amostragem.
+        max_tokens (Optional[int]): Limite de tokens da resposta.
+        max_connections (int): Conexões HTTP simultâneas (mantidas abertas entre chamadas).
+        timeout (float): Tempo limite de cada requisição, em segundos.
+    """
+    # Importados aqui: o cliente da OpenAI sozinho leva ~1 s para importar.
+    import httpx
+    from langchain_openai.chat_models import ChatOpenAI
+
+    http_async_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60.0,
+        ),
+        timeout=httpx.Timeout(timeout, connect=10.0),
+    )
+    return ChatOpenAI(
+        model_name=model_name,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        http_async_client=http_async_client,
+        stream_usage=True,  # Contagem de tokens também nas respostas em streaming
+    )
+
+
+def record_usage(message) -> None:
+    """Soma ao span do nó os tokens informados pelo modelo (``usage_metadata``), se houver."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        tracing.add_tokens(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+
+class LLMClientPool:
+    """Limita e mede as chamadas assíncronas ao modelo."""
+
+    def __init__(self, model=None, max_concurrent: int = 16, factory: Optional[Callable[[], object]] = None):
+        """Inicializa o pool.
+
+        Args:
+            model: Modelo LangChain com ``ainvoke`` e ``astream``.
+            max_concurrent (int): Chamadas ao LLM em andamento ao mesmo tempo.
+            factory: Cria o modelo no primeiro uso, quando ``model`` não é informado.
+        """
+        self._model = model
+        self._factory = factory
+        self._model_lock = threading.Lock()
+        self.max_concurrent = max_concurrent
+        self._semaphore = None
+        self._running = 0
+        self._waiting = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.calls = 0
+        self.errors = 0
+        self.call_seconds_total = 0.0
+
+    @property
+    def model(self):
+        """Modelo usado nas chamadas (criado pela ``factory`` no primeiro acesso)."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._factory()
+        return self._model
+
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+
+    async def _acquire(self) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        waited = time.perf_counter() - start
+        self._waits.append(waited)
+        tracing.record_wait("llm", waited)
+        self._running += 1
+
+    def _release(self, started: float, failed: bool) -> None:
+        self._running -= 1
+        self._semaphore.release()
+        self.calls += 1
+        self.errors += failed
+        self.call_seconds_total += time.perf_counter() - started
+
+    async def ainvoke(self, messages):
+        """Executa o modelo e retorna a mensagem de resposta."""
+        await self._acquire()
+        started, failed = time.perf_counter(), True
+        try:
+            response = await self.model.ainvoke(messages)
+            failed = False
+            record_usage(response)
+            return response
+        finally:
+            self._release(started, failed)
+
+    async def astream(self, messages, on_token: Callable[[str], None]) -> str:
+        """Executa o modelo em modo streaming, repassando cada trecho a ``on_token``.
+
+        Returns:
+            str: Texto completo gerado.
+        """
+        await self._acquire()
+        started, failed = time.perf_counter(), True
+        try:
+            parts = []
+            async for chunk in self.model.astream(messages):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    on_token(chunk.content)
+                record_usage(chunk)
+            failed = False
+            return "".join(parts)
+        finally:
+            self._release(started, failed)
+
+    def stats(self) -> dict:
+        """Profundidade da fila, chamadas em andamento e tempos de espera."""
+        waits = sorted(self._waits)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": self._running,
+            "queue_depth": self._waiting,
+            "calls_total": self.calls,
+            "errors_total": self.errors,
+            "call_seconds_total": self.call_seconds_total,
+            "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p99": waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0,
+        }
@@ -1,13 +1,17 @@
 # main.py
 
 import time
+import uuid
+from typing import TYPE_CHECKING
 import streamlit as st
 import asyncio
 from auth import AuthManager
-from grpc_client import GRPCClient
 from message_handler import MessageHandler
 from utils import initialize_session, setup_logging
 
+if TYPE_CHECKING:
+    from grpc_client import GRPCClient
+
 logger = setup_logging()
 logger.info("Aplicativo Chat Empresas iniciado.")
 
@@ -15,6 +19,13 @@ USER_AVATAR = "🧑‍⚕️"
 BOT_AVATAR = "🤖"
 
 
+@st.cache_resource
+def get_grpc_client() -> "GRPCClient":
+    """Cliente gRPC único do processo; o gRPC e os stubs só são importados no primeiro uso."""
+    from grpc_client import GRPCClient
+    return GRPCClient()
+
+
 def show_auth_interface() -> tuple[str, str]:
     """Exibe a interface de autenticação na sidebar e retorna a ação escolhida e o e-mail informado."""
     auth_option = st.sidebar.radio(
@@ -29,6 +40,16 @@ def show_auth_interface() -> tuple[str, str]:
     return None, None
 
 
+def ensure_thread_key(auth_manager: AuthManager, email: str) -> str:
+    """Recupera a chave da thread do usuário, criando e salvando uma nova se ainda não existir."""
+    thread_key = auth_manager.thread_key or auth_manager.db_manager.get_thread_key(email)
+    if not thread_key:
+        thread_key = uuid.uuid4().hex
+        auth_manager.db_manager.set_thread_key(email, thread_key)
+        logger.info(f"Nova chave de thread criada para o usuário {email}.")
+    return thread_key
+
+
 def perform_auth(auth_manager: AuthManager, action: str, email: str) -> bool:
     """Realiza o registro ou login de acordo com a ação e o e-mail fornecidos."""
     if not email:
@@ -42,6 +63,7 @@ def perform_auth(auth_manager: AuthManager, action: str, email: str) -> bool:
             st.sidebar.success("Registro bem-sucedido!")
             st.session_state.is_logged_in = True
             st.session_state.useremail = email
+            st.session_state.thread_key = ensure_thread_key(auth_manager, email)
             logger.info(f"Usuário {email} registrado e logado com sucesso.")
             return True
         else:
@@ -54,6 +76,7 @@ def perform_auth(auth_manager: AuthManager, action: str, email: str) -> bool:
             st.sidebar.success("Login bem-sucedido!")
             st.session_state.is_logged_in = True
             st.session_state.useremail = email
+            st.session_state.thread_key = ensure_thread_key(auth_manager, email)
             logger.info(f"Usuário {email} autenticado e logado com sucesso.")
             return True
         else:
@@ -62,14 +85,16 @@ def perform_auth(auth_manager: AuthManager, action: str, email: str) -> bool:
             return False
 
 
-def get_assistant_response(grpc_client: GRPCClient, question: str) -> tuple[str, float]:
+def get_assistant_response(grpc_client: "GRPCClient", question: str) -> tuple[str, float]:
     """
     Obtém a resposta do assistente via gRPC para a pergunta informada e mede o tempo de processamento.
     Retorna uma tupla com a resposta e o tempo decorrido (em segundos).
     """
     start_time = time.perf_counter()
     try:
-        response = asyncio.run(grpc_client.ask_question(question))
+        response = asyncio.run(grpc_client.ask_question(
+            question, user_id=st.session_state.useremail, thread_key=st.session_state.thread_key
+        ))
         logger.info(f"Resposta recebida para a pergunta '{question}': {response}")
     except Exception as e:
         logger.error(f"Erro ao obter resposta para a pergunta '{question}': {e}", exc_info=True)
@@ -79,6 +104,41 @@ def get_assistant_response(grpc_client: GRPCClient, question: str) -> tuple[str,
     return response, processing_time
 
 
+def stream_assistant_response(grpc_client: "GRPCClient", question: str, status_placeholder, message_placeholder) -> tuple[str, float]:
+    """
+    Obtém a resposta do assistente via gRPC em modo streaming, exibindo as etapas do
+    pipeline e os trechos da resposta à medida que chegam.
+    Retorna uma tupla com a resposta final e o tempo decorrido (em segundos).
+    """
+    import genai_pb2
+    Event = genai_pb2.AnswerEvent
+    start_time = time.perf_counter()
+
+    async def consume() -> str:
+        partial = ""
+        async for event in grpc_client.ask_question_stream(
+            question, user_id=st.session_state.useremail, thread_key=st.session_state.thread_key
+        ):
+            if event.type == Event.STAGE:
+                status_placeholder.caption(f"{event.detail} ({event.elapsed_seconds:.1f}s)")
+            elif event.type == Event.TOKEN:
+                partial += event.token
+                message_placeholder.markdown(partial + "▌")
+            elif event.type in (Event.DONE, Event.ERROR):
+                return event.answer
+        return partial
+
+    try:
+        response = asyncio.run(consume())
+        logger.info(f"Resposta recebida para a pergunta '{question}': {response}")
+    except Exception as e:
+        logger.error(f"Erro ao obter resposta para a pergunta '{question}': {e}", exc_info=True)
+        response = "Desculpe, ocorreu um erro ao processar sua pergunta."
+    status_placeholder.empty()
+    processing_time = time.perf_counter() - start_time
+    return response, processing_time
+
+
 def display_chat_history(messages: list):
     """Exibe o histórico de mensagens no chat."""
     for message in messages:
@@ -87,7 +147,7 @@ def display_chat_history(messages: list):
             st.markdown(message["content"])
 
 
-def chat_interface(grpc_client: GRPCClient):
+def chat_interface(grpc_client: "GRPCClient"):
     """Renderiza a interface do chat para o usuário autenticado."""
     message_handler = MessageHandler(user_email=st.session_state.useremail)
     st.sidebar.text(f"Usuário: {st.session_state.useremail}")
@@ -104,9 +164,11 @@ def chat_interface(grpc_client: GRPCClient):
             st.markdown(user_question)
 
         with st.chat_message("assistant", avatar=BOT_AVATAR):
+            status_placeholder = st.empty()
             message_placeholder = st.empty()
-            with st.spinner("Processando..."):
-                response, processing_time = get_assistant_response(grpc_client, user_question)
+            response, processing_time = stream_assistant_response(
+                grpc_client, user_question, status_placeholder, message_placeholder
+            )
             # Exibe a resposta juntamente com o tempo de processamento de forma discreta
             message_placeholder.markdown(
                 f"{response}\n\n<sub>Tempo de resposta: {processing_time:.2f} segundos</sub>",
@@ -126,7 +188,6 @@ def main():
     st.sidebar.header("Você é novo por aqui?")
 
     auth_manager = AuthManager()
-    grpc_client = GRPCClient()
 
     if not st.session_state.get("is_logged_in", False):
         action, email = show_auth_interface()
@@ -136,7 +197,7 @@ def main():
     if st.session_state.get("is_logged_in", False):
         st.sidebar.empty()  # Limpa a sidebar após o login
         logger.debug(f"Exibindo interface de chat para o usuário {st.session_state.useremail}.")
-        chat_interface(grpc_client)
+        chat_interface(get_grpc_client())
     else:
         st.error("Por favor, faça o login para continuar.")
         logger.info("Acesso negado: usuário não autenticado.")
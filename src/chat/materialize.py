@@ -0,0 +1,287 @@
+# materialize.py
+"""
+Materialização da tabela ``resultados_consulta``.
+
+A consulta do chat é feita sobre o join empresas × estabelecimentos × sócios ×
+municípios. Como VIEW, cada SQL gerada refaz o glob dos Parquets, relê os
+footers e reexecuta o join. Este módulo grava o join uma única vez em uma
+tabela nativa do DuckDB, com tipos adequados (CAPITAL_SOCIAL como DOUBLE,
+datas como DATE) e ordenada por CNPJ_BASICO.
+
+Uso:
+    python src/chat/materialize.py --db dados_empresas.duckdb --data-dir data
+"""
+
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import time
+from typing import Optional
+
+import duckdb
+
+import cnpj_lookup
+import name_index
+import rollups
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "dados_empresas.duckdb"
+DEFAULT_DATA_DIR = os.getenv("CHAT_EMPRESAS_DATA_DIR", "data")
+TABLE_NAME = "resultados_consulta"
+BUILD_TABLE_NAME = f"{TABLE_NAME}__build"
+DATASET_INFO_TABLE = "dataset_info"
+
+
+def resultados_consulta_select(data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """Retorna o SELECT tipado do join usado tanto pela VIEW quanto pela tabela.
+
+    Args:
+        data_dir (str): Diretório que contém as pastas ``parquet_*``.
+
+    Returns:
+        str: Comando SELECT com o join completo.
+    """
+    return f"""
+    SELECT
+        e.CNPJ_BASICO
+        , e.RAZAO_SOCIAL
+        , e.NATUREZA_JURIDICA
+        , e.QUALIFICACAO_RESPONSAVEL
+        , TRY_CAST(REPLACE(REPLACE(e.CAPITAL_SOCIAL, '.', ''), ',', '.') AS DOUBLE) AS CAPITAL_SOCIAL
+        , e.PORTE_EMPRESA
+        , e.ENTE_FEDERATIVO_RESPONSAVEL
+        , est.CNPJ_ORDEM
+        , est.CNPJ_DV
+        , est.IDENTIFICADOR_MATRIZ_FILIAL
+        , est.NOME_FANTASIA
+        , est.SITUACAO_CADASTRAL
+        , CAST(TRY_STRPTIME(est.DATA_SITUACAO_CADASTRAL, '%Y%m%d') AS DATE) AS DATA_SITUACAO_CADASTRAL
+        , est.MOTIVO_SITUACAO_CADASTRAL
+        , est.NOME_CIDADE_EXTERIOR
+        , est.PAIS
+        , CAST(TRY_STRPTIME(est.DATA_INICIO_ATIVIDADE, '%Y%m%d') AS DATE) AS DATA_INICIO_ATIVIDADE
+        , est.CNAE_FISCAL_PRINCIPAL
+        , est.CNAE_FISCAL_SECUNDARIA
+        , est.TIPO_LOGRADOURO
+        , est.LOGRADOURO
+        , est.NUMERO
+        , est.COMPLEMENTO
+        , est.BAIRRO
+        , est.CEP
+        , est.UF
+        , est.MUNICIPIO
+        , est.DDD_1
+        , est.TELEFONE_1
+        , est.DDD_2
+        , est.TELEFONE_2
+        , est.DDD_FAX
+        , est.FAX
+        , est.CORREIO_ELETRONICO
+        , est.SITUACAO_ESPECIAL
+        , CAST(TRY_STRPTIME(est.DATA_SITUACAO_ESPECIAL, '%Y%m%d') AS DATE) AS DATA_SITUACAO_ESPECIAL
+        , s.IDENTIFICADOR_SOCIO
+        , s.NOME_SOCIO
+        , s.CNPJ_CPF_SOCIO
+        , s.QUALIFICACAO_SOCIO
+        , CAST(TRY_STRPTIME(s.DATA_ENTRADA_SOCIEDADE, '%Y%m%d') AS DATE) AS DATA_ENTRADA_SOCIEDADE
+        , s.PAIS AS PAIS_SOCIO
+        , s.REPRESENTANTE_LEGAL
+        , s.NOME_REPRESENTANTE
+        , s.QUALIFICACAO_REPRESENTANTE
+        , s.FAIXA_ETARIA
+        , m.NOME_MUNICIPIO
+    FROM
+        parquet_scan('{data_dir}/parquet_empresas/*.parquet') AS e
+    LEFT JOIN
+        parquet_scan('{data_dir}/parquet_estabelecimentos/*.parquet') AS est
+        ON e.CNPJ_BASICO = est.CNPJ_BASICO
+    LEFT JOIN
+        parquet_scan('{data_dir}/parquet_socios/*.parquet') AS s
+        ON e.CNPJ_BASICO = s.CNPJ_BASICO
+    LEFT JOIN
+        parquet_scan('{data_dir}/parquet_municipios/*.parquet') AS m
+        ON est.MUNICIPIO = m.CODIGO_MUNICIPIO
+    """
+
+
+def relation_kind(conn: duckdb.DuckDBPyConnection, name: str = TABLE_NAME):
+    """Indica se ``name`` existe como 'table', 'view' ou None."""
+    if conn.execute(
+        "SELECT 1 FROM duckdb_tables() WHERE table_name = ? AND NOT temporary", [name]
+    ).fetchone():
+        return "table"
+    if conn.execute(
+        "SELECT 1 FROM duckdb_views() WHERE view_name = ? AND NOT internal", [name]
+    ).fetchone():
+        return "view"
+    return None
+
+
+def create_view(conn: duckdb.DuckDBPyConnection, data_dir: str = DEFAULT_DATA_DIR) -> None:
+    """Cria ``resultados_consulta`` como VIEW sobre os Parquets (modo sem materialização)."""
+    logger.info("Criando a view %s sobre os Parquets em %s...", TABLE_NAME, data_dir)
+    conn.execute(f"CREATE VIEW {TABLE_NAME} AS {resultados_consulta_select(data_dir)}")
+
+
+def build_resultados_consulta(
+    conn: duckdb.DuckDBPyConnection,
+    data_dir: str = DEFAULT_DATA_DIR,
+    force: bool = False,
+    max_rollup_dims: int = rollups.DEFAULT_MAX_DIMS,
+    name_index_dir: Optional[str] = None,
+) -> bool:
+    """Materializa o join em uma tabela nativa do DuckDB.
+
+    A tabela é construída em ``resultados_consulta__build`` e só substitui a
+    relação existente (tabela ou view) ao final, dentro de uma transação, de
+    modo que leitores nunca vejam uma tabela pela metade. Em seguida os
+    rollups agregados, o índice de row groups por CNPJ e o índice de
+    trigramas dos nomes são reconstruídos a partir da nova tabela.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Conexão de escrita com o banco.
+        data_dir (str): Diretório que contém as pastas ``parquet_*``.
+        force (bool): Reconstrói mesmo que a tabela já exista.
+        max_rollup_dims (int): Dimensões por grouping set nos rollups (0 desativa).
+        name_index_dir (Optional[str]): Diretório do índice de trigramas (None não constrói).
+
+    Returns:
+        bool: True se a tabela foi (re)construída, False se já existia.
+    """
+    kind = relation_kind(conn)
+    if kind == "table" and not force:
+        logger.info("Tabela %s já materializada; nada a fazer.", TABLE_NAME)
+        return False
+
+    logger.info("Materializando a tabela %s a partir de %s...", TABLE_NAME, data_dir)
+    start = time.perf_counter()
+    # Sem preservar a ordem de inserção o DuckDB consegue gravar em paralelo
+    # com bem menos memória; a ordem final vem do ORDER BY.
+    conn.execute("SET preserve_insertion_order = false")
+    conn.execute(f"DROP TABLE IF EXISTS {BUILD_TABLE_NAME}")
+    conn.execute(
+        f"CREATE TABLE {BUILD_TABLE_NAME} AS "
+        f"{resultados_consulta_select(data_dir)} ORDER BY e.CNPJ_BASICO"
+    )
+
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        kind = relation_kind(conn)
+        if kind == "view":
+            conn.execute(f"DROP VIEW {TABLE_NAME}")
+        elif kind == "table":
+            conn.execute(f"DROP TABLE {TABLE_NAME}")
+        conn.execute(f"ALTER TABLE {BUILD_TABLE_NAME} RENAME TO {TABLE_NAME}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    version = parquet_fingerprint(data_dir)
+    conn.execute(
+        f"CREATE OR REPLACE TABLE {DATASET_INFO_TABLE} AS "
+        "SELECT ? AS versao, current_timestamp AS construido_em",
+        [version]
+    )
+    if max_rollup_dims > 0:
+        rollups.build_rollups(conn, max_dims=max_rollup_dims)
+    else:
+        # Um rollup antigo ficaria inconsistente com a nova tabela.
+        conn.execute(f"DROP TABLE IF EXISTS {rollups.ROLLUP_TABLE}")
+    cnpj_lookup.build_row_group_index(conn)
+    conn.execute("CHECKPOINT")
+    if name_index_dir:
+        name_index.build_name_index(conn, name_index_dir, version=version)
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+    logger.info(
+        "Tabela %s materializada com %d linhas em %.1fs.",
+        TABLE_NAME, total, time.perf_counter() - start
+    )
+    return True
+
+
+def parquet_fingerprint(data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """Gera uma impressão digital dos Parquets (nome, tamanho e mtime de cada arquivo)."""
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(data_dir, "parquet_*", "*.parquet"))):
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def dataset_version(conn: duckdb.DuckDBPyConnection, data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """Retorna a versão do conjunto de dados consultado.
+
+    Com a tabela materializada, é a versão gravada em ``dataset_info`` no
+    momento da construção; no modo VIEW, a impressão digital dos Parquets.
+    """
+    if relation_kind(conn) == "table" and relation_kind(conn, DATASET_INFO_TABLE) == "table":
+        row = conn.execute(f"SELECT versao FROM {DATASET_INFO_TABLE}").fetchone()
+        if row:
+            return row[0]
+    return parquet_fingerprint(data_dir)
+
+
+def ensure_resultados_consulta(
+    conn: duckdb.DuckDBPyConnection, data_dir: str = DEFAULT_DATA_DIR
+) -> str:
+    """Garante que ``resultados_consulta`` exista, criando a VIEW como fallback.
+
+    Returns:
+        str: 'table' se a tabela materializada estiver disponível, 'view' caso contrário.
+    """
+    kind = relation_kind(conn)
+    if kind is None:
+        logger.warning(
+            "Tabela %s não materializada; usando VIEW sobre os Parquets. "
+            "Execute materialize.py (ou o servidor com --materialize) para acelerar as consultas.",
+            TABLE_NAME
+        )
+        create_view(conn, data_dir)
+        kind = "view"
+    return kind
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Materializa a tabela resultados_consulta no DuckDB."
+    )
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Arquivo DuckDB de destino.")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Diretório com as pastas parquet_*.")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Threads do DuckDB.")
+    parser.add_argument("--force", action="store_true", help="Reconstrói mesmo que a tabela já exista.")
+    parser.add_argument(
+        "--rollup-dims", type=int, default=rollups.DEFAULT_MAX_DIMS,
+        help="Dimensões por grouping set nos rollups (0 para não construir rollups)."
+    )
+    parser.add_argument(
+        "--name-index-dir", default=None,
+        help="Diretório do índice de trigramas dos nomes (padrão: <db>_name_index)."
+    )
+    parser.add_argument(
+        "--no-name-index", action="store_true", help="Não constrói o índice de trigramas dos nomes."
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+    )
+    conn = duckdb.connect(args.db)
+    try:
+        conn.execute(f"PRAGMA threads={args.threads}")
+        build_resultados_consulta(
+            conn, args.data_dir, force=args.force, max_rollup_dims=args.rollup_dims,
+            name_index_dir=None if args.no_name_index else (
+                args.name_index_dir or name_index.default_directory(args.db)
+            ),
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# memory_governor.py
+"""
+Governador de memória do servidor.
+
+Substitui as chamadas indiscriminadas a ``gc.collect()`` e o limite fixo sobre a
+memória total do sistema. O governador:
+
+- acompanha o RSS do processo e a memória de trabalho do próprio DuckDB
+  (``duckdb_memory()``, sem os caches de blocos e de metadados, que o banco
+  descarta sozinho quando precisa de espaço);
+- configura o ``memory_limit`` e o ``temp_directory`` do DuckDB, permitindo que
+  consultas grandes derramem para disco em vez de serem recusadas;
+- admite cada consulta reservando uma fatia do orçamento, enfileirando as
+  demais enquanto não houver memória disponível;
+- só dispara a coleta de lixo quando o processo está sob pressão.
+
+O ``memory_limit`` do DuckDB vale para a instância inteira do banco (todas as
+conexões do pool), por isso a fatia de cada consulta é controlada aqui, na
+admissão, e não por um SET em cada conexão. A reserva de fatias é uma
+estimativa; a medição do DuckDB, amostrada na thread do pool ao fim de cada
+consulta (consultá-la no event loop exigiria uma conexão), corrige a admissão
+quando as consultas em andamento usam mais do que a fatia.
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import duckdb
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Tags do ``duckdb_memory()`` que são caches descartáveis, não memória de consultas.
+EVICTABLE_MEMORY_TAGS = ("BASE_TABLE", "EXTERNAL_FILE_CACHE", "OBJECT_CACHE")
+
+
+class MemoryPressureError(Exception):
+    """A consulta não pôde ser admitida dentro do tempo de espera."""
+
+
+class MemoryGovernor:
+    """Controla o orçamento de memória do processo e a admissão de consultas."""
+
+    def __init__(
+        self,
+        budget_bytes: Optional[int] = None,
+        duckdb_fraction: float = 0.6,
+        max_concurrent_queries: int = 4,
+        temp_directory: Optional[str] = None,
+        gc_high_watermark: float = 0.85,
+        gc_min_interval: float = 5.0,
+        processes: int = 1,
+        worker: Optional[int] = None,
+    ):
+        """Inicializa o governador.
+
+        Args:
+            budget_bytes (Optional[int]): Orçamento total do processo. Padrão: 70% da RAM.
+            duckdb_fraction (float): Fração do orçamento reservada ao DuckDB.
+            max_concurrent_queries (int): Consultas simultâneas; define a fatia de cada uma.
+            temp_directory (Optional[str]): Diretório de spill do DuckDB.
+            gc_high_watermark (float): Fração do orçamento a partir da qual o GC é acionado.
+            gc_min_interval (float): Intervalo mínimo, em segundos, entre coletas forçadas.
+            processes (int): Processos servidores que dividem a máquina (o orçamento é repartido).
+            worker (Optional[int]): Índice do processo; cada worker derrama em um subdiretório próprio.
+        """
+        total = psutil.virtual_memory().total
+        self.budget_bytes = (budget_bytes or int(total * 0.7)) // max(1, processes)
+        self.duckdb_limit_bytes = int(self.budget_bytes * duckdb_fraction)
+        self.query_slice_bytes = self.duckdb_limit_bytes // max(1, max_concurrent_queries)
+        self.temp_directory = temp_directory or os.path.join(tempfile.gettempdir(), "chat_empresas_spill")
+        if worker is not None:
+            self.temp_directory = os.path.join(self.temp_directory, f"worker-{worker}")
+        self.gc_high_watermark = gc_high_watermark
+        self.gc_min_interval = gc_min_interval
+        self._process = psutil.Process()
+        self._reserved_bytes = 0
+        self._duckdb_bytes = 0
+        self._running = 0
+        self._waiting = 0
+        self._condition = None
+        self._last_gc = 0.0
+        self.collections = 0
+        self.queued = 0
+        self.rejected = 0
+
+    # -------------------------------------------------------------------------
+    # Medições
+    # -------------------------------------------------------------------------
+    def rss_bytes(self) -> int:
+        """Memória residente do processo."""
+        return self._process.memory_info().rss
+
+    @staticmethod
+    def duckdb_bytes(conn: duckdb.DuckDBPyConnection) -> int:
+        """Memória de trabalho alocada pelo DuckDB (buffer manager), sem os caches descartáveis."""
+        tags = ", ".join(f"'{tag}'" for tag in EVICTABLE_MEMORY_TAGS)
+        row = conn.execute(
+            f"SELECT COALESCE(SUM(memory_usage_bytes), 0) FROM duckdb_memory() WHERE tag NOT IN ({tags})"
+        ).fetchone()
+        return int(row[0])
+
+    def sample_duckdb(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """Atualiza a medição do DuckDB usada na admissão (chamado na thread do pool)."""
+        try:
+            self._duckdb_bytes = self.duckdb_bytes(conn)
+        except duckdb.Error as e:
+            logger.debug("Falha ao medir a memória do DuckDB: %s", e)
+
+    def under_pressure(self) -> bool:
+        """Indica se o RSS ultrapassou a marca d'água do orçamento."""
+        return self.rss_bytes() >= self.budget_bytes * self.gc_high_watermark
+
+    # -------------------------------------------------------------------------
+    # Configuração do DuckDB
+    # -------------------------------------------------------------------------
+    def configure(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """Aplica limite de memória e diretório de spill à instância do DuckDB."""
+        os.makedirs(self.temp_directory, exist_ok=True)
+        conn.execute(f"SET memory_limit = '{self.duckdb_limit_bytes // 1024 ** 2}MB'")
+        conn.execute(f"SET temp_directory = '{self.temp_directory}'")
+        self.sample_duckdb(conn)
+        logger.info(
+            "DuckDB configurado com memory_limit=%d MB e spill em %s (fatia por consulta: %d MB).",
+            self.duckdb_limit_bytes // 1024 ** 2, self.temp_directory, self.query_slice_bytes // 1024 ** 2
+        )
+
+    # -------------------------------------------------------------------------
+    # Coleta de lixo sob pressão
+    # -------------------------------------------------------------------------
+    def maybe_collect(self, force: bool = False) -> bool:
+        """Executa ``gc.collect()`` apenas se o processo estiver sob pressão de memória.
+
+        Returns:
+            bool: True se a coleta foi executada.
+        """
+        now = time.monotonic()
+        if not force and (now - self._last_gc < self.gc_min_interval or not self.under_pressure()):
+            return False
+        self._last_gc = now
+        freed = gc.collect()
+        self.collections += 1
+        logger.info("Pressão de memória: gc.collect() liberou %d objetos.", freed)
+        return True
+
+    # -------------------------------------------------------------------------
+    # Admissão de consultas
+    # -------------------------------------------------------------------------
+    def _can_admit(self) -> bool:
+        if self._running == 0:
+            # Sem consultas em andamento esperar não libera memória: admite e
+            # deixa o DuckDB derramar para disco se for preciso.
+            return True
+        if self._reserved_bytes + self.query_slice_bytes > self.duckdb_limit_bytes:
+            return False
+        if self._duckdb_bytes + self.query_slice_bytes > self.duckdb_limit_bytes:
+            return False
+        return self.rss_bytes() + self.query_slice_bytes <= self.budget_bytes
+
+    @asynccontextmanager
+    async def admit(self, timeout: Optional[float] = 30.0):
+        """Reserva uma fatia do orçamento para uma consulta, aguardando na fila se necessário.
+
+        Raises:
+            MemoryPressureError: Se a reserva não for obtida dentro de ``timeout``.
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            if not self._can_admit():
+                self.queued += 1
+                self._waiting += 1
+                self.maybe_collect()
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(self._can_admit), timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    raise MemoryPressureError(
+                        f"Memória insuficiente para executar a consulta após {timeout:.0f}s de espera "
+                        f"(RSS {self.rss_bytes() / 1024 ** 2:.0f} MB de {self.budget_bytes / 1024 ** 2:.0f} MB)."
+                    )
+                finally:
+                    self._waiting -= 1
+            self._reserved_bytes += self.query_slice_bytes
+            self._running += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._reserved_bytes -= self.query_slice_bytes
+                self._running -= 1
+                self._condition.notify_all()
+
+    async def wake_waiters(self) -> None:
+        """Reavalia a fila (ex.: após uma coleta ter reduzido o RSS)."""
+        if self._condition is not None and self._waiting:
+            async with self._condition:
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Retorna o estado atual do orçamento e os contadores."""
+        return {
+            "rss_bytes": self.rss_bytes(),
+            "budget_bytes": self.budget_bytes,
+            "duckdb_limit_bytes": self.duckdb_limit_bytes,
+            "duckdb_bytes": self._duckdb_bytes,
+            "reserved_bytes": self._reserved_bytes,
+            "running": self._running,
+            "waiting": self._waiting,
+            "queued_total": self.queued,
+            "rejected_total": self.rejected,
+            "collections": self.collections,
+        }
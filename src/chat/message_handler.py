@@ -1,7 +1,7 @@
 # message_handler.py
 
 import logging
-from authenticate import DatabaseManager, MessageService
+from authenticate import MessageService, get_database_manager
 
 MESSAGE_LIMIT = 1000  # Defina o limite de mensagens aqui
 
@@ -23,7 +23,7 @@ class MessageHandler:
         self.user_email = user_email
         self.logger = logging.getLogger(__name__)
         self.logger.debug(f"MessageHandler inicializado para o usuário {self.user_email}.")
-        self.db_manager = DatabaseManager()
+        self.db_manager = get_database_manager()
         self.message_service = MessageService(self.db_manager)
 
     def get_message_limit(self) -> int:
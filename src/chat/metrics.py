@@ -0,0 +1,213 @@
+# metrics.py
+"""
+Métricas do servidor no formato de exposição do Prometheus, servidas por HTTP.
+
+Histogramas e contadores com rótulos, mais gauges lidos na hora da coleta dos
+``stats()`` que os componentes já mantêm (fila do LLM, escalonador, caches,
+governador de memória). O endpoint ``/metrics`` é um servidor HTTP mínimo no
+próprio event loop, sem dependências novas; no modo multiprocesso cada worker
+expõe as suas métricas em uma porta própria (porta base + índice do worker).
+
+Os objetos são atualizados só pelo event loop do processo, por isso não há
+travas.
+"""
+
+import asyncio
+import bisect
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTE_BUCKETS = tuple(1024 * 4 ** n for n in range(12))  # 1 KB a 4 GB
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotônico com rótulos."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histograma com buckets cumulativos, soma e contagem por combinação de rótulos."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}  # contagens por bucket, +Inf, soma
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class StatsGauges:
+    """Gauges lidos de uma função ``stats()`` na hora da coleta.
+
+    Cada chave numérica vira ``<prefixo>_<chave>``; dicionários aninhados (como
+    os do escalonador por prioridade) viram o rótulo ``nested_label``.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, prefix: str, documentation: str, stats: Callable[[], dict], nested_label: str = ""):
+        self.name = prefix
+        self.documentation = documentation
+        self.stats = stats
+        self.nested_label = nested_label
+
+    def families(self) -> Dict[str, List[str]]:
+        try:
+            stats = self.stats()
+        except Exception as e:
+            logger.warning("Falha ao coletar %s: %s", self.name, e)
+            return {}
+        families: Dict[str, List[str]] = {}
+        for key, value in stats.items():
+            if isinstance(value, dict) and self.nested_label:
+                for inner, inner_value in value.items():
+                    if isinstance(inner_value, (int, float)):
+                        labels = _format_labels((self.nested_label,), (key,))
+                        families.setdefault(f"{self.name}_{inner}", []).append(
+                            f"{self.name}_{inner}{labels} {_format_value(inner_value)}"
+                        )
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                families.setdefault(f"{self.name}_{key}", []).append(f"{self.name}_{key} {_format_value(value)}")
+        return families
+
+
+class Registry:
+    """Conjunto das métricas expostas pelo processo."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(
+        self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def stats_gauges(
+        self, prefix: str, documentation: str, stats: Callable[[], dict], nested_label: str = ""
+    ) -> StatsGauges:
+        return self._register(StatsGauges(prefix, documentation, stats, nested_label))
+
+    def render(self) -> str:
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            if isinstance(metric, StatsGauges):
+                for name, samples in metric.families().items():
+                    lines += [f"# HELP {name} {metric.documentation}", f"# TYPE {name} gauge", *samples]
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, registry: Registry) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass  # Cabeçalhos ignorados
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            status, body, content_type = "200 OK", registry.render().encode("utf-8"), CONTENT_TYPE
+        else:
+            status, body, content_type = "404 Not Found", b"Use /metrics\n", "text/plain; charset=utf-8"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_http_server(port: int, host: str = "127.0.0.1", registry: Optional[Registry] = None) -> asyncio.Server:
+    """Inicia o endpoint ``/metrics`` no event loop atual.
+
+    Args:
+        port (int): Porta de escuta.
+        host (str): Endereço de escuta (por padrão, só local).
+        registry (Optional[Registry]): Métricas expostas; None usa ``REGISTRY``.
+    """
+    registry = registry or REGISTRY
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, registry), host, port)
+    logger.info("Métricas do Prometheus em http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,292 @@
+# name_index.py
+"""
+Índice invertido de trigramas para buscas ``LIKE '%...%'`` em nomes.
+
+O prompt do SQL writer exige ``LIKE`` com ``%`` em toda comparação de texto,
+o que faz cada busca por RAZAO_SOCIAL, NOME_FANTASIA ou NOME_SOCIO varrer
+todas as strings da tabela. Este módulo constrói, na carga, um índice de
+trigramas por coluna gravado em arrays NumPy:
+
+- ``<coluna>.keys.npy``: trigramas distintos (3 code points em um uint64), ordenados;
+- ``<coluna>.offsets.npy``: início de cada lista de postagem em ``postings``;
+- ``<coluna>.postings.npy``: CNPJ_BASICO (uint32) ordenados dentro de cada trigrama.
+
+No servidor os arrays são abertos com ``mmap_mode='r'``: só as páginas das
+listas consultadas são lidas do disco. ``rewrite_query`` resolve cada
+predicado ``coluna LIKE '%TERMO%'`` que seja uma conjunção (AND) de primeiro
+nível do WHERE para o conjunto de CNPJ_BASICO candidatos (interseção das
+listas dos trigramas do termo) e o acrescenta à SQL; o DuckDB continua
+verificando o LIKE, então o resultado é idêntico. LIKEs dentro de NOT, OR ou
+CASE não são reescritos: ali a restrição mudaria o resultado (``NOT (c AND
+like)`` aceita linhas que ``NOT like`` recusa).
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Optional
+
+import duckdb
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TABLE = "resultados_consulta"
+INDEXED_COLUMNS = ("RAZAO_SOCIAL", "NOME_FANTASIA", "NOME_SOCIO")
+META_FILE = "meta.json"
+# Acima disso o filtro por CNPJ não compensa: o LIKE segue sem reescrita.
+DEFAULT_MAX_CANDIDATES = 5000
+
+_LIKE_FUNCTIONS = {"~~", "like"}
+_WILDCARDS = re.compile(r"[%_]")
+
+
+def default_directory(db_path: str) -> str:
+    """Diretório do índice associado a um arquivo DuckDB."""
+    return f"{os.path.splitext(db_path)[0]}_name_index"
+
+
+def _trigram_key(text: str) -> int:
+    return (ord(text[0]) << 42) | (ord(text[1]) << 21) | ord(text[2])
+
+
+def build_name_index(
+    conn: duckdb.DuckDBPyConnection,
+    directory: str,
+    version: str = "",
+    columns=INDEXED_COLUMNS,
+) -> None:
+    """Constrói o índice de trigramas a partir de ``resultados_consulta``.
+
+    Os trigramas são gerados e ordenados pelo próprio DuckDB; as listas de
+    postagem são gravadas em lotes direto no arquivo ``.npy`` mapeado em
+    memória, sem materializar todos os pares no Python.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Conexão com o banco já materializado.
+        directory (str): Diretório de destino.
+        version (str): Versão do conjunto de dados, gravada em ``meta.json``.
+        columns: Colunas a indexar.
+    """
+    # As postagens guardam o CNPJ como inteiro e a reescrita o reconstrói com 8 dígitos.
+    irregular = conn.execute(
+        f"SELECT COUNT(*) FROM {SOURCE_TABLE} WHERE NOT regexp_full_match(CNPJ_BASICO, '[0-9]{{8}}')"
+    ).fetchone()[0]
+    if irregular:
+        if os.path.exists(os.path.join(directory, META_FILE)):
+            os.remove(os.path.join(directory, META_FILE))
+        logger.warning("%d linhas com CNPJ_BASICO fora do formato de 8 dígitos; índice de nomes não construído.", irregular)
+        return
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    for column in columns:
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE name_trigrams AS
+            WITH nomes AS (
+                SELECT DISTINCT CAST(CNPJ_BASICO AS UINTEGER) AS id, {column} AS nome
+                FROM {SOURCE_TABLE}
+                WHERE {column} IS NOT NULL AND length({column}) >= 3
+            )
+            SELECT DISTINCT
+                (CAST(unicode(substr(nome, i, 1)) AS UBIGINT) << 42)
+                | (CAST(unicode(substr(nome, i + 1, 1)) AS UBIGINT) << 21)
+                | CAST(unicode(substr(nome, i + 2, 1)) AS UBIGINT) AS chave,
+                id
+            FROM nomes, range(1, length(nome) - 1) AS t(i)
+        """)
+        keys = conn.execute(
+            "SELECT chave, COUNT(*) FROM name_trigrams GROUP BY chave ORDER BY chave"
+        ).fetchnumpy()
+        counts = keys["count_star()"].astype(np.uint64)
+        offsets = np.zeros(len(counts) + 1, dtype=np.uint64)
+        np.cumsum(counts, out=offsets[1:])
+        np.save(os.path.join(directory, f"{column}.keys.npy"), keys["chave"].astype(np.uint64))
+        np.save(os.path.join(directory, f"{column}.offsets.npy"), offsets)
+
+        total = int(offsets[-1])
+        postings = np.lib.format.open_memmap(
+            os.path.join(directory, f"{column}.postings.npy"), mode="w+", dtype=np.uint32, shape=(total,)
+        )
+        reader = conn.execute("SELECT id FROM name_trigrams ORDER BY chave, id").fetch_record_batch(1 << 20)
+        position = 0
+        for batch in reader:
+            ids = batch.column(0).to_numpy()
+            postings[position:position + len(ids)] = ids
+            position += len(ids)
+        postings.flush()
+        del postings
+        conn.execute("DROP TABLE name_trigrams")
+        logger.info("Índice de trigramas de %s: %d trigramas, %d postagens.", column, len(counts), total)
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump({"version": version, "columns": list(columns)}, f)
+    logger.info("Índice de nomes gravado em %s em %.1fs.", directory, time.perf_counter() - start)
+
+
+class NameIndex:
+    """Índice de trigramas mapeado em memória."""
+
+    def __init__(self, directory: str, max_candidates: int = DEFAULT_MAX_CANDIDATES):
+        """Abre o índice gravado por ``build_name_index``.
+
+        Raises:
+            FileNotFoundError: Se o índice não existir.
+        """
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.version = meta["version"]
+        self.max_candidates = max_candidates
+        self.columns: Dict[str, tuple] = {}
+        for column in meta["columns"]:
+            self.columns[column] = tuple(
+                np.load(os.path.join(directory, f"{column}.{part}.npy"), mmap_mode="r")
+                for part in ("keys", "offsets", "postings")
+            )
+        self.lookups = 0
+        self.rewrites = 0
+
+    @classmethod
+    def open(cls, directory: str, version: Optional[str] = None, **kwargs) -> Optional["NameIndex"]:
+        """Abre o índice se existir e corresponder à versão dos dados; senão retorna None."""
+        try:
+            index = cls(directory, **kwargs)
+        except FileNotFoundError:
+            logger.info("Índice de nomes não encontrado em %s; buscas por nome farão varredura.", directory)
+            return None
+        if version is not None and index.version != version:
+            logger.warning(
+                "Índice de nomes em %s é da versão %s, mas os dados são da %s; ignorando.",
+                directory, index.version or "-", version
+            )
+            return None
+        logger.info("Índice de nomes carregado de %s (%s).", directory, ", ".join(index.columns))
+        return index
+
+    def _postings(self, column: str, key: int) -> np.ndarray:
+        keys, offsets, postings = self.columns[column]
+        position = int(np.searchsorted(keys, np.uint64(key)))
+        if position >= len(keys) or int(keys[position]) != key:
+            return np.empty(0, dtype=np.uint32)
+        return postings[int(offsets[position]):int(offsets[position + 1])]
+
+    def candidates(self, column: str, pattern: str) -> Optional[np.ndarray]:
+        """CNPJ_BASICO cujos valores de ``column`` podem satisfazer ``LIKE pattern``.
+
+        Returns:
+            Optional[np.ndarray]: CNPJs candidatos (uint32, ordenados), ou None se o padrão
+            não tiver trecho literal com ao menos 3 caracteres.
+        """
+        if column not in self.columns:
+            return None
+        keys = {
+            _trigram_key(fragment[i:i + 3])
+            for fragment in _WILDCARDS.split(pattern) if len(fragment) >= 3
+            for i in range(len(fragment) - 2)
+        }
+        if not keys:
+            return None
+        self.lookups += 1
+        lists = sorted((self._postings(column, key) for key in keys), key=len)
+        result = np.asarray(lists[0])
+        for other in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def rewrite_query(self, conn: duckdb.DuckDBPyConnection, sql: str) -> Optional[str]:
+        """Acrescenta ``CNPJ_BASICO IN (candidatos)`` aos ``LIKE`` sobre coluna indexada ligados por AND no WHERE.
+
+        Returns:
+            Optional[str]: SQL reescrita, ou None se nenhum predicado pôde usar o índice.
+        """
+        try:
+            tree = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+            if tree.get("error") or len(tree["statements"]) != 1:
+                return None
+            node = tree["statements"][0]["node"]
+            source = node.get("from_table") or {}
+            if node.get("type") != "SELECT_NODE" or source.get("type") != "BASE_TABLE" \
+                    or source.get("table_name", "").lower() != SOURCE_TABLE:
+                return None
+            changed = self._visit(conn, node, "where_clause")
+            if not changed:
+                return None
+            self.rewrites += 1
+            return conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0]
+        except (duckdb.Error, KeyError, TypeError) as e:
+            logger.debug("Índice de nomes não aplicável: %s", e)
+            return None
+
+    def _visit(self, conn: duckdb.DuckDBPyConnection, parent, key) -> bool:
+        # Só desce por AND: qualquer outro nó (NOT, OR, CASE, subconsulta) encerra a busca.
+        node = parent[key]
+        if not isinstance(node, dict):
+            return False
+        if node.get("class") == "FUNCTION" and node.get("function_name", "").lower() in _LIKE_FUNCTIONS:
+            replacement = self._restrict(conn, node)
+            if replacement is not None:
+                parent[key] = replacement
+                return True
+            return False
+        if node.get("class") == "CONJUNCTION" and node.get("type") == "CONJUNCTION_AND":
+            children = node["children"]
+            return any([self._visit(conn, children, i) for i in range(len(children))])
+        return False
+
+    def _restrict(self, conn: duckdb.DuckDBPyConnection, like: dict) -> Optional[dict]:
+        column_ref, pattern = (like.get("children") or [None, None])[:2]
+        if not column_ref or column_ref.get("class") != "COLUMN_REF" or pattern.get("class") != "CONSTANT":
+            return None
+        column = column_ref["column_names"][-1].upper()
+        value = pattern["value"]
+        if value.get("is_null") or value["type"]["id"] != "VARCHAR":
+            return None
+        candidates = self.candidates(column, value["value"])
+        if candidates is None or len(candidates) > self.max_candidates:
+            return None
+        if len(candidates):
+            values = ", ".join(f"'{int(cnpj):08d}'" for cnpj in candidates)
+            condition = f"CNPJ_BASICO IN ({values})"
+        else:
+            condition = "FALSE"
+        logger.info("LIKE em %s restrito a %d CNPJ(s) candidatos pelo índice de trigramas.", column, len(candidates))
+        restriction = json.loads(conn.execute(
+            "SELECT json_serialize_sql(?)", [f"SELECT 1 WHERE {condition}"]
+        ).fetchone()[0])["statements"][0]["node"]["where_clause"]
+        return {
+            "class": "CONJUNCTION",
+            "type": "CONJUNCTION_AND",
+            "alias": like.get("alias", ""),
+            "query_location": like.get("query_location", 0),
+            "children": [restriction, {**like, "alias": ""}],
+        }
+
+    def stats(self) -> dict:
+        """Retorna os contadores de uso do índice."""
+        return {"lookups": self.lookups, "rewrites": self.rewrites}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Constrói o índice de trigramas dos nomes.")
+    parser.add_argument("--db", default="dados_empresas.duckdb", help="Arquivo DuckDB materializado.")
+    parser.add_argument("--dir", default=None, help="Diretório do índice (padrão: <db>_name_index).")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+    )
+    conn = duckdb.connect(args.db)
+    try:
+        row = conn.execute("SELECT versao FROM dataset_info").fetchone()
+        build_name_index(conn, args.dir or default_directory(args.db), version=row[0] if row else "")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
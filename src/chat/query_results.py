@@ -0,0 +1,150 @@
+# query_results.py
+"""
+Leitura colunar dos resultados das queries e resumo compacto para o LLM.
+
+Em vez de ``fetchall()``, que cria uma tupla Python por linha, o resultado é
+lido do DuckDB em lotes Arrow. Apenas as primeiras ``max_rows`` linhas viram
+tuplas (o que segue no estado do grafo e no prompt); as demais só são contadas
+e, até ``summary_max_rows``, alimentam um resumo vetorizado por coluna
+(contagens, valores mais frequentes e estatísticas numéricas).
+"""
+
+import logging
+from typing import List, NamedTuple, Optional
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from result_cache import estimate_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ROWS = 100
+DEFAULT_SUMMARY_MAX_ROWS = 1_000_000
+DEFAULT_TOP_K = 5
+BATCH_ROWS = 64 * 1024
+
+
+class QueryResult(NamedTuple):
+    """Resultado de uma query limitado a ``max_rows`` linhas."""
+
+    columns: List[str]
+    rows: List[tuple]
+    total_rows: int
+    summary: str = ""
+    action: str = ""  # Ajuste aplicado pelo controle de custo (ver cost_gate)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_rows > len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho aproximado, usado pelo cache de resultados."""
+        return estimate_size(self.rows) + len(self.summary)
+
+
+def fetch_result(
+    conn: duckdb.DuckDBPyConnection,
+    sql: str,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    summary_max_rows: int = DEFAULT_SUMMARY_MAX_ROWS,
+    top_k: int = DEFAULT_TOP_K,
+) -> QueryResult:
+    """Executa ``sql`` e lê o resultado em lotes Arrow.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Conexão a ser usada.
+        sql (str): Query a executar.
+        max_rows (int): Linhas convertidas em tuplas e devolvidas em ``rows``.
+        summary_max_rows (int): Linhas mantidas em memória para o resumo, quando o resultado
+            excede ``max_rows``; o restante só é contado.
+        top_k (int): Valores mais frequentes listados por coluna no resumo.
+
+    Returns:
+        QueryResult: Colunas, primeiras linhas, total de linhas e resumo (vazio se não truncado).
+    """
+    reader = conn.execute(sql).fetch_record_batch(BATCH_ROWS)
+    columns = list(reader.schema.names)
+    kept, kept_rows, total_rows = [], 0, 0
+    for batch in reader:
+        total_rows += batch.num_rows
+        if kept_rows < summary_max_rows:
+            batch = batch.slice(0, summary_max_rows - kept_rows)
+            kept.append(batch)
+            kept_rows += batch.num_rows
+    table = pa.Table.from_batches(kept, schema=reader.schema)
+    head = table.slice(0, max_rows)
+    rows = list(zip(*(column.to_pylist() for column in head.columns))) if head.num_columns else []
+    summary = ""
+    if total_rows > max_rows:
+        summary = summarize_table(table, top_k=top_k, total_rows=total_rows)
+    return QueryResult(columns, rows, total_rows, summary)
+
+
+def summarize_table(table: pa.Table, top_k: int = DEFAULT_TOP_K, total_rows: Optional[int] = None) -> str:
+    """Gera um resumo textual, por coluna, de uma tabela Arrow.
+
+    Colunas numéricas trazem mínimo, máximo, média e soma; datas, o intervalo;
+    as demais, o número de valores distintos e os ``top_k`` mais frequentes.
+
+    Args:
+        table (pa.Table): Tabela a resumir.
+        top_k (int): Quantidade de valores mais frequentes por coluna.
+        total_rows (Optional[int]): Total de linhas do resultado, se maior que a tabela.
+
+    Returns:
+        str: Resumo em texto, uma linha por coluna.
+    """
+    total_rows = table.num_rows if total_rows is None else total_rows
+    lines = [f"{total_rows} rows in total."]
+    if table.num_rows < total_rows:
+        lines.append(f"Column statistics computed over the first {table.num_rows} rows.")
+    for name, column in zip(table.column_names, table.columns):
+        nulls = column.null_count
+        kind = column.type
+        if nulls == len(column):
+            lines.append(f"- {name}: all values null")
+        elif pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_decimal(kind):
+            bounds = pc.min_max(column)
+            lines.append(
+                f"- {name}: min={bounds['min'].as_py()}, max={bounds['max'].as_py()}, "
+                f"mean={_round(pc.mean(column).as_py())}, sum={_round(pc.sum(column).as_py())}, nulls={nulls}"
+            )
+        elif pa.types.is_temporal(kind):
+            bounds = pc.min_max(column)
+            lines.append(f"- {name}: from {bounds['min'].as_py()} to {bounds['max'].as_py()}, nulls={nulls}")
+        else:
+            try:
+                counts = pc.value_counts(column.drop_null() if nulls else column)
+            except pa.ArrowNotImplementedError:
+                lines.append(f"- {name}: type {kind}, nulls={nulls}")
+                continue
+            top = counts.take(pc.array_sort_indices(counts.field("counts"), order="descending")[:top_k])
+            values = ", ".join(
+                f"{value} ({count})"
+                for value, count in zip(top.field("values").to_pylist(), top.field("counts").to_pylist())
+            )
+            lines.append(f"- {name}: {len(counts)} distinct values, nulls={nulls}; most frequent: {values}")
+    return "\n".join(lines)
+
+
+def _round(value):
+    return round(value, 2) if isinstance(value, float) else value
+
+
+def format_for_prompt(result: QueryResult, sample_rows: int = 20) -> str:
+    """Formata o resultado para o prompt de interpretação.
+
+    Resultados pequenos vão inteiros; resultados truncados levam uma amostra de
+    ``sample_rows`` linhas, o marcador de truncamento e o resumo por coluna.
+    """
+    if not result.truncated:
+        return f"Columns: {result.columns}\nRows: {result.rows}"
+    return (
+        f"Columns: {result.columns}\n"
+        f"Rows (truncated, {result.total_rows} total rows; first {min(sample_rows, len(result.rows))} shown): "
+        f"{result.rows[:sample_rows]}\n"
+        f"Summary:\n{result.summary}"
+    )
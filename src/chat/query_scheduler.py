@@ -0,0 +1,208 @@
+# query_scheduler.py
+"""
+Escalonador de consultas na frente do pool do DuckDB.
+
+- Orçamento global de CPU: o número de threads do DuckDB é global para a
+  instância do banco (``SET threads`` não pode ser definido por conexão) e o
+  pool de workers é compartilhado entre as consultas em execução. O
+  escalonador o define uma vez com o orçamento do processo, em vez de repetir
+  ``PRAGMA threads=4`` a cada consulta: uma varredura pesada sozinha usa o
+  orçamento inteiro e, com várias em andamento, o DuckDB reparte os mesmos
+  workers entre elas. O custo é que, com o pool cheio, as threads chamadoras
+  das consultas somam até ``max_running - 1`` threads acima do orçamento;
+  reservá-las de antemão deixaria cada varredura com uma só thread em
+  máquinas pequenas ou com vários workers.
+- Classes de prioridade: consultas pontuais (ex.: igualdade em CNPJ_BASICO)
+  passam à frente de agregações pesadas, e o número de consultas pesadas
+  simultâneas é limitado para sempre sobrar vaga às pontuais.
+- Fila justa por usuário: dentro de cada classe os usuários são atendidos em
+  rodízio, de modo que um usuário com muitas perguntas não monopoliza o banco.
+- Métricas de profundidade de fila e tempo de espera.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+POINT = "point"
+HEAVY = "heavy"
+PRIORITIES = (POINT, HEAVY)
+
+_CNPJ_EQUALITY = re.compile(r"\bCNPJ_BASICO\s*=\s*'?\d{8}'?", re.IGNORECASE)
+
+# Amostras de tempo de espera guardadas por classe para os percentis.
+WAIT_SAMPLES = 1000
+
+
+def classify_query(sql: str) -> str:
+    """Classifica a SQL como consulta pontual ou pesada.
+
+    Consultas com igualdade em CNPJ_BASICO leem poucas linhas graças à ordenação
+    da tabela materializada; todas as demais são tratadas como pesadas.
+    """
+    return POINT if _CNPJ_EQUALITY.search(sql) else HEAVY
+
+
+class QueryScheduler:
+    """Controla quais consultas podem ocupar o pool do DuckDB e em que ordem."""
+
+    def __init__(
+        self,
+        max_running: int = 4,
+        cpu_budget: Optional[int] = None,
+        heavy_limit: Optional[int] = None,
+        point_burst: int = 4,
+        processes: int = 1,
+    ):
+        """Inicializa o escalonador.
+
+        Args:
+            max_running (int): Consultas simultâneas (tamanho do pool de conexões).
+            cpu_budget (Optional[int]): Threads de CPU para o DuckDB. Padrão: núcleos - 1.
+            heavy_limit (Optional[int]): Máximo de consultas pesadas simultâneas.
+                Padrão: ``max_running - 1``, deixando uma vaga às pontuais.
+            point_burst (int): Pontuais seguidas antes de ceder a vez a uma pesada na fila.
+            processes (int): Processos servidores que dividem a máquina (o orçamento de CPU é repartido).
+        """
+        self.max_running = max_running
+        self.cpu_budget = max(1, (cpu_budget or max(1, (os.cpu_count() or 1) - 1)) // max(1, processes))
+        self.heavy_limit = heavy_limit or max(1, max_running - 1)
+        self.point_burst = point_burst
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}  # usuário -> deque de futures
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._consecutive_points = 0
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+        self._wait_totals = {priority: [0, 0.0] for priority in PRIORITIES}  # [quantidade, soma]
+
+    @property
+    def duckdb_threads(self) -> int:
+        """Valor de ``threads`` do DuckDB: o orçamento de CPU do processo.
+
+        Não desconta as threads chamadoras das consultas simultâneas (ver o
+        docstring do módulo): o pool cheio é a exceção, e dimensionar por ele
+        tornaria cada varredura pesada mais lenta no caso comum.
+        """
+        return self.cpu_budget
+
+    def configure(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """Aplica o número de threads à instância do DuckDB."""
+        conn.execute(f"SET threads = {self.duckdb_threads}")
+        logger.info(
+            "DuckDB configurado com %d threads (orçamento de CPU do processo; até %d consultas, %d pesadas, "
+            "cujas threads chamadoras podem somar %d acima disso).",
+            self.duckdb_threads, self.max_running, self.heavy_limit, self.max_running - 1
+        )
+
+    # -------------------------------------------------------------------------
+    # Admissão
+    # -------------------------------------------------------------------------
+    def _can_start(self, priority: str) -> bool:
+        if sum(self._running.values()) >= self.max_running:
+            return False
+        return priority == POINT or self._running[HEAVY] < self.heavy_limit
+
+    def _waiting(self, priority: str) -> int:
+        return sum(len(waiters) for waiters in self._queues[priority].values())
+
+    def _pop(self, priority: str) -> asyncio.Future:
+        queue = self._queues[priority]
+        user, waiters = next(iter(queue.items()))
+        future = waiters.popleft()
+        del queue[user]
+        if waiters:
+            queue[user] = waiters  # volta para o fim do rodízio
+        return future
+
+    def _dispatch(self) -> None:
+        while True:
+            point_ready = self._waiting(POINT) > 0 and self._can_start(POINT)
+            heavy_ready = self._waiting(HEAVY) > 0 and self._can_start(HEAVY)
+            if point_ready and (not heavy_ready or self._consecutive_points < self.point_burst):
+                priority = POINT
+                self._consecutive_points += 1
+            elif heavy_ready:
+                priority = HEAVY
+                self._consecutive_points = 0
+            else:
+                return
+            future = self._pop(priority)
+            if not future.done():
+                self._running[priority] += 1
+                future.set_result(None)
+
+    def _remove_waiter(self, priority: str, user: str, future: asyncio.Future) -> None:
+        waiters = self._queues[priority].get(user)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._queues[priority][user]
+
+    def _record_wait(self, priority: str, waited: float) -> None:
+        self._waits[priority].append(waited)
+        totals = self._wait_totals[priority]
+        totals[0] += 1
+        totals[1] += waited
+
+    @asynccontextmanager
+    async def slot(self, user: str, priority: str = HEAVY):
+        """Aguarda a vez da consulta e ocupa uma vaga do pool enquanto ela executa.
+
+        Args:
+            user (str): Identificação do usuário, para o rodízio justo.
+            priority (str): ``POINT`` ou ``HEAVY``.
+        """
+        start = time.perf_counter()
+        if self._can_start(priority) and not self._waiting(POINT) and not self._waiting(HEAVY):
+            self._running[priority] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._queues[priority].setdefault(user or "", deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # A vaga foi concedida no mesmo instante do cancelamento.
+                    self._running[priority] -= 1
+                    self._dispatch()
+                else:
+                    self._remove_waiter(priority, user or "", future)
+                raise
+        waited = time.perf_counter() - start
+        self._record_wait(priority, waited)
+        if waited > 1.0:
+            logger.info("Consulta %s de %s aguardou %.2fs na fila.", priority, user, waited)
+        try:
+            yield
+        finally:
+            self._running[priority] -= 1
+            self._dispatch()
+
+    # -------------------------------------------------------------------------
+    # Métricas
+    # -------------------------------------------------------------------------
+    def stats(self) -> dict:
+        """Profundidade de fila, consultas em execução e tempos de espera por classe."""
+        stats = {"cpu_budget": self.cpu_budget, "duckdb_threads": self.duckdb_threads}
+        for priority in PRIORITIES:
+            waits = sorted(self._waits[priority])
+            count, total = self._wait_totals[priority]
+            stats[priority] = {
+                "running": self._running[priority],
+                "queue_depth": self._waiting(priority),
+                "waiting_users": len(self._queues[priority]),
+                "admitted_total": count,
+                "wait_seconds_total": total,
+                "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p99": waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0,
+            }
+        return stats
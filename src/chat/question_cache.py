@@ -0,0 +1,146 @@
+# question_cache.py
+"""
+Cache pergunta → SQL que evita a chamada ao LLM no ``sql_writer_node``.
+
+As perguntas são normalizadas (caixa, acentos, espaços e pontuação) antes de
+servirem de chave. Opcionalmente, perguntas apenas parecidas também são
+aceitas quando a similaridade de trigramas de caracteres atinge um limiar;
+nesse caso os números da pergunta (anos, CNPJs, códigos) precisam ser
+idênticos, para que "empresas abertas em 2020" nunca reutilize a SQL de 2021.
+"""
+
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+_NUMBERS = re.compile(r"\d+")
+
+
+def normalize_question(question: str) -> str:
+    """Normaliza uma pergunta para uso como chave de cache.
+
+    Remove acentos e pontuação, converte para maiúsculas e colapsa espaços.
+
+    Args:
+        question (str): Pergunta original.
+
+    Returns:
+        str: Pergunta normalizada.
+    """
+    text = unicodedata.normalize("NFKD", question)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCTUATION.sub(" ", text.upper())
+    return _SPACES.sub(" ", text).strip()
+
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """Retorna o conjunto de n-gramas de caracteres de ``text`` (com bordas)."""
+    padded = f" {text} "
+    if len(padded) < n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class QuestionSQLCache:
+    """Cache LRU de SQL por pergunta normalizada, com busca aproximada opcional."""
+
+    def __init__(self, max_entries: int = 5000, similarity_threshold: Optional[float] = None):
+        """Inicializa o cache.
+
+        Args:
+            max_entries (int): Número máximo de perguntas armazenadas.
+            similarity_threshold (Optional[float]): Coeficiente de Dice mínimo (0 a 1) entre
+                trigramas para aceitar uma pergunta parecida. None desativa a busca aproximada.
+        """
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()       # pergunta normalizada -> SQL
+        self._ngrams = {}                   # pergunta normalizada -> trigramas
+        self._index = defaultdict(set)      # trigrama -> perguntas normalizadas
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    def get(self, question: str) -> Optional[str]:
+        """Retorna a SQL associada a ``question`` (ou a uma pergunta equivalente)."""
+        key = normalize_question(question)
+        with self._lock:
+            sql = self._entries.get(key)
+            if sql is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sql
+            if self.similarity_threshold is not None:
+                match = self._closest(key)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.fuzzy_hits += 1
+                    logger.info("Pergunta semelhante encontrada no cache: %s", match)
+                    return self._entries[match]
+            self.misses += 1
+            return None
+
+    def _closest(self, key: str) -> Optional[str]:
+        grams = char_ngrams(key)
+        numbers = _NUMBERS.findall(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._index.get(gram, ()):
+                shared[candidate] += 1
+        best, best_score = None, self.similarity_threshold
+        for candidate, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._ngrams[candidate]))
+            if score >= best_score and _NUMBERS.findall(candidate) == numbers:
+                best, best_score = candidate, score
+        return best
+
+    def put(self, question: str, sql: str) -> None:
+        """Associa a SQL gerada à pergunta."""
+        key = normalize_question(question)
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] = sql
+                self._entries.move_to_end(key)
+                return
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = sql
+            grams = char_ngrams(key)
+            self._ngrams[key] = grams
+            for gram in grams:
+                self._index[gram].add(key)
+
+    def invalidate(self, sql: str) -> None:
+        """Remove todas as perguntas associadas a ``sql`` (ex.: a SQL falhou ao executar)."""
+        with self._lock:
+            for key in [key for key, value in self._entries.items() if value == sql]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        del self._entries[key]
+        for gram in self._ngrams.pop(key):
+            keys = self._index[gram]
+            keys.discard(key)
+            if not keys:
+                del self._index[gram]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Retorna os contadores de uso do cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+            }
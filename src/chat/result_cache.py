@@ -0,0 +1,187 @@
+# result_cache.py
+"""
+Cache de resultados de queries com limite em bytes, LRU e TTL opcional.
+
+Substitui o dicionário global ``SQL_CACHE``, que guardava todos os resultados
+para sempre. As entradas são chaveadas pela versão do conjunto de dados, de
+modo que uma nova carga invalida tudo o que foi calculado sobre a anterior.
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de linhas amostradas para estimar o tamanho de um resultado.
+SIZE_SAMPLE_ROWS = 100
+
+
+def estimate_size(value: Any) -> int:
+    """Estima o tamanho em bytes de um resultado de query.
+
+    Objetos com ``nbytes`` (tabelas Arrow, arrays NumPy) usam esse valor. Para
+    listas de tuplas (saída de ``fetchall()``) uma amostra de linhas é medida e
+    extrapolada para o total.
+
+    Args:
+        value (Any): Resultado a ser medido.
+
+    Returns:
+        int: Tamanho estimado em bytes.
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (list, tuple)):
+        total = sys.getsizeof(value)
+        if not value:
+            return total
+        step = max(1, len(value) // SIZE_SAMPLE_ROWS)
+        sample = value[::step]
+        sample_bytes = sum(_row_size(row) for row in sample)
+        return total + int(sample_bytes * len(value) / len(sample))
+    return _row_size(value)
+
+
+def _row_size(row: Any) -> int:
+    if isinstance(row, (tuple, list)):
+        return sys.getsizeof(row) + sum(sys.getsizeof(item) for item in row)
+    return sys.getsizeof(row)
+
+
+class ResultCache:
+    """Cache LRU limitado por bytes, com TTL opcional e contadores de uso.
+
+    É seguro para uso concorrente entre threads.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entry_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        dataset_version: str = "",
+    ):
+        """Inicializa o cache.
+
+        Args:
+            max_bytes (int): Orçamento total de memória estimada.
+            max_entry_bytes (Optional[int]): Tamanho máximo de uma entrada; resultados
+                maiores nunca são admitidos. Padrão: ``max_bytes``.
+            ttl_seconds (Optional[float]): Tempo de vida das entradas; None desativa o TTL.
+            dataset_version (str): Versão inicial do conjunto de dados.
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.dataset_version = dataset_version
+        self._entries = OrderedDict()  # chave -> (valor, tamanho, expira_em)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def _key(self, key: Hashable) -> tuple:
+        return (self.dataset_version, key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retorna o valor em cache para ``key`` ou ``default``."""
+        with self._lock:
+            full_key = self._key(key)
+            entry = self._entries.get(full_key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(full_key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> bool:
+        """Armazena ``value`` sob ``key``, removendo as entradas menos usadas se necessário.
+
+        Args:
+            key (Hashable): Chave (ex.: a SQL executada).
+            value (Any): Resultado a ser armazenado.
+            size (Optional[int]): Tamanho em bytes, se já conhecido.
+
+        Returns:
+            bool: True se o valor foi admitido no cache.
+        """
+        size = estimate_size(value) if size is None else size
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self.rejections += 1
+            logger.info(
+                "Resultado de %.1f MB excede o limite por entrada do cache; não armazenado.",
+                size / 1024 ** 2
+            )
+            return False
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            full_key = self._key(key)
+            if full_key in self._entries:
+                self._remove(full_key)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[full_key] = (value, size, expires_at)
+            self.current_bytes += size
+        return True
+
+    def _remove(self, full_key: tuple) -> None:
+        _, size, _ = self._entries.pop(full_key)
+        self.current_bytes -= size
+
+    def set_dataset_version(self, version: str) -> None:
+        """Atualiza a versão do conjunto de dados, descartando entradas de versões anteriores."""
+        with self._lock:
+            if version == self.dataset_version:
+                return
+            logger.info(
+                "Versão dos dados mudou (%s -> %s); limpando %d entradas do cache.",
+                self.dataset_version or "-", version, len(self._entries)
+            )
+            self.dataset_version = version
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def clear(self) -> None:
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._key(key) in self._entries
+
+    def stats(self) -> dict:
+        """Retorna os contadores e a ocupação atual do cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejections": self.rejections,
+            }
@@ -0,0 +1,381 @@
+# rollups.py
+"""
+Tabelas de rollup pré-agregadas e roteamento automático de consultas agregadas.
+
+A maior parte das perguntas são contagens e somas agrupadas por UF, município,
+CNAE, porte, situação cadastral e ano de início de atividade. Em vez de varrer
+o join completo a cada pergunta, ``build_rollups`` grava uma única tabela
+``rollup_resultados`` com os GROUPING SETS dessas dimensões (todas as
+combinações de até ``max_dims`` dimensões), e ``rewrite_query`` reescreve a SQL
+gerada pelo LLM para ler do rollup quando a resposta é garantidamente igual à
+da varredura completa.
+
+A análise da SQL usa o próprio parser do DuckDB (``json_serialize_sql``) e a
+SQL reescrita é gerada com ``json_deserialize_sql``; qualquer construção não
+reconhecida faz a consulta seguir pelo caminho normal.
+
+Uso:
+    python src/chat/rollups.py --db dados_empresas.duckdb
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import logging
+import time
+from typing import Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "dados_empresas.duckdb"
+SOURCE_TABLE = "resultados_consulta"
+ROLLUP_TABLE = "rollup_resultados"
+BUILD_TABLE = f"{ROLLUP_TABLE}__build"
+DEFAULT_MAX_DIMS = 2
+
+# Ordem fixa: define os bits da coluna GRUPO (GROUPING() do DuckDB).
+DIMENSIONS = [
+    "UF",
+    "NOME_MUNICIPIO",
+    "CNAE_FISCAL_PRINCIPAL",
+    "PORTE_EMPRESA",
+    "SITUACAO_CADASTRAL",
+    "ANO_INICIO_ATIVIDADE",
+]
+YEAR_SOURCE_COLUMN = "DATA_INICIO_ATIVIDADE"
+YEAR_DIMENSION = "ANO_INICIO_ATIVIDADE"
+
+# Grupos (bitmask GRUPO) presentes no rollup; carregado sob demanda.
+_available_groups = None
+
+
+def grouping_id(dims) -> int:
+    """Calcula o valor de GROUPING(...) para um conjunto de dimensões agrupadas."""
+    n = len(DIMENSIONS)
+    value = 0
+    for i, dim in enumerate(DIMENSIONS):
+        if dim not in dims:
+            value |= 1 << (n - 1 - i)
+    return value
+
+
+def build_rollups(conn: duckdb.DuckDBPyConnection, max_dims: int = DEFAULT_MAX_DIMS) -> None:
+    """Constrói ``rollup_resultados`` a partir da tabela materializada.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Conexão de escrita com o banco.
+        max_dims (int): Número máximo de dimensões por grouping set.
+    """
+    global _available_groups
+    sets = [
+        combo
+        for size in range(max_dims + 1)
+        for combo in itertools.combinations(DIMENSIONS, size)
+    ]
+    grouping_sets = ", ".join(f"({', '.join(combo)})" for combo in sets)
+    dims = ", ".join(DIMENSIONS)
+
+    logger.info("Construindo %s com %d grouping sets...", ROLLUP_TABLE, len(sets))
+    start = time.perf_counter()
+    conn.execute(f"DROP TABLE IF EXISTS {BUILD_TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {BUILD_TABLE} AS
+        SELECT
+            GROUPING({dims}) AS GRUPO
+            , {dims}
+            , COUNT(*) AS N_LINHAS
+            , COUNT(DISTINCT CNPJ_BASICO) AS N_EMPRESAS
+            , COUNT(CAPITAL_SOCIAL) AS N_CAPITAL_SOCIAL
+            , SUM(CAPITAL_SOCIAL) AS SUM_CAPITAL_SOCIAL
+            , MIN(CAPITAL_SOCIAL) AS MIN_CAPITAL_SOCIAL
+            , MAX(CAPITAL_SOCIAL) AS MAX_CAPITAL_SOCIAL
+        FROM (
+            SELECT *, year({YEAR_SOURCE_COLUMN}) AS {YEAR_DIMENSION}
+            FROM {SOURCE_TABLE}
+        )
+        GROUP BY GROUPING SETS ({grouping_sets})
+        ORDER BY GRUPO
+    """)
+    conn.execute(f"DROP TABLE IF EXISTS {ROLLUP_TABLE}")
+    conn.execute(f"ALTER TABLE {BUILD_TABLE} RENAME TO {ROLLUP_TABLE}")
+    _available_groups = None
+    total = conn.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}").fetchone()[0]
+    logger.info(
+        "Rollup %s construído com %d linhas em %.1fs.",
+        ROLLUP_TABLE, total, time.perf_counter() - start
+    )
+
+
+def available_groups(conn: duckdb.DuckDBPyConnection) -> frozenset:
+    """Retorna os valores de GRUPO disponíveis no rollup (vazio se não existir)."""
+    global _available_groups
+    if _available_groups is None:
+        exists = conn.execute(
+            "SELECT 1 FROM duckdb_tables() WHERE table_name = ?", [ROLLUP_TABLE]
+        ).fetchone()
+        if exists:
+            rows = conn.execute(f"SELECT DISTINCT GRUPO FROM {ROLLUP_TABLE}").fetchall()
+            _available_groups = frozenset(row[0] for row in rows)
+        else:
+            _available_groups = frozenset()
+    return _available_groups
+
+
+# =============================================================================
+# Análise e reescrita da SQL
+# =============================================================================
+class _NotRoutable(Exception):
+    """A SQL não pode ser respondida pelo rollup."""
+
+
+def _parse(conn: duckdb.DuckDBPyConnection, sql: str) -> dict:
+    tree = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+    if tree.get("error") or len(tree["statements"]) != 1:
+        raise _NotRoutable("SQL inválida ou com múltiplos comandos")
+    return tree
+
+
+def _expr(conn: duckdb.DuckDBPyConnection, text: str) -> dict:
+    """Converte uma expressão SQL em nó da AST do DuckDB."""
+    return _parse(conn, f"SELECT {text}")["statements"][0]["node"]["select_list"][0]
+
+
+def _column_name(node: dict) -> Optional[str]:
+    if node.get("class") == "COLUMN_REF":
+        return node["column_names"][-1].upper()
+    return None
+
+
+def _year_dimension(node: dict) -> bool:
+    """Reconhece year(DATA_INICIO_ATIVIDADE) e EXTRACT(YEAR FROM DATA_INICIO_ATIVIDADE)."""
+    if node.get("class") != "FUNCTION" or node.get("distinct"):
+        return False
+    name = node["function_name"].lower()
+    children = node["children"]
+    if name == "year" and len(children) == 1:
+        return _column_name(children[0]) == YEAR_SOURCE_COLUMN
+    if name in ("date_part", "datepart") and len(children) == 2:
+        part = children[0]
+        return (
+            part.get("class") == "CONSTANT"
+            and str(part["value"].get("value", "")).lower() in ("year", "years", "y", "yr", "yrs")
+            and _column_name(children[1]) == YEAR_SOURCE_COLUMN
+        )
+    return False
+
+
+_AGGREGATES = {"count_star", "count", "sum", "avg", "mean", "min", "max"}
+
+
+class _Rewriter:
+    """Percorre a AST trocando agregados e dimensões pelas colunas do rollup."""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, aliases: set):
+        self.conn = conn
+        self.aliases = aliases
+        self.dims = set()
+        self.has_aggregate = False
+        self.needs_single_cell = False
+
+    def _measure(self, node: dict) -> dict:
+        name = node["function_name"].lower()
+        if node.get("filter") or node["order_bys"]["orders"]:
+            raise _NotRoutable("agregado com FILTER/ORDER BY")
+        self.has_aggregate = True
+        alias = node.get("alias", "")
+        children = node["children"]
+
+        if name == "count_star":
+            text = "COALESCE(SUM(N_LINHAS), 0)::BIGINT"
+        elif name == "count" and len(children) == 1:
+            arg = children[0]
+            column = _column_name(arg)
+            if node["distinct"]:
+                if column != "CNPJ_BASICO":
+                    raise _NotRoutable("COUNT(DISTINCT) só é suportado em CNPJ_BASICO")
+                self.needs_single_cell = True
+                text = "COALESCE(SUM(N_EMPRESAS), 0)::BIGINT"
+            elif arg.get("class") == "CONSTANT" or column == "CNPJ_BASICO":
+                # CNPJ_BASICO vem da tabela de empresas e nunca é nulo no join.
+                text = "COALESCE(SUM(N_LINHAS), 0)::BIGINT"
+            elif column == "CAPITAL_SOCIAL":
+                text = "COALESCE(SUM(N_CAPITAL_SOCIAL), 0)::BIGINT"
+            else:
+                raise _NotRoutable(f"COUNT({column}) não suportado")
+        elif len(children) == 1 and _column_name(children[0]) == "CAPITAL_SOCIAL":
+            if name in ("sum", "avg", "mean") and node["distinct"]:
+                raise _NotRoutable("SUM/AVG DISTINCT não é aditivo")
+            text = {
+                "sum": "SUM(SUM_CAPITAL_SOCIAL)",
+                "avg": "SUM(SUM_CAPITAL_SOCIAL) / NULLIF(SUM(N_CAPITAL_SOCIAL), 0)",
+                "mean": "SUM(SUM_CAPITAL_SOCIAL) / NULLIF(SUM(N_CAPITAL_SOCIAL), 0)",
+                "min": "MIN(MIN_CAPITAL_SOCIAL)",
+                "max": "MAX(MAX_CAPITAL_SOCIAL)",
+            }[name]
+        else:
+            raise _NotRoutable(f"agregado {name} não suportado")
+
+        replacement = _expr(self.conn, text)
+        replacement["alias"] = alias
+        return replacement
+
+    def visit(self, node, allow_alias: bool = False):
+        if isinstance(node, list):
+            return [self.visit(item, allow_alias) for item in node]
+        if not isinstance(node, dict):
+            return node
+        cls = node.get("class")
+        if cls in ("SUBQUERY", "WINDOW", "STAR", "COLUMNS", "LAMBDA", "PARAMETER"):
+            raise _NotRoutable(f"expressão {cls} não suportada")
+        if cls == "COLUMN_REF":
+            column = _column_name(node)
+            if column in DIMENSIONS and column != YEAR_DIMENSION:
+                self.dims.add(column)
+                return node
+            if allow_alias and len(node["column_names"]) == 1 and column in self.aliases:
+                return node
+            raise _NotRoutable(f"coluna {column} fora do rollup")
+        if cls == "FUNCTION":
+            if _year_dimension(node):
+                self.dims.add(YEAR_DIMENSION)
+                replacement = _expr(self.conn, YEAR_DIMENSION)
+                replacement["alias"] = node.get("alias", "")
+                return replacement
+            if node["function_name"].lower() in _AGGREGATES:
+                return self._measure(node)
+        return {key: self.visit(value, allow_alias) for key, value in node.items()}
+
+
+def rewrite_query(conn: duckdb.DuckDBPyConnection, sql: str) -> Optional[str]:
+    """Reescreve uma SQL agregada sobre ``resultados_consulta`` para usar o rollup.
+
+    Só reescreve quando o resultado é idêntico ao da varredura completa: todas
+    as colunas fora de agregados precisam ser dimensões do rollup e os
+    agregados precisam ser deriváveis das medidas armazenadas. Para
+    ``COUNT(DISTINCT CNPJ_BASICO)``, que não é aditivo, exige-se que cada grupo
+    do resultado corresponda a exatamente uma célula do rollup.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Conexão com o banco.
+        sql (str): SQL gerada pelo LLM.
+
+    Returns:
+        Optional[str]: SQL reescrita, ou None se o rollup não puder ser usado.
+    """
+    groups = available_groups(conn)
+    if not groups:
+        return None
+    try:
+        return _rewrite(conn, sql, groups)
+    except _NotRoutable as e:
+        logger.debug("Rollup não aplicável: %s", e)
+    except Exception as e:
+        logger.warning("Falha ao analisar SQL para o rollup: %s", e)
+    return None
+
+
+def _rewrite(conn: duckdb.DuckDBPyConnection, sql: str, groups: frozenset) -> str:
+    tree = _parse(conn, sql)
+    node = tree["statements"][0]["node"]
+    if node.get("type") != "SELECT_NODE":
+        raise _NotRoutable("não é um SELECT simples")
+    if node["cte_map"]["map"] or node.get("having") or node.get("qualify") or node.get("sample"):
+        raise _NotRoutable("CTE/HAVING/QUALIFY/SAMPLE")
+    if node.get("aggregate_handling") != "STANDARD_HANDLING" or len(node["group_sets"]) > 1:
+        raise _NotRoutable("GROUP BY ALL/ROLLUP/CUBE")
+    source = node["from_table"]
+    if source.get("type") != "BASE_TABLE" or source["table_name"].lower() != SOURCE_TABLE or source.get("sample"):
+        raise _NotRoutable("FROM diferente de resultados_consulta")
+
+    aliases = {item["alias"].upper() for item in node["select_list"] if item.get("alias")}
+    rewriter = _Rewriter(conn, aliases)
+    node["select_list"] = rewriter.visit(node["select_list"])
+    # Mantém os nomes das colunas da consulta original (ex.: "count(DISTINCT CNPJ_BASICO)").
+    names = [row[0] for row in conn.execute(f"DESCRIBE {sql}").fetchall()]
+    if len(names) == len(node["select_list"]):
+        for item, name in zip(node["select_list"], names):
+            if not item.get("alias"):
+                item["alias"] = name
+    node["where_clause"] = rewriter.visit(node["where_clause"])
+    node["group_expressions"] = rewriter.visit(node["group_expressions"])
+    node["modifiers"] = rewriter.visit(node["modifiers"], allow_alias=True)
+    if not rewriter.has_aggregate:
+        raise _NotRoutable("consulta sem agregados")
+
+    group_dims = set()
+    for expr in node["group_expressions"]:
+        column = _column_name(expr)
+        if column not in DIMENSIONS:
+            raise _NotRoutable("GROUP BY por expressão")
+        group_dims.add(column)
+
+    if rewriter.needs_single_cell:
+        candidates = [frozenset(rewriter.dims)]
+    else:
+        candidates = sorted(
+            (frozenset(dims) for size in range(len(DIMENSIONS) + 1)
+             for dims in itertools.combinations(DIMENSIONS, size)
+             if rewriter.dims.issubset(dims)),
+            key=len,
+        )
+    chosen = next((dims for dims in candidates if grouping_id(dims) in groups), None)
+    if chosen is None:
+        raise _NotRoutable(f"nenhum grouping set cobre {sorted(rewriter.dims)}")
+
+    source["table_name"] = ROLLUP_TABLE
+    source["schema_name"] = ""
+    source["catalog_name"] = ""
+    grupo_filter = _parse(conn, f"SELECT 1 WHERE GRUPO = {grouping_id(chosen)}")
+    grupo_filter = grupo_filter["statements"][0]["node"]["where_clause"]
+    if node["where_clause"] is None:
+        node["where_clause"] = grupo_filter
+    else:
+        node["where_clause"] = {
+            "class": "CONJUNCTION",
+            "type": "CONJUNCTION_AND",
+            "alias": "",
+            "query_location": grupo_filter.get("query_location", 0),
+            "children": [grupo_filter, node["where_clause"]],
+        }
+    rewritten = conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0]
+
+    if rewriter.needs_single_cell and set(chosen) != group_dims:
+        # Dimensões só filtradas (não agrupadas): a contagem distinta só é
+        # exata se o filtro deixar uma única célula por grupo.
+        check = copy.deepcopy(tree)
+        check_node = check["statements"][0]["node"]
+        check_node["select_list"] = [_expr(conn, "COUNT(*) AS n")]
+        check_node["modifiers"] = []
+        check_sql = conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(check)]).fetchone()[0]
+        cells = conn.execute(f"SELECT COALESCE(MAX(n), 0) FROM ({check_sql})").fetchone()[0]
+        if cells > 1:
+            raise _NotRoutable("filtro abrange várias células para COUNT(DISTINCT)")
+
+    return rewritten
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Constrói as tabelas de rollup do Chat Empresas.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Arquivo DuckDB.")
+    parser.add_argument(
+        "--max-dims", type=int, default=DEFAULT_MAX_DIMS,
+        help="Número máximo de dimensões combinadas em cada grouping set."
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+    )
+    conn = duckdb.connect(args.db)
+    try:
+        build_rollups(conn, max_dims=args.max_dims)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# schema_index.py
+"""
+Seleção das colunas e notas de domínio relevantes para cada pergunta.
+
+O prompt do ``sql_writer_node`` levava as 46 colunas do ``DESCRIBE`` e todo o
+bloco de metadados, embora cada pergunta use poucas delas. O índice aqui é
+local (sem embeddings): cada coluna é descrita por palavras-chave — partes do
+nome, a descrição dos metadados, sinônimos em português e, para
+``CNAE_FISCAL_PRINCIPAL`` e ``NATUREZA_JURIDICA``, as descrições das tabelas
+de CNAEs e naturezas jurídicas — e a pergunta normalizada é comparada com
+elas por igualdade de palavras, por prefixo (sinônimos terminados em ``*``)
+ou por similaridade de trigramas de caracteres (o que tolera plurais e
+pequenas variações).
+
+Omitir uma coluna necessária gera SQL errada, o que custa mais do que os
+tokens economizados. Por isso o esquema completo é usado sempre que alguma
+palavra de conteúdo da pergunta não corresponde a nenhuma coluna, ou quando a
+pergunta cita um ano e nenhuma coluna de data foi identificada.
+"""
+
+import glob
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import duckdb
+
+from question_cache import char_ngrams, normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Colunas sempre enviadas: identificam a empresa (o prompt exige RAZAO_SOCIAL
+# nas consultas sem agregação) e a localização, já que nomes de cidades e
+# estados na pergunta não são reconhecíveis por palavras-chave.
+CORE_COLUMNS = ("CNPJ_BASICO", "RAZAO_SOCIAL", "UF", "NOME_MUNICIPIO")
+
+# Palavras da pergunta que apontam para cada coluna, além do próprio nome.
+# Termos terminados em ``*`` valem como prefixo (``ABERT*`` cobre ABERTA,
+# ABERTOS, ABERTURA...).
+SYNONYMS = {
+    "CNPJ_BASICO": "CNPJ EMPRESAS QUANTAS QUANTIDADE",
+    "RAZAO_SOCIAL": "NOME EMPRESA EMPRESAS RAZAO CHAMADA",
+    "NATUREZA_JURIDICA": "NATUREZA JURIDICA LTDA EIRELI SA MEI MEIS SOCIEDADE EMPRESARIO INDIVIDUAL COOPERATIVA* ASSOCIAC*",
+    "CAPITAL_SOCIAL": "CAPITAL VALOR REAIS MILHOES MIL INVESTIMENTO",
+    "PORTE_EMPRESA": "PORTE MICROEMPRESA* MICRO EPP PEQUENA* GRANDE* DEMAIS MEI MEIS SIMPLES OPTANTE*",
+    "IDENTIFICADOR_MATRIZ_FILIAL": "MATRIZ FILIAL FILIAIS",
+    "NOME_FANTASIA": "FANTASIA MARCA",
+    "SITUACAO_CADASTRAL": "SITUACAO ATIVA ATIVAS BAIXADA BAIXADAS INAPTA INAPTAS SUSPENSA NULA FECHADA FECHADAS",
+    "DATA_SITUACAO_CADASTRAL": "BAIXA FECHAMENTO ENCERRAMENTO FECHARAM",
+    "DATA_INICIO_ATIVIDADE": "ABERT* ABRIU ABRIRAM FUNDAD* FUNDACAO CRIAD* INICIO INICIOU ANO DESDE ANTIGA* RECENTE* NOVA NOVAS IDADE",
+    "CNAE_FISCAL_PRINCIPAL": "CNAE ATIVIDADE RAMO SETOR SEGMENTO ECONOMICA SOFTWARE TECNOLOGIA INFORMATICA RESTAURANT* LANCHONETE* COMERCIO INDUSTRIA* SERVICO* LOJA*",
+    "CNAE_FISCAL_SECUNDARIA": "SECUNDARIA SECUNDARIAS",
+    "LOGRADOURO": "ENDERECO RUA AVENIDA",
+    "TIPO_LOGRADOURO": "ENDERECO RUA AVENIDA",
+    "NUMERO": "ENDERECO",
+    "BAIRRO": "BAIRRO ENDERECO",
+    "CEP": "CEP ENDERECO",
+    "UF": (
+        "ESTADO ESTADOS UF AC AL AP AM BA CE DF ES GO MA MT MS MG PA PB PR PE PI RJ RN RS RO RR SC SP SE TO "
+        "ACRE ALAGOAS AMAPA AMAZONAS BAHIA CEARA DISTRITO FEDERAL ESPIRITO SANTO GOIAS MARANHAO MATO GROSSO "
+        "MINAS GERAIS PARAIBA PARANA PERNAMBUCO PIAUI RIO JANEIRO NORTE SUL RONDONIA RORAIMA SANTA CATARINA "
+        "PAULO SERGIPE TOCANTINS"
+    ),
+    "MUNICIPIO": "MUNICIPIO CODIGO",
+    "NOME_MUNICIPIO": "CIDADE CIDADES MUNICIPIO MUNICIPIOS",
+    "TELEFONE_1": "TELEFONE CONTATO",
+    "DDD_1": "DDD TELEFONE",
+    "CORREIO_ELETRONICO": "EMAIL CONTATO ELETRONICO",
+    "NOME_SOCIO": "SOCIO SOCIOS SOCIA DONO DONOS PROPRIETARIO QSA",
+    "IDENTIFICADOR_SOCIO": "SOCIO PESSOA FISICA JURIDICA ESTRANGEIRO",
+    "QUALIFICACAO_SOCIO": "ADMINISTRADOR DIRETOR PRESIDENTE QUALIFICACAO",
+    "DATA_ENTRADA_SOCIEDADE": "ENTRADA ENTROU",
+    "PAIS_SOCIO": "PAIS ESTRANGEIRO EXTERIOR",
+    "FAIXA_ETARIA": "IDADE IDOSO JOVEM ETARIA",
+    "NOME_REPRESENTANTE": "REPRESENTANTE",
+}
+
+# Palavras que não indicam coluna alguma.
+STOPWORDS = set(
+    "A AS O OS AO AOS DE DA DAS DO DOS E OU EM NA NAS NO NOS PELO PELA PELOS PELAS UM UMA "
+    "QUE QUAL QUAIS COM POR PARA SEM SAO FOI FORAM SERA ESTA ESTAO ESTAVAM TEM POSSUI POSSUEM HA EXISTE EXISTEM EXISTIAM SE "
+    "QUANTAS QUANTOS QUANTO QUANTA ONDE QUANDO COMO CADA TODA TODAS TODO TODOS "
+    "LISTE LISTAR MOSTRE MOSTRAR ME DIGA INFORME MAIS MENOS ENTRE ATE APOS ANTES DEPOIS "
+    "ACIMA ABAIXO MAIOR MAIORES MENOR MENORES TOTAL MEDIA DISTRIBUICAO PROPORCAO PERCENTUAL RANKING "
+    "EMPRESA EMPRESAS NOME CODIGO DATA".split()
+)
+
+# Tabelas de domínio cujas descrições entram nas palavras-chave da coluna que
+# guarda o código: (coluna, pasta dos Parquets, coluna de descrição).
+CODE_DESCRIPTIONS = (
+    ("CNAE_FISCAL_PRINCIPAL", "parquet_cnaes", "DESCRICAO_CNAE"),
+    ("NATUREZA_JURIDICA", "parquet_naturezas", "DESCRICAO_NATUREZA"),
+)
+
+_METADATA_COLUMN = re.compile(r"^- (\w+)\b(.*)$")
+_WORDS = re.compile(r"[A-Z0-9]+")
+_YEAR = re.compile(r"^(19|20)\d\d$")
+
+
+def _stem(word: str) -> str:
+    """Remove o plural simples ("SOCIOS" -> "SOCIO")."""
+    return word[:-1] if len(word) > 4 and word.endswith("S") else word
+
+
+def _words(text: str) -> set:
+    return {_stem(word) for word in _WORDS.findall(normalize_question(text)) if len(word) > 1}
+
+
+def load_code_descriptions(conn: duckdb.DuckDBPyConnection, data_dir: str) -> Dict[str, List[str]]:
+    """Lê as descrições de CNAEs e naturezas jurídicas dos Parquets de domínio.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): Conexão usada na leitura.
+        data_dir (str): Diretório que contém as pastas ``parquet_*``.
+
+    Returns:
+        Dict[str, List[str]]: Descrições por coluna; pastas ausentes são ignoradas.
+    """
+    descriptions = {}
+    for column, folder, field in CODE_DESCRIPTIONS:
+        pattern = os.path.join(data_dir, folder, "*.parquet")
+        if not glob.glob(pattern):
+            logger.warning("Sem %s; as descrições de %s não entram no índice de esquema.", pattern, column)
+            continue
+        try:
+            rows = conn.execute(f"SELECT DISTINCT {field} FROM parquet_scan('{pattern}')").fetchall()
+        except duckdb.Error as e:
+            logger.warning("Falha ao ler %s: %s", pattern, e)
+            continue
+        descriptions[column] = [row[0] for row in rows if row[0]]
+    return descriptions
+
+
+class SchemaIndex:
+    """Índice de palavras-chave e trigramas sobre as colunas da tabela de consulta."""
+
+    def __init__(
+        self,
+        columns: List[Tuple[str, str]],
+        metadata: str,
+        table: str = "resultados_consulta",
+        similarity_threshold: float = 0.8,
+        max_columns: int = 12,
+        descriptions: Optional[Dict[str, Iterable[str]]] = None,
+    ):
+        """Monta o índice.
+
+        Args:
+            columns (List[Tuple[str, str]]): Pares (nome, tipo) do ``DESCRIBE``.
+            metadata (str): Bloco de metadados (uma linha ``- COLUNA ...`` por coluna e notas de domínio).
+            table (str): Nome da tabela consultada.
+            similarity_threshold (float): Coeficiente de Dice mínimo entre trigramas de palavras.
+            max_columns (int): Máximo de colunas enviadas além das essenciais.
+            descriptions (Optional[Dict[str, Iterable[str]]]): Textos extras por coluna, como as
+                descrições de CNAEs de ``load_code_descriptions``.
+        """
+        self.columns = columns
+        self.table = table
+        self.similarity_threshold = similarity_threshold
+        self.max_columns = max_columns
+        self.header, self.column_notes, self.domain_notes = self._split_metadata(metadata)
+        stopwords = {_stem(word) for word in STOPWORDS}
+        descriptions = descriptions or {}
+        self.keywords: Dict[str, set] = {}
+        self.prefixes: Dict[str, Tuple[str, ...]] = {}
+        for name, _ in columns:
+            synonyms = SYNONYMS.get(name, "").split()
+            self.prefixes[name] = tuple(term[:-1] for term in synonyms if term.endswith("*"))
+            text = " ".join(
+                [name.replace("_", " "), self.column_notes.get(name, "")]
+                + [term for term in synonyms if not term.endswith("*")]
+                + list(descriptions.get(name, ()))
+            )
+            self.keywords[name] = _words(text) - stopwords
+        self.date_columns = {name for name, kind in columns if kind.upper().startswith(("DATE", "TIMESTAMP"))}
+        self.stopwords = stopwords
+        self._grams = {word: char_ngrams(word) for words in self.keywords.values() for word in words}
+
+    @staticmethod
+    def _split_metadata(metadata: str) -> Tuple[str, Dict[str, str], List[str]]:
+        header, notes, domain = [], {}, []
+        in_domain = False
+        for line in metadata.strip().splitlines():
+            stripped = line.strip()
+            if stripped.startswith("Domínio"):
+                in_domain = True
+                continue
+            match = _METADATA_COLUMN.match(stripped)
+            if in_domain:
+                if stripped:
+                    domain.append(stripped)
+            elif match:
+                notes[match.group(1)] = stripped
+            elif stripped:
+                header.append(stripped)
+        return "\n".join(header), notes, domain
+
+    def _word_matches(self, word: str, name: str) -> float:
+        keywords, prefixes = self.keywords[name], self.prefixes[name]
+        if word in keywords or (prefixes and word.startswith(prefixes)):
+            return 1.0
+        if len(word) < 4:
+            return 0.0
+        grams = char_ngrams(word)
+        best = 0.0
+        for keyword in keywords:
+            other = self._grams[keyword]
+            score = 2 * len(grams & other) / (len(grams) + len(other))
+            best = max(best, score)
+        return best if best >= self.similarity_threshold else 0.0
+
+    def relevant_columns(self, question: str) -> Optional[List[str]]:
+        """Retorna as colunas relevantes para a pergunta.
+
+        Returns:
+            Optional[List[str]]: Colunas na ordem do esquema, ou None quando o esquema completo
+            deve ser usado (alguma palavra de conteúdo sem coluna correspondente, ou um ano sem
+            coluna de data identificada).
+        """
+        words = _words(question) - self.stopwords
+        values = {word for word in words if word.isdigit()}
+        scores, best = {}, set()
+        for word in words - values:
+            word_scores = {}
+            for name in self.keywords:
+                score = self._word_matches(word, name)
+                if score:
+                    word_scores[name] = score
+                    scores[name] = scores.get(name, 0.0) + score
+            if not word_scores:
+                logger.debug("Palavra sem coluna correspondente: %s", word)
+                return None
+            # A melhor coluna de cada palavra entra mesmo além de max_columns.
+            best.add(max(word_scores, key=word_scores.get))
+        if not scores:
+            return None
+        if any(_YEAR.match(word) for word in values) and not self.date_columns & scores.keys():
+            return None
+        matched = [name for name in scores if name not in CORE_COLUMNS]
+        ranked = sorted(matched, key=lambda name: -scores[name])[:self.max_columns]
+        selected = set(ranked) | best | set(CORE_COLUMNS)
+        return [name for name, _ in self.columns if name in selected]
+
+    def prune(self, question: str, full_schema: str, full_metadata: str) -> Tuple[str, str]:
+        """Monta o esquema e os metadados reduzidos para a pergunta.
+
+        Args:
+            question (str): Pergunta do usuário.
+            full_schema (str): Esquema completo, usado como fallback.
+            full_metadata (str): Metadados completos, usados como fallback.
+
+        Returns:
+            Tuple[str, str]: Esquema e metadados a enviar ao LLM.
+        """
+        selected = self.relevant_columns(question)
+        if selected is None:
+            logger.info("Colunas da pergunta não identificadas com segurança; usando o esquema completo.")
+            return full_schema, full_metadata
+        types = dict(self.columns)
+        schema = f"Tabela: {self.table}\nColunas:\n" + "".join(f" - {name} ({types[name]})\n" for name in selected)
+        lines = [self.header] + [self.column_notes[name] for name in selected if name in self.column_notes]
+        words = _words(question)
+        domain = [note for note in self.domain_notes if _words(note) & words]
+        if domain:
+            lines += ["", "Domínio:"] + domain
+        logger.info("Esquema reduzido a %d de %d colunas: %s", len(selected), len(self.columns), ", ".join(selected))
+        return schema, "\n".join(lines)
@@ -1,31 +1,35 @@
 # =============================================================================
 # Importações da Biblioteca Padrão
 # =============================================================================
+import argparse
 import asyncio
+import importlib
 import logging
-import gc  # Import para coletor de lixo
+import os
+import signal
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
 from operator import add
-from typing import List, Annotated
+from typing import TYPE_CHECKING, List, Annotated, Optional
 from typing_extensions import TypedDict
-import concurrent.futures
-import queue
-from contextlib import contextmanager
 
 # =============================================================================
 # Importações de Bibliotecas de Terceiros
 # =============================================================================
-import duckdb
 from dotenv import load_dotenv
-from grpc import aio
-import psutil
+from grpc import aio, StatusCode
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 
 # =============================================================================
 # Importações do LangChain e LangGraph
 # =============================================================================
-from langchain_openai.chat_models import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
-from langgraph.graph import StateGraph, END, START
-from langgraph.checkpoint.memory import MemorySaver
+# Importados sob demanda (build_graph, llm_messages, checkpointer e o modelo do
+# llm_pool): somam ~2 s de import e só são necessários no aquecimento ou na
+# primeira pergunta. src/bench/bench_importtime.py impede que voltem ao topo.
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
 
 # =============================================================================
 # Imports do Protocolo gRPC
@@ -33,6 +37,32 @@ from langgraph.checkpoint.memory import MemorySaver
 import genai_pb2
 import genai_pb2_grpc
 
+# =============================================================================
+# Módulos Locais
+# =============================================================================
+import materialize
+import rollups
+from name_index import NameIndex, default_directory as name_index_directory
+from result_cache import ResultCache, estimate_size
+from question_cache import QuestionSQLCache
+from memory_governor import MemoryGovernor, MemoryPressureError
+from db_pool import DuckDBConnectionPool
+import query_results
+import answer_templates
+from llm_pool import LLMClientPool, build_chat_model
+from schema_index import SchemaIndex, load_code_descriptions
+import cost_gate
+from query_scheduler import QueryScheduler, classify_query, POINT
+import cnpj_lookup
+import workers
+import warmup
+import batch
+from single_flight import SingleFlight
+from question_cache import normalize_question
+import metrics
+import tracing
+import slow_queries
+
 # =============================================================================
 # Configuração de Logging e Variáveis de Ambiente
 # =============================================================================
@@ -44,49 +74,214 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # =============================================================================
-# Constantes para monitoramento de memória
+# Constantes para o governador de memória
+# =============================================================================
+MEMORY_BUDGET_BYTES = None        # None: 70% da RAM da máquina
+MEMORY_DUCKDB_FRACTION = 0.6      # Parte do orçamento destinada ao DuckDB
+MEMORY_SPILL_DIRECTORY = None     # None: diretório temporário do sistema
+MEMORY_ADMISSION_TIMEOUT = 30.0   # Segundos na fila antes de recusar a consulta
+
+# =============================================================================
+# Constantes do escalonador de consultas
+# =============================================================================
+DUCKDB_MAX_CONNECTIONS = 4        # Consultas simultâneas no DuckDB
+QUERY_CPU_BUDGET = None           # threads do DuckDB; None: núcleos da máquina - 1, repartidos entre os workers
+QUERY_HEAVY_LIMIT = None          # None: DUCKDB_MAX_CONNECTIONS - 1
+
+# =============================================================================
+# Limites dos resultados das queries
+# =============================================================================
+RESULT_MAX_ROWS = 100             # Linhas mantidas no estado; o resto é só contado
+RESULT_SUMMARY_MAX_ROWS = 1_000_000  # Linhas usadas no resumo de resultados truncados
+RESULT_PROMPT_ROWS = 20           # Linhas de amostra no prompt quando o resultado é truncado
+
+# =============================================================================
+# Chamadas ao LLM (independentes do pool do DuckDB)
+# =============================================================================
+LLM_MAX_CONCURRENT = 16           # Chamadas simultâneas ao LLM; as demais aguardam na fila
+LLM_MAX_CONNECTIONS = 32          # Conexões HTTP keep-alive com a API
+LLM_TIMEOUT_SECONDS = 60.0
+
+# =============================================================================
+# Redução do esquema enviado ao SQL writer
+# =============================================================================
+SCHEMA_PRUNING = True             # False envia sempre o esquema completo
+SCHEMA_MAX_COLUMNS = 12           # Colunas relevantes além de CNPJ_BASICO e RAZAO_SOCIAL
+
+# =============================================================================
+# Controle de custo das SQLs geradas (EXPLAIN antes de executar)
+# =============================================================================
+COST_LIMIT_ROWS = 10_000          # Saída estimada acima disso recebe LIMIT
+COST_APPROX_ROWS = 5_000_000      # Varreduras maiores usam approx_count_distinct
+COST_REFUSE_ROWS = 200_000_000    # Planos acima disso são recusados
+
+# =============================================================================
+# Índice de trigramas para LIKE '%...%' em RAZAO_SOCIAL, NOME_FANTASIA e NOME_SOCIO
+# =============================================================================
+NAME_INDEX_MAX_CANDIDATES = 5000  # Acima disso o LIKE segue como varredura
+
+# =============================================================================
+# Registro de Consultas Lentas (perfil do DuckDB)
+# =============================================================================
+SLOW_QUERY_SECONDS = 2.0          # Consultas com esse tempo guardam o perfil; None perfila só a amostra
+SLOW_QUERY_SAMPLE_RATE = 0.01     # Fração das consultas perfiladas mesmo quando rápidas
+SLOW_QUERY_LOG_PATH = slow_queries.DEFAULT_PATH  # O worker N grava em slow_queries.wN.jsonl
+SLOW_QUERY_LOG_MAX_BYTES = 20 * 1024 ** 2
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# =============================================================================
+# Consulta direta por CNPJ (perguntas sobre uma empresa, sem LLM)
+# =============================================================================
+CNPJ_FAST_PATH = True             # False envia também essas perguntas ao grafo
+CNPJ_MAX_ESTABLISHMENTS = 20      # Estabelecimentos listados na resposta
+
+# =============================================================================
+# Execuções idênticas simultâneas (single-flight)
+# =============================================================================
+SINGLE_FLIGHT = True              # False: cada requisição faz sua própria varredura e chamada ao LLM
+
+# =============================================================================
+# Lotes de perguntas (RPC AskQuestions)
+# =============================================================================
+BATCH_MAX_QUESTIONS = 1000        # Lotes maiores são recusados
+BATCH_MAX_CONCURRENCY = LLM_MAX_CONCURRENT  # Perguntas de um lote em andamento ao mesmo tempo
+
+# =============================================================================
+# Servidor gRPC e modo multiprocesso
+# =============================================================================
+LISTEN_ADDR = "[::]:50051"
+SERVER_WORKERS = 1                # >1: processos com SO_REUSEPORT e banco somente leitura
+WORKER_HEALTH_INTERVAL = 10.0     # Segundos entre relatórios de saúde dos workers
+SHUTDOWN_GRACE_SECONDS = 5        # Tempo para concluir as requisições ao encerrar
+
+# =============================================================================
+# Métricas (Prometheus) e rastreamento por nó
 # =============================================================================
-# Define o limite de memória em percentual (ex.: 80%)
-MEMORY_THRESHOLD_PERCENT = 80
+METRICS_PORT = 9464               # /metrics; o worker N usa METRICS_PORT + N; None desativa
+METRICS_HOST = "127.0.0.1"        # Só local; use "0.0.0.0" para coletar de outra máquina
 
 # =============================================================================
-# Função para liberar memória (chama o coletor de lixo)
+# Aquecimento antes de responder SERVING no health check do gRPC
 # =============================================================================
-def liberar_memoria():
-    gc.collect()
-    logger.info("Memória liberada (gc.collect() chamado).")
+WARMUP_ENABLED = True             # False: SERVING logo após abrir a porta
+WARMUP_PREFETCH = False           # True: pré-lê banco, índices e Parquets para o cache de páginas
+WARMUP_QUERIES = [                # Substituídas por --warmup-queries ARQUIVO
+    "SELECT UF, COUNT(DISTINCT CNPJ_BASICO) AS EMPRESAS FROM resultados_consulta GROUP BY UF",
+    "SELECT DISTINCT RAZAO_SOCIAL FROM resultados_consulta WHERE RAZAO_SOCIAL LIKE '%BRASIL%' LIMIT 10",
+    "SELECT DISTINCT RAZAO_SOCIAL, NOME_MUNICIPIO FROM resultados_consulta "
+    "WHERE CNAE_FISCAL_PRINCIPAL LIKE '62%' AND UF = 'SP' LIMIT 10",
+]
 
 # =============================================================================
-# Executor Global para Chamadas Bloqueantes
+# Respostas determinísticas (sem a segunda chamada ao LLM)
 # =============================================================================
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+TEMPLATE_ANSWERS = True           # False envia todo resultado ao interpret_results
+TEMPLATE_MAX_ROWS = 10            # Tabelas maiores vão para o LLM
+TEMPLATE_MAX_COLUMNS = 4
+
+# =============================================================================
+# Retenção dos checkpoints do LangGraph
+# =============================================================================
+CHECKPOINT_MODE = "memory"                 # "memory" ou "sqlite" (sobrevive a reinícios)
+CHECKPOINT_SQLITE_PATH = "checkpoints.sqlite"
+CHECKPOINT_MAX_THREADS = 1000              # Threads (conversas) mantidas
+CHECKPOINT_MAX_PER_THREAD = 20             # Checkpoints mantidos por thread
+CHECKPOINT_IDLE_SECONDS = 24 * 3600        # Threads ociosas são descartadas (modo memory)
+CHECKPOINT_PRUNE_INTERVAL = 300            # Segundos entre podas do SQLite
+
+# =============================================================================
+# Limites do cache de resultados
+# =============================================================================
+SQL_CACHE_MAX_BYTES = 512 * 1024 ** 2       # Orçamento total do cache (bytes estimados)
+SQL_CACHE_MAX_ENTRY_BYTES = 32 * 1024 ** 2  # Resultados maiores não são armazenados
+SQL_CACHE_TTL_SECONDS = 6 * 3600            # None desativa a expiração
+
+# =============================================================================
+# Cache pergunta -> SQL (evita a chamada ao LLM no sql_writer)
+# =============================================================================
+QUESTION_CACHE_MAX_ENTRIES = 5000
+QUESTION_CACHE_SIMILARITY = None  # Ex.: 0.9 ativa a busca aproximada por trigramas
+
+# =============================================================================
+# Caminhos do Banco e dos Dados
+# =============================================================================
+DB_PATH = materialize.DEFAULT_DB_PATH
+DATA_DIR = materialize.DEFAULT_DATA_DIR
+NAME_INDEX_DIR = name_index_directory(DB_PATH)
+METADATA_PDF_PATH = '/home/andsil/projetos/chat_empresas/doc/cnpj-metadados (1).pdf'
 
 # =============================================================================
 # Variáveis Globais para Cache
 # =============================================================================
 CACHED_DB_SCHEMA = None  # Cache do esquema do banco (obtido do PDF)
-SQL_CACHE = {}           # Cache para resultados de queries
+CACHED_SCHEMA_INDEX = None  # Índice de colunas para a redução do esquema
+NAME_INDEX = None  # Índice de trigramas dos nomes (carregado com o esquema)
+CNPJ_LOOKUP = None  # Consulta direta por CNPJ (carregada na primeira pergunta com CNPJ)
+QUERY_FLIGHTS = SingleFlight("SQL")  # Execuções da mesma SQL em andamento
+SQL_WRITER_FLIGHTS = SingleFlight("sql_writer")  # Geração de SQL para a mesma pergunta normalizada
+SQL_CACHE = ResultCache(  # Cache para resultados de queries
+    max_bytes=SQL_CACHE_MAX_BYTES,
+    max_entry_bytes=SQL_CACHE_MAX_ENTRY_BYTES,
+    ttl_seconds=SQL_CACHE_TTL_SECONDS,
+)
+QUESTION_SQL_CACHE = QuestionSQLCache(  # Cache de SQL por pergunta normalizada
+    max_entries=QUESTION_CACHE_MAX_ENTRIES,
+    similarity_threshold=QUESTION_CACHE_SIMILARITY,
+)
 
 # =============================================================================
-# Implementação de um Pool de Conexões para o DuckDB
+# Controle de Custo das SQLs Geradas
 # =============================================================================
-class DuckDBConnectionPool:
-    def __init__(self, db_path: str, max_connections: int = 4):
-        self.db_path = db_path
-        self.pool = queue.Queue(max_connections)
-        for _ in range(max_connections):
-            conn = duckdb.connect(db_path)
-            self.pool.put(conn)
+cost_policy = cost_gate.CostGate(
+    limit_rows=COST_LIMIT_ROWS, approx_rows=COST_APPROX_ROWS, refuse_rows=COST_REFUSE_ROWS
+)
 
-    @contextmanager
-    def connection(self):
-        conn = self.pool.get()
-        try:
-            yield conn
-        finally:
-            self.pool.put(conn)
+# =============================================================================
+# Pool do DuckDB, Governador de Memória e Escalonador de Consultas
+# =============================================================================
+# Criados por open_database(): no modo multiprocesso o banco não pode ser
+# aberto antes do fork, e cada worker o abre somente leitura.
+duckdb_pool = None
+memory_governor = None
+query_scheduler = None
+slow_query_log = None
 
-duckdb_pool = DuckDBConnectionPool('dados_empresas.duckdb', max_connections=4)
+def open_database(read_only: bool = False, workers: int = 1, worker_id: Optional[int] = None) -> None:
+    """Abre o pool do DuckDB e configura memória e CPU da instância.
+
+    Args:
+        read_only (bool): Abre o banco somente leitura (permite vários processos no mesmo arquivo).
+        workers (int): Processos que dividem a máquina; os orçamentos de memória e CPU são repartidos.
+        worker_id (Optional[int]): Índice do worker (separa o diretório de spill e o registro de consultas lentas).
+    """
+    global duckdb_pool, memory_governor, query_scheduler, slow_query_log
+    # Limite do DuckDB, spill e admissão de consultas
+    memory_governor = MemoryGovernor(
+        budget_bytes=MEMORY_BUDGET_BYTES,
+        duckdb_fraction=MEMORY_DUCKDB_FRACTION,
+        max_concurrent_queries=DUCKDB_MAX_CONNECTIONS,
+        temp_directory=MEMORY_SPILL_DIRECTORY,
+        processes=workers,
+        worker=worker_id,
+    )
+    # Orçamento de CPU, prioridades e fila por usuário
+    query_scheduler = QueryScheduler(
+        max_running=DUCKDB_MAX_CONNECTIONS,
+        cpu_budget=QUERY_CPU_BUDGET,
+        heavy_limit=QUERY_HEAVY_LIMIT,
+        processes=workers,
+    )
+    duckdb_pool = DuckDBConnectionPool(DB_PATH, max_connections=DUCKDB_MAX_CONNECTIONS, read_only=read_only)
+    slow_query_log = slow_queries.SlowQueryLog(
+        slow_queries.worker_path(SLOW_QUERY_LOG_PATH, worker_id),
+        threshold_seconds=SLOW_QUERY_SECONDS,
+        sample_rate=SLOW_QUERY_SAMPLE_RATE,
+        max_bytes=SLOW_QUERY_LOG_MAX_BYTES,
+        backups=SLOW_QUERY_LOG_BACKUPS,
+    )
+    with duckdb_pool.connection() as conn:
+        memory_governor.configure(conn)
+        query_scheduler.configure(conn)
 
 # =============================================================================
 # Definição do Estado do Agente
@@ -101,11 +296,18 @@ class AgentState(TypedDict):
     accepted: bool
     revision: int
     max_revision: int
-    results: List[tuple]
+    results: List[tuple]  # Primeiras RESULT_MAX_ROWS linhas do resultado
+    columns: List[str]  # Nomes das colunas do resultado
+    total_rows: int  # Total de linhas do resultado (antes do corte)
+    result_summary: str  # Resumo por coluna, preenchido quando o resultado é truncado
     interpretation: str
     plot_needed: bool
     plot_html: str
     needs_human_intervention: bool  # Sinaliza se intervenção humana é necessária
+    sql_from_cache: bool  # SQL reaproveitada do cache de perguntas
+    error: str  # Mensagem de erro da execução da query, se houver
+    user_id: str  # Usuário que fez a pergunta (fila justa no escalonador)
+    query_action: str  # Ajuste do controle de custo: '', 'limit', 'approximate' ou 'refuse'
 
 # =============================================================================
 # Funções de Extração e Processamento do Esquema
@@ -119,7 +321,7 @@ Tabela: resultados_consulta
 - RAZAO_SOCIAL (VARCHAR): Nome empresarial.
 - NATUREZA_JURIDICA (VARCHAR): Código da natureza jurídica.
 - QUALIFICACAO_RESPONSAVEL (VARCHAR): Qualificação do responsável.
-- CAPITAL_SOCIAL (VARCHAR): Capital social.
+- CAPITAL_SOCIAL (DOUBLE): Capital social em reais.
 - PORTE_EMPRESA (VARCHAR): Código do porte: 00 – Não informado, 01 – Microempresa, 03 – EPP, 05 – Demais.
 - ENTE_FEDERATIVO_RESPONSAVEL (VARCHAR): Órgão responsável.
 - CNPJ_ORDEM (VARCHAR): Número do estabelecimento.
@@ -127,11 +329,11 @@ Tabela: resultados_consulta
 - IDENTIFICADOR_MATRIZ_FILIAL (VARCHAR): 1 – Matriz, 2 – Filial.
 - NOME_FANTASIA (VARCHAR): Nome fantasia.
 - SITUACAO_CADASTRAL (VARCHAR): Código situação: 01 – Nula, 02 – Ativa, 03 – Suspensa, 04 – Inapta, 08 – Baixada.
-- DATA_SITUACAO_CADASTRAL (VARCHAR): Data do evento.
+- DATA_SITUACAO_CADASTRAL (DATE): Data do evento.
 - MOTIVO_SITUACAO_CADASTRAL (VARCHAR): -
 - NOME_CIDADE_EXTERIOR (VARCHAR): -
 - PAIS (VARCHAR): -
-- DATA_INICIO_ATIVIDADE (VARCHAR): - DATA QUE A EMPRESA INICIOU SUAS ATIVIDADES
+- DATA_INICIO_ATIVIDADE (DATE): - DATA QUE A EMPRESA INICIOU SUAS ATIVIDADES
 - CNAE_FISCAL_PRINCIPAL (VARCHAR): Código atividade principal.
 - CNAE_FISCAL_SECUNDARIA (VARCHAR): Códigos secundários (vírgula separada).
 - TIPO_LOGRADOURO (VARCHAR): -
@@ -150,12 +352,13 @@ Tabela: resultados_consulta
 - FAX (VARCHAR): -
 - CORREIO_ELETRONICO (VARCHAR): -
 - SITUACAO_ESPECIAL (VARCHAR): -
-- DATA_SITUACAO_ESPECIAL (VARCHAR): -
+- DATA_SITUACAO_ESPECIAL (DATE): -
 - IDENTIFICADOR_SOCIO (VARCHAR): 1 – Pessoa Jurídica, 2 – Pessoa Física, 3 – Estrangeiro.
 - NOME_SOCIO (VARCHAR): -
 - CNPJ_CPF_SOCIO (VARCHAR): -
 - QUALIFICACAO_SOCIO (VARCHAR): -
-- DATA_ENTRADA_SOCIEDADE (VARCHAR): -
+- DATA_ENTRADA_SOCIEDADE (DATE): -
+- PAIS_SOCIO (VARCHAR): País do sócio estrangeiro.
 - REPRESENTANTE_LEGAL (VARCHAR): -
 - NOME_REPRESENTANTE (VARCHAR): -
 - QUALIFICACAO_REPRESENTANTE (VARCHAR): -
@@ -171,100 +374,61 @@ Domínio:
     return metadata
 
 def get_database_schema(db_path: str, pdf_path: str):
-    global CACHED_DB_SCHEMA
+    global CACHED_DB_SCHEMA, CACHED_SCHEMA_INDEX, NAME_INDEX
     if CACHED_DB_SCHEMA is not None:
         return CACHED_DB_SCHEMA, extract_metadata_from_pdf(pdf_path)
 
     metadata = extract_metadata_from_pdf(pdf_path)
     with duckdb_pool.connection() as conn:
-        conn.execute("PRAGMA threads=4")
-        tables = conn.execute("SHOW TABLES").fetchall()
-        if ('resultados_consulta',) not in tables:
-            logger.info("Materializando a tabela resultados_consulta...")
-            conn.execute("""
-            CREATE VIEW resultados_consulta AS
-            SELECT 
-               e.CNPJ_BASICO
-                , e.RAZAO_SOCIAL
-                , e.NATUREZA_JURIDICA
-                , e.QUALIFICACAO_RESPONSAVEL
-                , e.CAPITAL_SOCIAL
-                , e.PORTE_EMPRESA
-                , e.ENTE_FEDERATIVO_RESPONSAVEL
-                , est.CNPJ_ORDEM
-                , est.CNPJ_DV
-                , est.IDENTIFICADOR_MATRIZ_FILIAL
-                , est.NOME_FANTASIA
-                , est.SITUACAO_CADASTRAL
-                , est.DATA_SITUACAO_CADASTRAL
-                , est.MOTIVO_SITUACAO_CADASTRAL
-                , est.NOME_CIDADE_EXTERIOR
-                , est.PAIS
-                , est.DATA_INICIO_ATIVIDADE
-                , est.CNAE_FISCAL_PRINCIPAL
-                , est.CNAE_FISCAL_SECUNDARIA
-                , est.TIPO_LOGRADOURO
-                , est.LOGRADOURO
-                , est.NUMERO
-                , est.COMPLEMENTO
-                , est.BAIRRO
-                , est.CEP
-                , est.UF
-                , est.DDD_1
-                , est.TELEFONE_1
-                , est.DDD_2
-                , est.TELEFONE_2
-                , est.DDD_FAX
-                , est.FAX
-                , est.CORREIO_ELETRONICO
-                , est.SITUACAO_ESPECIAL
-                , est.DATA_SITUACAO_ESPECIAL
-                , s.IDENTIFICADOR_SOCIO
-                , s.NOME_SOCIO
-                , s.CNPJ_CPF_SOCIO
-                , s.QUALIFICACAO_SOCIO
-                , s.DATA_ENTRADA_SOCIEDADE
-                , s.PAIS
-                , s.REPRESENTANTE_LEGAL
-                , s.NOME_REPRESENTANTE
-                , s.QUALIFICACAO_REPRESENTANTE
-                , s.FAIXA_ETARIA
-                , m.NOME_MUNICIPIO
-            FROM 
-                parquet_scan('data/parquet_empresas/*.parquet') AS e
-            LEFT JOIN 
-                parquet_scan('data/parquet_estabelecimentos/*.parquet') AS est 
-                ON e.CNPJ_BASICO = est.CNPJ_BASICO
-            LEFT JOIN 
-                parquet_scan('data/parquet_socios/*.parquet') AS s 
-                ON e.CNPJ_BASICO = s.CNPJ_BASICO
-            LEFT JOIN 
-                parquet_scan('data/parquet_municipios/*.parquet') AS m 
-                ON est.MUNICIPIO = m.CODIGO_MUNICIPIO
-            """)
-            #conn.execute("ANALYZE resultados_consulta;")
+        kind = materialize.ensure_resultados_consulta(conn, DATA_DIR)
+        logger.info("Consultas usarão resultados_consulta como %s.", "tabela materializada" if kind == "table" else "view")
+        version = materialize.dataset_version(conn, DATA_DIR)
+        SQL_CACHE.set_dataset_version(version)
+        if kind == "table":
+            NAME_INDEX = NameIndex.open(NAME_INDEX_DIR, version=version, max_candidates=NAME_INDEX_MAX_CANDIDATES)
         schema = "Tabela: resultados_consulta\nColunas:\n"
         columns = conn.execute("DESCRIBE resultados_consulta").fetchall()
         for column in columns:
             schema += f" - {column[0]} ({column[1]})\n"
+        descriptions = load_code_descriptions(conn, DATA_DIR)
     CACHED_DB_SCHEMA = schema
-    liberar_memoria()  # Libera memória após processar o esquema
+    CACHED_SCHEMA_INDEX = SchemaIndex(
+        [(column[0], column[1]) for column in columns], metadata, max_columns=SCHEMA_MAX_COLUMNS,
+        descriptions=descriptions,
+    )
     return schema, metadata
 
 # =============================================================================
 # Definição dos Nós do LangGraph (Assíncronos)
 # =============================================================================
 async def search_engineer_node(state: AgentState):
-    db_schema, metadata = get_database_schema(
-        'dados_empresas.duckdb',
-        '/home/andsil/projetos/chat_empresas/doc/cnpj-metadados (1).pdf'
-    )
+    db_schema, metadata = get_database_schema(DB_PATH, METADATA_PDF_PATH)
+    if SCHEMA_PRUNING:
+        db_schema, metadata = CACHED_SCHEMA_INDEX.prune(state['question'], db_schema, metadata)
     state['table_schemas'] = db_schema
     state['metadata'] = metadata
-    state['database'] = 'dados_empresas.duckdb'
-    liberar_memoria()  # Libera memória após atualizar o estado com esquema e metadados
+    state['database'] = DB_PATH
+    return state
+
+async def sql_cache_node(state: AgentState):
+    cached_sql = QUESTION_SQL_CACHE.get(state['question'])
+    if cached_sql is not None:
+        logger.info("SQL reaproveitada do cache de perguntas.")
+        tracing.cache_hit('question_sql')
+        state['sql'] = cached_sql
+        state['sql_from_cache'] = True
+    else:
+        state['sql_from_cache'] = False
     return state
 
+def route_after_sql_cache(state: AgentState) -> str:
+    return 'execute_query' if state.get('sql_from_cache') else 'sql_writer'
+
+def llm_messages(role_prompt: str, instruction: str) -> list:
+    """Mensagens de sistema e de usuário enviadas ao LLM."""
+    from langchain_core.messages import SystemMessage, HumanMessage
+    return [SystemMessage(content=role_prompt), HumanMessage(content=instruction)]
+
 async def sql_writer_node(state: AgentState):
     role_prompt = (
         "You are an expert in DuckDB SQL. Your task is to produce a raw SQL query that answers the user's question. "
@@ -282,50 +446,189 @@ async def sql_writer_node(state: AgentState):
         "Write the SQL query for the following question (the question is provided exactly as entered, in uppercase):\n"
         f"{state['question']}\n"
     )
-    messages = [
-        SystemMessage(content=role_prompt),
-        HumanMessage(content=instruction)
-    ]
-    loop = asyncio.get_running_loop()
-    response = await loop.run_in_executor(executor, model.invoke, messages)
-    state['sql'] = response.content.strip()
-    liberar_memoria()  # Libera memória após gerar a query SQL
+    messages = llm_messages(role_prompt, instruction)
+
+    async def write_sql() -> str:
+        response = await llm_pool.ainvoke(messages)
+        return response.content.strip()
+
+    # A mesma pergunta chegando de vários usuários ao mesmo tempo gera uma única chamada ao LLM
+    if SINGLE_FLIGHT:
+        state['sql'] = await SQL_WRITER_FLIGHTS.run(normalize_question(state['question']), write_sql)
+    else:
+        state['sql'] = await write_sql()
     return state
 
-async def execute_query_node(state: AgentState):
-    # Verifica o consumo de memória atual antes de executar a query
-    mem = psutil.virtual_memory()
-    if mem.percent >= MEMORY_THRESHOLD_PERCENT:
-        state['error'] = (
-            f"Alto consumo de memória detectado ({mem.percent:.2f}%). "
-            "Consulta abortada para preservar a estabilidade do servidor."
+def run_query(conn, sql: str, question: Optional[str] = None, trace_id: str = ''):
+    """Executa a SQL (ou sua reescrita para o rollup ou o índice de nomes) em uma thread do pool.
+
+    Args:
+        conn: Conexão do pool.
+        sql (str): SQL gerada.
+        question (Optional[str]): Pergunta de origem, guardada com o perfil se a consulta for lenta
+            ou sorteada; None (aquecimento) não passa pelo registro de consultas lentas.
+        trace_id (str): Trace da requisição, guardado com o perfil.
+
+    Raises:
+        cost_gate.QueryRefusedError: Se o plano estimado for caro demais.
+    """
+    generated = sql
+    rewritten = rollups.rewrite_query(conn, sql)
+    if rewritten is not None:
+        logger.info("Query respondida pelo rollup: %s", rewritten)
+        sql = rewritten
+    elif NAME_INDEX is not None:
+        restricted = NAME_INDEX.rewrite_query(conn, sql)
+        if restricted is not None:
+            sql = restricted
+    decision = cost_policy.check(conn, sql)
+
+    def fetch():
+        return query_results.fetch_result(
+            conn, decision.sql, max_rows=RESULT_MAX_ROWS, summary_max_rows=RESULT_SUMMARY_MAX_ROWS
         )
-        state['results'] = []
-        liberar_memoria()  # Libera memória caso a consulta não seja executada
-        return state
 
-    with duckdb_pool.connection() as conn:
-        conn.execute("PRAGMA threads=4")
-        cursor = conn.cursor()
+    if question is None or slow_query_log is None:
+        result = fetch()
+    else:
+        result = slow_query_log.run(
+            conn, fetch, question=question, sql=generated, executed_sql=decision.sql,
+            action=decision.action, trace_id=trace_id,
+        )
+    return result._replace(action=decision.action)
+
+def apply_result(state: AgentState, result: query_results.QueryResult) -> None:
+    """Copia o resultado da query para o estado do grafo."""
+    state['results'] = result.rows
+    state['columns'] = result.columns
+    state['total_rows'] = result.total_rows
+    state['result_summary'] = result.summary
+    state['query_action'] = result.action
+
+async def execute_sql(sql: str, user_id: str = '', question: str = '') -> query_results.QueryResult:
+    """Executa a SQL, ou aguarda a execução idêntica que já estiver em andamento."""
+    if not SINGLE_FLIGHT:
+        return await schedule_query(sql, user_id, question)
+    return await QUERY_FLIGHTS.run(
+        (SQL_CACHE.dataset_version, sql), lambda: schedule_query(sql, user_id, question)
+    )
+
+@asynccontextmanager
+async def admitted_query(user_id: str, priority: str):
+    """Aguarda a vaga no escalonador e a reserva de memória, registrando as esperas no span do nó."""
+    start = time.perf_counter()
+    async with query_scheduler.slot(user_id, priority):
+        admitted = time.perf_counter()
+        tracing.record_wait('query_slot', admitted - start)
+        # Reserva memória para a consulta; sem orçamento, aguarda na fila
+        async with memory_governor.admit(timeout=MEMORY_ADMISSION_TIMEOUT):
+            tracing.record_wait('memory', time.perf_counter() - admitted)
+            yield
+
+async def schedule_query(sql: str, user_id: str = '', question: str = '') -> query_results.QueryResult:
+    """Executa a SQL no pool do DuckDB sob o escalonador e o governador de memória e guarda o resultado no cache.
+
+    A pergunta e o trace id acompanham a consulta até o registro de consultas lentas.
+    """
+    priority = classify_query(sql)
+    trace_id = tracing.current_trace_id()
+
+    def run_and_sample(conn):
         try:
-            if state['sql'] in SQL_CACHE:
-                logger.info("Usando cache para a query.")
-                state['results'] = SQL_CACHE[state['sql']]
-            else:
-                cursor.execute(state['sql'])
-                results = cursor.fetchall()
-                SQL_CACHE[state['sql']] = results
-                state['results'] = results
-        except Exception as e:
-            state['results'] = []
-            state['error'] = str(e)
-            logger.error("Erro na query: %s", str(e))
+            return run_query(conn, sql, question, trace_id)
         finally:
-            cursor.close()
-    liberar_memoria()  # Libera memória após execução da query
+            # Medição do DuckDB para a próxima admissão, ainda com a conexão em mãos
+            memory_governor.sample_duckdb(conn)
+
+    async with admitted_query(user_id, priority):
+        result = await duckdb_pool.run(run_and_sample)
+    SQL_CACHE.put(sql, result)
+    return result
+
+async def execute_query_node(state: AgentState, config: "RunnableConfig" = None):
+    cached = SQL_CACHE.get(state['sql'])
+    if cached is not None:
+        logger.info("Usando cache para a query.")
+        tracing.cache_hit('sql_result')
+        tracing.set_result(cached.total_rows, estimate_size(cached.rows))
+        apply_result(state, cached)
+        if not state.get('sql_from_cache'):
+            QUESTION_SQL_CACHE.put(state['question'], state['sql'])
+        return state
+
+    # Em um lote, SQLs idênticas de perguntas diferentes são executadas uma vez
+    shared_queries = (config or {}).get('configurable', {}).get('shared_queries')
+    try:
+        sql, user_id, question = state['sql'], state.get('user_id', ''), state['question']
+        if shared_queries is not None:
+            result = await shared_queries.run(sql, lambda: execute_sql(sql, user_id, question))
+        else:
+            result = await execute_sql(sql, user_id, question)
+        tracing.set_result(result.total_rows, estimate_size(result.rows))
+        apply_result(state, result)
+        if result.truncated:
+            logger.info("Resultado truncado: %d de %d linhas mantidas.", len(result.rows), result.total_rows)
+        if not state.get('sql_from_cache'):
+            QUESTION_SQL_CACHE.put(state['question'], state['sql'])
+    except cost_gate.QueryRefusedError as e:
+        state['results'] = []
+        state['error'] = str(e)
+        state['query_action'] = cost_gate.REFUSE
+    except MemoryPressureError as e:
+        state['error'] = f"{e} Consulta abortada para preservar a estabilidade do servidor."
+        state['results'] = []
+        logger.warning("Consulta recusada pelo governador de memória: %s", e)
+    except Exception as e:
+        if state.get('sql_from_cache'):
+            QUESTION_SQL_CACHE.invalidate(state['sql'])
+        state['results'] = []
+        state['error'] = str(e)
+        logger.error("Erro na query: %s", str(e))
+    return state
+
+# Avisos ao LLM sobre ajustes feitos pelo controle de custo.
+QUERY_ACTION_NOTES = {
+    cost_gate.LIMIT: f"Note: the query was limited to {COST_LIMIT_ROWS} rows; the real total may be larger.\n",
+    cost_gate.APPROXIMATE: "Note: distinct counts are approximate (approx_count_distinct); say so in the answer.\n",
+}
+
+def route_after_execute_query(state: AgentState) -> str:
+    if state.get('query_action') == cost_gate.REFUSE:
+        return 'render_answer'
+    if TEMPLATE_ANSWERS and not state.get('error') and answer_templates.qualifies(
+        state.get('columns') or [], state['results'], state.get('total_rows') or 0,
+        TEMPLATE_MAX_ROWS, TEMPLATE_MAX_COLUMNS
+    ):
+        return 'render_answer'
+    return 'interpret_results'
+
+async def render_answer_node(state: AgentState, config: "RunnableConfig" = None):
+    """Responde com um modelo fixo quando o resultado é um escalar, uma linha ou uma tabela pequena.
+
+    Também devolve ao usuário a mensagem de recusa do controle de custo.
+    """
+    if state.get('query_action') == cost_gate.REFUSE:
+        state['interpretation'] = state['error']
+    else:
+        state['interpretation'] = answer_templates.render_answer(
+            state.get('columns') or [], state['results'], state.get('total_rows') or 0,
+            TEMPLATE_MAX_ROWS, TEMPLATE_MAX_COLUMNS
+        )
+        if state.get('query_action') == cost_gate.APPROXIMATE:
+            state['interpretation'] += "\n\n_Contagens aproximadas: a contagem exata seria custosa demais._"
+    on_token = config.get('configurable', {}).get('on_token') if config else None
+    if on_token is not None:
+        on_token(state['interpretation'])
     return state
 
-async def interpret_results_node(state: AgentState):
+def result_from_state(state: AgentState) -> query_results.QueryResult:
+    """Reconstrói o resultado da query a partir do estado do grafo."""
+    return query_results.QueryResult(
+        state.get('columns') or [], state['results'], state.get('total_rows') or len(state['results']),
+        state.get('result_summary', '')
+    )
+
+async def interpret_results_node(state: AgentState, config: "RunnableConfig" = None):
     role_prompt = (
         "You are an assistant specialized in interpreting SQL query results with DuckDB syntax, "
         "explaining them in natural language. Your task is to analyze the query results provided below and answer the original user's question with clarity and precision. "
@@ -336,25 +639,24 @@ async def interpret_results_node(state: AgentState):
     instruction = (
         f"Question: {state['question']}\n"
         f"SQL: {state['sql']}\n"
-        f"Results: {state['results']}\n"
+        f"Results:\n{query_results.format_for_prompt(result_from_state(state), RESULT_PROMPT_ROWS)}\n"
+        f"{QUERY_ACTION_NOTES.get(state.get('query_action', ''), '')}"
         "Based on these results, provide a clear, concise, and accurate answer to the user's question. "
         "Ensure that if data are present, your answer reflects them; if no data are returned, clearly state that no data were found."
     )
-    messages = [
-        SystemMessage(content=role_prompt),
-        HumanMessage(content=instruction)
-    ]
-    loop = asyncio.get_running_loop()
-    response = await loop.run_in_executor(executor, model.invoke, messages)
-    state['interpretation'] = response.content
-    liberar_memoria()  # Libera memória após interpretar os resultados
+    messages = llm_messages(role_prompt, instruction)
+    on_token = config.get('configurable', {}).get('on_token') if config else None
+    if on_token is not None:
+        state['interpretation'] = await llm_pool.astream(messages, on_token)
+    else:
+        response = await llm_pool.ainvoke(messages)
+        state['interpretation'] = response.content
     return state
 
 # Função simulada para obter feedback humano de forma assíncrona.
 async def get_human_input(question: str) -> str:
     logger.info("Aguardando resposta humana para: %s", question)
     await asyncio.sleep(1)
-    liberar_memoria()  # Libera memória após aguardar feedback
     return "Esclareça quais dados adicionais você deseja."
 
 # -----------------------------------------------------------------------------
@@ -373,7 +675,6 @@ async def human_intervention_node(state: AgentState):
         state['needs_human_intervention'] = True
     else:
         state['needs_human_intervention'] = False
-    liberar_memoria()  # Libera memória após intervenção humana
     return state
 
 # =============================================================================
@@ -381,41 +682,145 @@ async def human_intervention_node(state: AgentState):
 # =============================================================================
 async def monitor_memory():
     while True:
-        mem = psutil.virtual_memory()
-        if mem.percent >= MEMORY_THRESHOLD_PERCENT:
-            logger.warning("Alto consumo de memória detectado: %.2f%%", mem.percent)
+        if memory_governor.under_pressure():
+            logger.warning("Alto consumo de memória detectado: %s", memory_governor.stats())
+            logger.warning("Estado do cache de resultados: %s", SQL_CACHE.stats())
+            logger.warning("Estado do escalonador de consultas: %s", query_scheduler.stats())
+            logger.warning("Estado do pool do LLM: %s", llm_pool.stats())
+            logger.warning("Decisões do controle de custo: %s", cost_policy.stats())
+            if NAME_INDEX is not None:
+                logger.warning("Uso do índice de nomes: %s", NAME_INDEX.stats())
+            logger.warning(
+                "Execuções coalescidas: SQL %s, sql_writer %s", QUERY_FLIGHTS.stats(), SQL_WRITER_FLIGHTS.stats()
+            )
+            memory_governor.maybe_collect()
+        await memory_governor.wake_waiters()
         await asyncio.sleep(1)
 
 # =============================================================================
-# Inicialização do Modelo de Linguagem com Parâmetro de Tokens
+# Modelo de Linguagem (criado na primeira chamada ou no aquecimento)
 # =============================================================================
-model = ChatOpenAI(model_name="gpt-4o-mini", temperature=0, max_tokens=150)
+llm_pool = LLMClientPool(
+    factory=lambda: build_chat_model(
+        model_name="gpt-4o-mini", temperature=0, max_tokens=150,
+        max_connections=LLM_MAX_CONNECTIONS, timeout=LLM_TIMEOUT_SECONDS,
+    ),
+    max_concurrent=LLM_MAX_CONCURRENT,
+)
 
 # =============================================================================
 # Construção do LangGraph com os Nós Assíncronos
 # =============================================================================
-builder = StateGraph(AgentState)
-builder.add_node('search_engineer', search_engineer_node)
-builder.add_node('sql_writer', sql_writer_node)
-builder.add_node('execute_query', execute_query_node)
-builder.add_node('interpret_results', interpret_results_node)
-builder.add_node('human_intervention', human_intervention_node)
+def build_graph():
+    """Monta o StateGraph do pipeline (sem compilar)."""
+    from langgraph.graph import StateGraph, END, START
+
+    builder = StateGraph(AgentState)
+    nodes = {
+        'search_engineer': search_engineer_node,
+        'sql_cache': sql_cache_node,
+        'sql_writer': sql_writer_node,
+        'execute_query': execute_query_node,
+        'interpret_results': interpret_results_node,
+        'render_answer': render_answer_node,
+        'human_intervention': human_intervention_node,
+    }
+    for name, node in nodes.items():
+        # Cada nó roda em um span: duração, tokens, linhas, caches e filas por nó
+        builder.add_node(name, tracing.traced_node(name, node))
+
+    builder.add_edge(START, 'search_engineer')
+    builder.add_edge('search_engineer', 'sql_cache')
+    builder.add_conditional_edges('sql_cache', route_after_sql_cache, ['sql_writer', 'execute_query'])
+    builder.add_edge('sql_writer', 'execute_query')
+    builder.add_conditional_edges('execute_query', route_after_execute_query, ['render_answer', 'interpret_results'])
+    builder.add_edge('interpret_results', 'human_intervention')
+    builder.add_edge('render_answer', 'human_intervention')
+    builder.add_edge('human_intervention', END)
+    builder.set_entry_point('search_engineer')
+    return builder
+
+graph = None  # Compilado em main() com o checkpointer escolhido, ou em get_graph()
+
+def get_graph():
+    """Grafo compilado; fora de main() usa checkpoints em memória."""
+    global graph
+    if graph is None:
+        import checkpointer
+        graph = build_graph().compile(checkpointer=checkpointer.BoundedMemorySaver(
+            max_threads=CHECKPOINT_MAX_THREADS,
+            max_checkpoints_per_thread=CHECKPOINT_MAX_PER_THREAD,
+            idle_seconds=CHECKPOINT_IDLE_SECONDS,
+        ))
+    return graph
+
+def preload_dependencies() -> None:
+    """Importa LangGraph, LangChain e o cliente da OpenAI sem criar objetos.
+
+    Usado pelo supervisor antes do ``fork``, para que os workers compartilhem
+    as páginas dos módulos em vez de cada um importá-los.
+    """
+    for module in ("checkpointer", "langgraph.graph", "langchain_core.messages", "langchain_openai.chat_models"):
+        importlib.import_module(module)
+
+# Execuções na mesma thread são serializadas para não intercalarem checkpoints.
+thread_locks = weakref.WeakValueDictionary()
+
+# =============================================================================
+# Consulta Direta por CNPJ
+# =============================================================================
+def get_cnpj_lookup() -> cnpj_lookup.CnpjLookup:
+    global CNPJ_LOOKUP
+    if CNPJ_LOOKUP is None:
+        with duckdb_pool.connection() as conn:
+            materialize.ensure_resultados_consulta(conn, DATA_DIR)
+            CNPJ_LOOKUP = cnpj_lookup.CnpjLookup.load(conn, max_establishments=CNPJ_MAX_ESTABLISHMENTS)
+    return CNPJ_LOOKUP
+
+async def lookup_company(key: cnpj_lookup.CnpjKey, user_id: str = ''):
+    """Lê a empresa do CNPJ como consulta pontual (prioridade no escalonador)."""
+    lookup = get_cnpj_lookup()
+    async with admitted_query(user_id, POINT):
+        return await duckdb_pool.run(lookup.lookup, key)
 
-builder.add_edge(START, 'search_engineer')
-builder.add_edge('search_engineer', 'sql_writer')
-builder.add_edge('sql_writer', 'execute_query')
-builder.add_edge('execute_query', 'interpret_results')
-builder.add_edge('interpret_results', 'human_intervention')
-builder.add_edge('human_intervention', END)
-builder.set_entry_point('search_engineer')
+async def answer_cnpj_question(state: AgentState, key: cnpj_lookup.CnpjKey, on_stage=None) -> AgentState:
+    """Responde à pergunta sobre uma empresa pela consulta direta, sem passar pelo grafo."""
+    start = time.perf_counter()
+    with tracing.span('cnpj_lookup'):
+        record = await lookup_company(key, state['user_id'])
+        rows = [] if record is None else [record.empresa, *record.estabelecimentos, *record.socios]
+        tracing.set_result(len(rows), estimate_size(rows))
+    state['interpretation'] = get_cnpj_lookup().render(key, record)
+    elapsed = time.perf_counter() - start
+    logger.info("Pergunta respondida pela consulta direta do CNPJ %s em %.1f ms.", key.formatted(), elapsed * 1000)
+    if on_stage is not None:
+        on_stage('cnpj_lookup', state, elapsed)
+    return state
 
-memory = MemorySaver()
-graph = builder.compile(checkpointer=memory)
+def record_fields(row: dict) -> dict:
+    """Converte uma linha da consulta direta para o mapa de strings do gRPC."""
+    return {
+        name: value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        for name, value in row.items() if value is not None
+    }
 
 # =============================================================================
 # Função para Processar uma Pergunta Usando o Grafo (Assíncrona)
 # =============================================================================
-async def process_question(question: str) -> AgentState:
+async def process_question(
+    question: str, on_stage=None, on_token=None, user_id: str = '', thread_key: str = '',
+    shared_queries: Optional[SingleFlight] = None,
+) -> AgentState:
+    """Executa o grafo para a pergunta.
+
+    Args:
+        question (str): Pergunta do usuário.
+        on_stage: Callback opcional ``(nó, estado, segundos_decorridos)`` chamado ao fim de cada nó.
+        on_token: Callback opcional chamado com cada trecho da interpretação gerada pelo LLM.
+        user_id (str): Identificação do usuário.
+        thread_key (str): Thread do LangGraph da conversa. Sem ela, cada pergunta usa uma thread nova.
+        shared_queries (Optional[SingleFlight]): Execuções de SQL compartilhadas entre as perguntas de um lote.
+    """
     initial_state = {
         'question': question,
         'table_schemas': '',
@@ -427,47 +832,314 @@ async def process_question(question: str) -> AgentState:
         'revision': 0,
         'max_revision': 2,
         'results': [],
+        'columns': [],
+        'total_rows': 0,
+        'result_summary': '',
         'interpretation': '',
         'plot_needed': False,
         'plot_html': '',
-        'needs_human_intervention': False
+        'needs_human_intervention': False,
+        'sql_from_cache': False,
+        'error': '',
+        'user_id': user_id,
+        'query_action': ''
     }
-    thread = {'configurable': {'thread_id': '1'}}
-    async for _ in graph.astream(initial_state, thread):
-        pass
-    final_state = graph.get_state(thread).values
-    liberar_memoria()  # Libera memória após o processamento da pergunta
+    key = cnpj_lookup.parse_lookup_question(question) if CNPJ_FAST_PATH else None
+    if key is not None:
+        return await answer_cnpj_question(initial_state, key, on_stage)
+    thread_id = thread_key or uuid.uuid4().hex
+    config = {'configurable': {'thread_id': thread_id, 'on_token': on_token, 'shared_queries': shared_queries}}
+    lock = thread_locks.setdefault(thread_id, asyncio.Lock())
+    final_state = initial_state
+    start = time.perf_counter()
+    async with lock:
+        async for mode, chunk in get_graph().astream(initial_state, config, stream_mode=['updates', 'values']):
+            if mode == 'values':
+                final_state = chunk
+            elif on_stage is not None:
+                for node, node_state in chunk.items():
+                    on_stage(node, node_state, time.perf_counter() - start)
     return final_state
 
+def describe_stage(node: str, node_state: dict) -> str:
+    """Resume o resultado de um nó do grafo para o evento de progresso."""
+    if node == 'search_engineer':
+        return "Esquema carregado."
+    if node == 'sql_cache':
+        return "SQL encontrada no cache." if node_state.get('sql_from_cache') else "SQL não encontrada no cache."
+    if node == 'sql_writer':
+        return f"SQL gerada: {node_state.get('sql', '')}"
+    if node == 'execute_query':
+        if node_state.get('error'):
+            return f"Erro na consulta: {node_state['error']}"
+        total = node_state.get('total_rows') or 0
+        shown = len(node_state.get('results') or [])
+        if total > shown:
+            return f"{total} linha(s) retornada(s); {shown} mantida(s) (resultado truncado)."
+        return f"{shown} linha(s) retornada(s)."
+    if node == 'interpret_results':
+        return "Interpretação concluída."
+    if node == 'render_answer':
+        return "Resposta montada a partir do resultado."
+    if node == 'cnpj_lookup':
+        return "Empresa consultada diretamente pelo CNPJ."
+    return ""
+
+def request_user(request, context) -> str:
+    """Identifica o usuário da requisição (campo user_id ou, na falta dele, o peer gRPC)."""
+    return request.user_id or context.peer()
+
 # =============================================================================
 # Classe do Servidor gRPC
 # =============================================================================
+request_stats = workers.RequestCounter()  # Contadores enviados no relatório de saúde
+
 class GenAiServiceServicer(genai_pb2_grpc.GenAiServiceServicer):
+    @request_stats.tracked
+    @tracing.traced_rpc
     async def AskQuestion(self, request, context):
         user_question = request.question
         logger.info("Pergunta via gRPC: %s", user_question)
         try:
-            final_state = await process_question(user_question)
+            final_state = await process_question(
+                user_question, user_id=request_user(request, context), thread_key=request.thread_key
+            )
             resposta_final = final_state['interpretation']
         except Exception as e:
             logger.error("Erro: %s", str(e))
+            request_stats.failed()
             resposta_final = f"Erro: {str(e)}"
-        liberar_memoria()  # Libera memória após processar a pergunta via gRPC
         logger.info("Resposta enviada: %.50s", resposta_final.replace("\n", " ")[:50])
         return genai_pb2.AnswerResponse(answer=resposta_final)
 
+    @request_stats.tracked
+    @tracing.traced_rpc
+    async def AskQuestionStream(self, request, context):
+        user_question = request.question
+        logger.info("Pergunta via gRPC (stream): %s", user_question)
+        events = asyncio.Queue()
+        Event = genai_pb2.AnswerEvent
+
+        def on_stage(node, node_state, elapsed):
+            events.put_nowait(Event(
+                type=Event.STAGE, stage=node,
+                detail=describe_stage(node, node_state), elapsed_seconds=elapsed
+            ))
+
+        def on_token(token):
+            events.put_nowait(Event(type=Event.TOKEN, token=token))
+
+        async def run():
+            start = time.perf_counter()
+            try:
+                final_state = await process_question(
+                    user_question, on_stage=on_stage, on_token=on_token,
+                    user_id=request_user(request, context), thread_key=request.thread_key
+                )
+                events.put_nowait(Event(
+                    type=Event.DONE, answer=final_state['interpretation'],
+                    elapsed_seconds=time.perf_counter() - start
+                ))
+            except Exception as e:
+                logger.error("Erro: %s", str(e))
+                request_stats.failed()
+                events.put_nowait(Event(type=Event.ERROR, answer=f"Erro: {str(e)}"))
+            finally:
+                events.put_nowait(None)
+
+        task = asyncio.create_task(run())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            if not task.done():
+                task.cancel()
+
+    @request_stats.tracked
+    @tracing.traced_rpc
+    async def AskQuestions(self, request, context):
+        questions = list(request.questions)
+        if len(questions) > BATCH_MAX_QUESTIONS:
+            await context.abort(
+                StatusCode.INVALID_ARGUMENT, f"Lote com {len(questions)} perguntas; o limite é {BATCH_MAX_QUESTIONS}."
+            )
+        user_id = request_user(request, context)
+        concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+        logger.info("Lote via gRPC: %d perguntas, até %d simultâneas.", len(questions), concurrency)
+        shared_queries = batch.shared_queries()
+        start, distinct = time.perf_counter(), 0
+
+        async def answer(question: str) -> str:
+            final_state = await process_question(question, user_id=user_id, shared_queries=shared_queries)
+            return final_state['interpretation']
+
+        try:
+            async for item in batch.run_batch(questions, answer, concurrency):
+                distinct += 1
+                if item.error:
+                    request_stats.failed()
+                for position, index in enumerate(item.indices):
+                    yield genai_pb2.BatchAnswer(
+                        index=index, question=questions[index],
+                        answer=item.answer if not item.error else f"Erro: {item.error}",
+                        ok=not item.error, elapsed_seconds=item.seconds, deduplicated=position > 0,
+                    )
+        finally:
+            shared_queries.cancel()
+            logger.info(
+                "Lote concluído: %d perguntas (%d distintas respondidas), %d SQLs executadas, "
+                "%d reaproveitadas, em %.1fs.",
+                len(questions), distinct, shared_queries.started, shared_queries.coalesced,
+                time.perf_counter() - start,
+            )
+
+    @request_stats.tracked
+    @tracing.traced_rpc
+    async def LookupCnpj(self, request, context):
+        logger.info("Consulta de CNPJ via gRPC: %s", request.cnpj)
+        key = cnpj_lookup.parse_cnpj(f"CNPJ {request.cnpj}")
+        if key is None:
+            await context.abort(StatusCode.INVALID_ARGUMENT, f"CNPJ inválido: {request.cnpj}")
+        record = await lookup_company(key, request_user(request, context))
+        response = genai_pb2.CnpjResponse(
+            found=record is not None, cnpj=key.formatted(), answer=get_cnpj_lookup().render(key, record)
+        )
+        if record is not None:
+            response.empresa.fields.update(record_fields(record.empresa))
+            for est in record.estabelecimentos:
+                response.estabelecimentos.add().fields.update(record_fields(est))
+            for socio in record.socios:
+                response.socios.add().fields.update(record_fields(socio))
+        return response
+
 # =============================================================================
-# Função Principal para Execução do Servidor
+# Aquecimento e health check do gRPC
 # =============================================================================
-async def serve() -> None:
-    server = aio.server()
+def warmup_files(kind: str) -> List[str]:
+    """Arquivos pré-lidos no aquecimento: o banco, o índice de nomes e, com a view, os Parquets."""
+    paths = [DB_PATH]
+    if os.path.isdir(NAME_INDEX_DIR):
+        paths += sorted(
+            os.path.join(NAME_INDEX_DIR, name) for name in os.listdir(NAME_INDEX_DIR) if name.endswith(".npy")
+        )
+    if kind == "view":
+        paths += warmup.parquet_files(DATA_DIR)
+    return paths
+
+async def warm_up(queries: List[str] = WARMUP_QUERIES, prefetch: bool = WARMUP_PREFETCH) -> List[warmup.WarmupStep]:
+    """Prepara o processo antes de ele se declarar pronto; falhas são registradas e não impedem o boot.
+
+    Args:
+        queries (List[str]): Consultas executadas (com as reescritas de run_query) para aquecer caches.
+        prefetch (bool): Pré-lê os arquivos de dados para o cache de páginas do sistema operacional.
+
+    Returns:
+        List[warmup.WarmupStep]: Etapas executadas, com duração e resultado.
+    """
+    start = time.perf_counter()
+    steps = []
+
+    async def step(name, fn, *args):
+        steps.append(await asyncio.to_thread(warmup.timed_step, name, fn, *args))
+
+    async def db_step(name, fn, *args):
+        steps.append(await duckdb_pool.run(lambda conn: warmup.timed_step(name, fn, conn, *args)))
+
+    def prime(conn):
+        if materialize.relation_kind(conn) != "view":
+            return "tabela materializada, nenhum Parquet lido"
+        return f"{warmup.prime_parquet_metadata(conn, DATA_DIR)} arquivos"
+
+    await db_step("cache de metadados", warmup.enable_metadata_cache)
+    await step("esquema", lambda: f"{len(get_database_schema(DB_PATH, METADATA_PDF_PATH)[0].splitlines()) - 2} colunas")
+    await db_step("footers dos Parquets", prime)
+    await step("modelo de linguagem", lambda: type(llm_pool.model).__name__)
+    await step("consulta direta por CNPJ", lambda: f"{len(get_cnpj_lookup().first_keys)} row groups")
+    for i, sql in enumerate(queries, start=1):
+        await db_step(f"consulta {i}/{len(queries)}", lambda conn, sql=sql: f"{run_query(conn, sql).total_rows} linhas")
+    if prefetch:
+        kind = await duckdb_pool.run(materialize.relation_kind)
+        await step(
+            "pré-leitura dos arquivos",
+            lambda: f"{warmup.prefetch_files(warmup_files(kind)) / 1024 ** 2:.0f} MB",
+        )
+
+    failed = [s.name for s in steps if not s.ok]
+    logger.info(
+        "Aquecimento concluído em %.1fs (%d etapas%s).",
+        time.perf_counter() - start, len(steps), f", falharam: {', '.join(failed)}" if failed else "",
+    )
+    return steps
+
+def register_metrics() -> None:
+    """Expõe como gauges os contadores que os componentes já mantêm."""
+    registry = metrics.REGISTRY
+    registry.stats_gauges("chat_requests", "Requisições do processo.", request_stats.stats)
+    registry.stats_gauges("chat_llm", "Fila e chamadas do LLM.", llm_pool.stats)
+    registry.stats_gauges(
+        "chat_queries", "Escalonador de consultas por prioridade.", lambda: query_scheduler.stats(), "priority"
+    )
+    registry.stats_gauges("chat_memory", "Governador de memória.", lambda: memory_governor.stats())
+    registry.stats_gauges("chat_sql_cache", "Cache de resultados de SQL.", SQL_CACHE.stats)
+    registry.stats_gauges("chat_question_cache", "Cache pergunta -> SQL.", QUESTION_SQL_CACHE.stats)
+    registry.stats_gauges("chat_query_flights", "Execuções de SQL coalescidas.", QUERY_FLIGHTS.stats)
+    registry.stats_gauges("chat_sql_writer_flights", "Gerações de SQL coalescidas.", SQL_WRITER_FLIGHTS.stats)
+    registry.stats_gauges("chat_slow_queries", "Consultas perfiladas e registradas.", lambda: slow_query_log.stats())
+
+async def start_metrics(port: int):
+    """Inicia o endpoint /metrics; uma porta ocupada não impede o servidor de atender."""
+    register_metrics()
+    try:
+        return await metrics.start_http_server(port, METRICS_HOST)
+    except OSError as e:
+        logger.error("Endpoint de métricas não iniciado na porta %d: %s", port, e)
+        return None
+
+async def set_serving(health_servicer, status) -> None:
+    """Publica o estado do servidor no health check (serviço geral e GenAiService)."""
+    for service in ("", genai_pb2.DESCRIPTOR.services_by_name["GenAiService"].full_name):
+        await health_servicer.set(service, status)
+
+async def serve(
+    listen_addr: str = LISTEN_ADDR, reuse_port: bool = False,
+    warmup_queries: Optional[List[str]] = WARMUP_QUERIES, prefetch: bool = WARMUP_PREFETCH,
+    metrics_port: Optional[int] = METRICS_PORT,
+) -> None:
+    """Atende até o cancelamento ou o SIGTERM, concluindo as requisições em andamento.
+
+    O health check do gRPC responde NOT_SERVING enquanto o processo aquece e
+    SERVING só depois do aquecimento.
+
+    Args:
+        listen_addr (str): Endereço de escuta.
+        reuse_port (bool): Ativa SO_REUSEPORT para vários processos na mesma porta.
+        warmup_queries (Optional[List[str]]): Consultas de aquecimento; None pula o aquecimento.
+        prefetch (bool): Pré-lê os arquivos de dados durante o aquecimento.
+        metrics_port (Optional[int]): Porta do endpoint /metrics; None não o inicia.
+    """
+    options = [("grpc.so_reuseport", 1)] if reuse_port else None
+    server = aio.server(options=options)
     genai_pb2_grpc.add_GenAiServiceServicer_to_server(GenAiServiceServicer(), server)
-    listen_addr = "[::]:50051"
+    health_servicer = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
     server.add_insecure_port(listen_addr)
     logger.info("Servidor escutando em %s", listen_addr)
+
+    def on_sigterm():
+        logger.info("SIGTERM recebido; concluindo as requisições em andamento...")
+        asyncio.ensure_future(health_servicer.enter_graceful_shutdown())
+        asyncio.ensure_future(server.stop(grace=SHUTDOWN_GRACE_SECONDS))
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, on_sigterm)
+    metrics_server = await start_metrics(metrics_port) if metrics_port else None
     try:
+        await set_serving(health_servicer, health_pb2.HealthCheckResponse.NOT_SERVING)
         await server.start()
         logger.info("Servidor iniciado em %s", listen_addr)
+        if warmup_queries is not None:
+            await warm_up(warmup_queries, prefetch)
+        await set_serving(health_servicer, health_pb2.HealthCheckResponse.SERVING)
+        logger.info("Servidor pronto (health check: SERVING).")
         await server.wait_for_termination()
     except asyncio.CancelledError:
         logger.info("Serviço cancelado, desligando...")
@@ -477,26 +1149,198 @@ async def serve() -> None:
     finally:
         logger.info("Desligando servidor gRPC...")
         try:
-            await asyncio.shield(server.stop(grace=5))
+            await asyncio.shield(server.stop(grace=SHUTDOWN_GRACE_SECONDS))
             logger.info("Servidor desligado com sucesso.")
         except asyncio.CancelledError:
             logger.warning("Shutdown interrompido.")
+        if metrics_server is not None:
+            metrics_server.close()
 
 # =============================================================================
 # Função Main que inicia o monitoramento de memória e o servidor
 # =============================================================================
-async def main():
-    # Inicia a tarefa de monitoramento de memória em background
-    memory_monitor_task = asyncio.create_task(monitor_memory())
-    await serve()
-    memory_monitor_task.cancel()
+async def prune_checkpoints(saver) -> None:
+    """Aplica periodicamente a retenção aos checkpoints persistidos no SQLite."""
+    from checkpointer import prune_sqlite_checkpoints
+    while True:
+        try:
+            await prune_sqlite_checkpoints(
+                saver, max_threads=CHECKPOINT_MAX_THREADS, max_checkpoints_per_thread=CHECKPOINT_MAX_PER_THREAD
+            )
+        except Exception as e:
+            logger.error("Erro na poda dos checkpoints: %s", str(e))
+        await asyncio.sleep(CHECKPOINT_PRUNE_INTERVAL)
+
+async def report_worker_health(health, worker_id: int) -> None:
+    """Envia periodicamente ao supervisor os contadores e o estado das filas do worker."""
+    while True:
+        scheduler = query_scheduler.stats()
+        workers.report_health(health, worker_id, {
+            "pid": os.getpid(),
+            **request_stats.stats(),
+            "rss_bytes": memory_governor.rss_bytes(),
+            "queries_running": sum(scheduler[priority]["running"] for priority in ("point", "heavy")),
+            "queries_waiting": sum(scheduler[priority]["queue_depth"] for priority in ("point", "heavy")),
+            "llm_queue_depth": llm_pool.stats()["queue_depth"],
+            "coalesced_total": QUERY_FLIGHTS.coalesced + SQL_WRITER_FLIGHTS.coalesced,
+        })
+        await asyncio.sleep(WORKER_HEALTH_INTERVAL)
+
+def prepare_database(materialize_table: bool = False, rebuild_table: bool = False) -> None:
+    """Materializa (se solicitado) e garante ``resultados_consulta`` com uma conexão de escrita.
+
+    No modo multiprocesso roda no supervisor, antes do fork: os workers abrem
+    o banco somente leitura e não podem criar a tabela nem a view.
+    """
+    pool = DuckDBConnectionPool(DB_PATH, max_connections=1)
     try:
-        await memory_monitor_task
-    except asyncio.CancelledError:
-        logger.info("Tarefa de monitoramento de memória cancelada.")
+        with pool.connection() as conn:
+            if materialize_table or rebuild_table:
+                materialize.build_resultados_consulta(
+                    conn, DATA_DIR, force=rebuild_table, name_index_dir=NAME_INDEX_DIR
+                )
+            materialize.ensure_resultados_consulta(conn, DATA_DIR)
+    finally:
+        pool.close()
+
+# =============================================================================
+# Função Principal para Execução do Servidor
+# =============================================================================
+async def main(
+    materialize_table: bool = False, rebuild_table: bool = False,
+    checkpoint_mode: str = CHECKPOINT_MODE, checkpoint_path: str = CHECKPOINT_SQLITE_PATH,
+    worker_count: int = 1, worker_id: Optional[int] = None, health=None,
+    warmup_queries: Optional[List[str]] = WARMUP_QUERIES, prefetch: bool = WARMUP_PREFETCH,
+    metrics_port: Optional[int] = METRICS_PORT,
+):
+    global graph
+    import checkpointer
+    if worker_id is None:
+        open_database()
+        # Materializa resultados_consulta antes de aceitar conexões, se solicitado
+        if materialize_table or rebuild_table:
+            with duckdb_pool.connection() as conn:
+                materialize.build_resultados_consulta(
+                    conn, DATA_DIR, force=rebuild_table, name_index_dir=NAME_INDEX_DIR
+                )
+                SQL_CACHE.set_dataset_version(materialize.dataset_version(conn, DATA_DIR))
+    else:
+        open_database(read_only=True, workers=worker_count, worker_id=worker_id)
+    async with checkpointer.open_checkpointer(
+        checkpoint_mode, checkpoint_path,
+        max_threads=CHECKPOINT_MAX_THREADS,
+        max_checkpoints_per_thread=CHECKPOINT_MAX_PER_THREAD,
+        idle_seconds=CHECKPOINT_IDLE_SECONDS,
+    ) as saver:
+        graph = build_graph().compile(checkpointer=saver)
+        background_tasks = [asyncio.create_task(monitor_memory())]
+        if checkpoint_mode == "sqlite" and not worker_id:
+            background_tasks.append(asyncio.create_task(prune_checkpoints(saver)))
+        if health is not None:
+            background_tasks.append(asyncio.create_task(report_worker_health(health, worker_id)))
+        await serve(
+            reuse_port=worker_id is not None, warmup_queries=warmup_queries, prefetch=prefetch,
+            metrics_port=metrics_port + (worker_id or 0) if metrics_port else None,
+        )
+        for task in background_tasks:
+            task.cancel()
+        try:
+            await asyncio.gather(*background_tasks)
+        except asyncio.CancelledError:
+            logger.info("Tarefas de monitoramento canceladas.")
+
+def run_worker(
+    worker_id: int, health, worker_count: int, checkpoint_mode: str, checkpoint_path: str,
+    warmup_queries: Optional[List[str]] = WARMUP_QUERIES, prefetch: bool = WARMUP_PREFETCH,
+    metrics_port: Optional[int] = METRICS_PORT,
+) -> None:
+    """Processo worker: event loop, pool do DuckDB e servidor gRPC próprios."""
+    asyncio.run(main(
+        checkpoint_mode=checkpoint_mode, checkpoint_path=checkpoint_path,
+        worker_count=worker_count, worker_id=worker_id, health=health,
+        warmup_queries=warmup_queries, prefetch=prefetch, metrics_port=metrics_port,
+    ))
+
+def run_cli(argv: Optional[List[str]] = None) -> None:
+    """Interpreta os argumentos de linha de comando e executa o servidor (um processo ou vários workers).
+
+    Args:
+        argv (Optional[List[str]]): Argumentos; None usa ``sys.argv``.
+    """
+    import checkpointer
+
+    parser = argparse.ArgumentParser(description="Servidor gRPC do Chat Empresas.")
+    parser.add_argument(
+        "--materialize", action="store_true",
+        help="Materializa resultados_consulta no DuckDB antes de iniciar, caso ainda não exista."
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true",
+        help="Reconstrói resultados_consulta a partir dos Parquets antes de iniciar."
+    )
+    parser.add_argument(
+        "--checkpointer", choices=checkpointer.CHECKPOINTER_MODES, default=CHECKPOINT_MODE,
+        help="Onde guardar o estado das conversas do LangGraph (memory ou sqlite)."
+    )
+    parser.add_argument(
+        "--checkpoint-db", default=CHECKPOINT_SQLITE_PATH,
+        help="Arquivo SQLite dos checkpoints (com --checkpointer sqlite)."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=SERVER_WORKERS,
+        help="Processos servidores na mesma porta (SO_REUSEPORT); o banco é aberto somente leitura."
+    )
+    parser.add_argument(
+        "--warmup-queries", metavar="ARQUIVO",
+        help="Arquivo com as consultas de aquecimento (separadas por ';'), no lugar das padrão."
+    )
+    parser.add_argument(
+        "--warmup-prefetch", action="store_true", default=WARMUP_PREFETCH,
+        help="Pré-lê banco, índice de nomes e Parquets para o cache de páginas antes de ficar pronto."
+    )
+    parser.add_argument(
+        "--no-warmup", action="store_true", default=not WARMUP_ENABLED,
+        help="Responde SERVING no health check sem aquecer o processo."
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=METRICS_PORT or 0,
+        help="Porta do /metrics do Prometheus (o worker N usa a porta + N); 0 desativa."
+    )
+    args = parser.parse_args(argv)
+    warmup_queries = WARMUP_QUERIES
+    if args.warmup_queries:
+        with open(args.warmup_queries, encoding="utf-8") as f:
+            warmup_queries = warmup.parse_queries(f.read())
+    if args.no_warmup:
+        warmup_queries = None
+    if args.workers > 1:
+        if args.checkpointer == "memory":
+            logger.warning(
+                "Com --workers e --checkpointer memory cada worker tem seus próprios checkpoints; "
+                "use --checkpointer sqlite para manter as conversas entre workers."
+            )
+        prepare_database(materialize_table=args.materialize, rebuild_table=args.rebuild)
+        preload_dependencies()
+        workers.run_workers(
+            args.workers,
+            lambda worker_id, health: run_worker(
+                worker_id, health, args.workers, args.checkpointer, args.checkpoint_db,
+                warmup_queries=warmup_queries, prefetch=args.warmup_prefetch,
+                metrics_port=args.metrics_port or None,
+            ),
+            health_interval=WORKER_HEALTH_INTERVAL,
+            stop_timeout=SHUTDOWN_GRACE_SECONDS + 10,
+        )
+    else:
+        try:
+            asyncio.run(main(
+                materialize_table=args.materialize, rebuild_table=args.rebuild,
+                checkpoint_mode=args.checkpointer, checkpoint_path=args.checkpoint_db,
+                warmup_queries=warmup_queries, prefetch=args.warmup_prefetch,
+                metrics_port=args.metrics_port or None,
+            ))
+        except KeyboardInterrupt:
+            logger.info("Interrupção manual (KeyboardInterrupt).")
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        logger.info("Interrupção manual (KeyboardInterrupt).")
+    run_cli()
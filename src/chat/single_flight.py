@@ -0,0 +1,98 @@
+# single_flight.py
+"""
+Deduplicação de execuções em andamento (single-flight).
+
+Quando uma pergunta popular chega de vários usuários em poucos segundos,
+todas perdem o ``SQL_CACHE`` até a primeira terminar e a mesma varredura roda
+N vezes em paralelo. Com ``SingleFlight``, quem chega com uma chave (a SQL,
+ou a pergunta normalizada) que já está em execução aguarda a mesma execução
+em vez de iniciar outra.
+
+- Exceções também são compartilhadas: todos os que aguardam a recebem.
+- O cancelamento de quem iniciou não interrompe a execução enquanto houver
+  outros aguardando; ela só é cancelada quando o último desiste.
+- Com ``keep_results=True`` o resultado fica guardado depois de pronto (usado
+  dentro de um lote de perguntas, cuja vida é curta); sem isso a chave é
+  liberada ao terminar e os pedidos seguintes contam com os caches.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Executa uma vez por chave as chamadas concorrentes, com contadores."""
+
+    def __init__(self, name: str = "", keep_results: bool = False):
+        """Inicializa o deduplicador.
+
+        Args:
+            name (str): Nome usado nos logs.
+            keep_results (bool): Mantém o resultado das chaves já concluídas.
+        """
+        self.name = name
+        self.keep_results = keep_results
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Retorna o resultado de ``factory()`` para ``key``, iniciando-a só se a chave não estiver em execução.
+
+        Args:
+            key (Hashable): Identifica execuções equivalentes.
+            factory: Cria a corrotina que produz o resultado.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            self.started += 1
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(factory()))
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+        else:
+            self.coalesced += 1
+            tracing.cache_hit("coalesced")
+            if not flight.task.done():
+                logger.debug("%s: aguardando execução idêntica em andamento.", self.name or "single-flight")
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finished(self, key: Hashable, flight: _Flight) -> None:
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            self.failed += 1
+        # Execução cancelada nunca fica guardada: o próximo pedido começa outra.
+        if (not self.keep_results or flight.task.cancelled()) and self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def cancel(self) -> None:
+        """Cancela as execuções ainda em andamento e descarta os resultados guardados."""
+        for flight in self._flights.values():
+            flight.task.cancel()
+        self._flights.clear()
+
+    def stats(self) -> dict:
+        """Execuções iniciadas, pedidos atendidos por uma execução já iniciada e chaves em andamento."""
+        return {
+            "started_total": self.started,
+            "coalesced_total": self.coalesced,
+            "failed_total": self.failed,
+            "in_flight": sum(1 for flight in self._flights.values() if not flight.task.done()),
+        }
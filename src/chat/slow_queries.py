@@ -0,0 +1,354 @@
+# slow_queries.py
+"""
+Perfil do DuckDB para as consultas lentas e registro rotativo para análise.
+
+Com o registro ativo, as consultas do ``execute_query_node`` rodam com o
+profiling do DuckDB em JSON (``enable_profiling='json'``), gravado em um
+arquivo temporário da thread. O perfil só é lido e guardado quando a consulta
+passa do limite de latência ou cai na amostragem; para as demais o custo é o
+da instrumentação dos operadores e de um JSON pequeno sobrescrito a cada
+consulta. Sem limite (``threshold_seconds=None``), só as consultas sorteadas
+são perfiladas.
+
+Cada registro é uma linha JSON com a pergunta, a SQL gerada e a executada
+(após rollup, índice de nomes e controle de custo), tempo de parede e de CPU,
+linhas lidas, pico de memória e os operadores do plano com o tempo, as linhas
+produzidas e as linhas lidas de cada um. O arquivo gira por tamanho, como os
+logs do servidor; no modo multiprocesso cada worker escreve no seu.
+
+Para listar as consultas que mais custam (SQLs iguais a menos dos literais
+formam um grupo) e ver o plano de uma delas:
+
+    python src/chat/slow_queries.py --top 20 --by total
+    python src/chat/slow_queries.py --show 3
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, suppress
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "logs/slow_queries.jsonl"
+DEFAULT_MAX_BYTES = 20 * 1024 ** 2
+DEFAULT_BACKUPS = 5
+
+SLOW = "slow"
+SAMPLED = "sampled"
+
+SORT_KEYS = {
+    "total": lambda group: group["seconds_total"],
+    "max": lambda group: group["seconds_max"],
+    "count": lambda group: group["count"],
+    "cpu": lambda group: group["cpu_total"],
+    "scanned": lambda group: group["rows_scanned_max"],
+}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def worker_path(path: str, worker_id: Optional[int]) -> str:
+    """Arquivo do worker ``worker_id`` (``slow_queries.w1.jsonl``); o processo único usa ``path``."""
+    if worker_id is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.w{worker_id}{ext}"
+
+
+def fingerprint(sql: str) -> str:
+    """SQL sem literais e com espaços normalizados, para agrupar variações da mesma consulta."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip().rstrip(";")
+
+
+def profile_output_path() -> str:
+    """Arquivo temporário do perfil, um por thread do pool (cada uma usa uma conexão por vez)."""
+    return os.path.join(tempfile.gettempdir(), f"duckdb_profile_{os.getpid()}_{threading.get_ident()}.json")
+
+
+@contextmanager
+def profiling(conn: duckdb.DuckDBPyConnection, output: str):
+    """Ativa o profiling JSON na conexão durante o bloco e o desativa ao sair.
+
+    As configurações valem só para a conexão e são restauradas mesmo em caso
+    de erro, pois as conexões do pool são reutilizadas. O arquivo anterior é
+    apagado: algumas consultas (como um ``count(*)`` sem filtro) não geram
+    perfil, e o da consulta anterior não pode ser atribuído a elas.
+    """
+    with suppress(FileNotFoundError):
+        os.remove(output)
+    conn.execute("SET enable_profiling = 'json'")
+    conn.execute("SET profiling_output = '{}'".format(output.replace("'", "''")))
+    try:
+        yield
+    finally:
+        conn.execute("RESET enable_profiling")
+        conn.execute("RESET profiling_output")
+
+
+def read_profile(output: str) -> Optional[dict]:
+    try:
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None  # Consulta sem perfil; o registro fica só com os tempos medidos aqui
+    except (OSError, ValueError) as e:
+        logger.warning("Perfil do DuckDB não lido de %s: %s", output, e)
+        return None
+
+
+def _operators(node: dict, depth: int = 0) -> Iterator[Dict[str, Any]]:
+    for child in node.get("children", []):
+        yield {
+            "depth": depth,
+            "operator": child.get("operator_name") or child.get("operator_type", "?"),
+            "seconds": child.get("operator_timing", 0.0),
+            "rows": child.get("operator_cardinality", 0),
+            "rows_scanned": child.get("operator_rows_scanned", 0),
+            "info": child.get("extra_info", {}),
+        }
+        yield from _operators(child, depth + 1)
+
+
+def summarize_profile(profile: Optional[dict]) -> Dict[str, Any]:
+    """Métricas da consulta e a lista de operadores (em pré-ordem, com a profundidade) do perfil JSON."""
+    if not profile:
+        return {"operators": []}
+    return {
+        "wall_seconds": profile.get("latency"),
+        "cpu_seconds": profile.get("cpu_time"),
+        "rows_returned": profile.get("rows_returned"),
+        "rows_scanned": profile.get("cumulative_rows_scanned"),
+        "bytes_read": profile.get("total_bytes_read"),
+        "peak_memory": profile.get("system_peak_buffer_memory"),
+        "operators": list(_operators(profile)),
+    }
+
+
+class SlowQueryLog:
+    """Decide quais consultas perfilar e grava os perfis guardados em JSONL com rotação."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        threshold_seconds: Optional[float] = 2.0,
+        sample_rate: float = 0.0,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+    ):
+        """Inicializa o registro.
+
+        Args:
+            path (str): Arquivo JSONL; as cópias giradas recebem ``.1``, ``.2``...
+            threshold_seconds (Optional[float]): Consultas com pelo menos esse tempo são registradas;
+                None perfila só as sorteadas.
+            sample_rate (float): Fração das consultas perfiladas e registradas independentemente do tempo.
+            max_bytes (int): Tamanho do arquivo antes da rotação.
+            backups (int): Cópias giradas mantidas.
+        """
+        self.path = path
+        self.threshold_seconds = threshold_seconds
+        self.sample_rate = sample_rate
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self._lock = threading.Lock()
+        self.profiled = 0
+        self.recorded = {SLOW: 0, SAMPLED: 0}
+
+    def run(self, conn: duckdb.DuckDBPyConnection, fetch: Callable[[], Any], **details) -> Any:
+        """Executa ``fetch()`` na conexão, com profiling se a consulta puder ser registrada.
+
+        Args:
+            conn (duckdb.DuckDBPyConnection): Conexão usada por ``fetch``.
+            fetch: Executa a consulta e devolve o resultado.
+            **details: Campos do registro (``question``, ``sql``, ``executed_sql``, ``action``, ``trace_id``).
+
+        Returns:
+            O resultado de ``fetch()``.
+        """
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if self.threshold_seconds is None and not sampled:
+            return fetch()
+        output = profile_output_path()
+        start = time.perf_counter()
+        with profiling(conn, output):
+            result = fetch()
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.profiled += 1
+        if self.threshold_seconds is not None and seconds >= self.threshold_seconds:
+            self.record(SLOW, seconds, read_profile(output), **details)
+        elif sampled:
+            self.record(SAMPLED, seconds, read_profile(output), **details)
+        return result
+
+    def record(self, reason: str, seconds: float, profile: Optional[dict], sql: str = "", **details) -> None:
+        """Grava uma linha com os detalhes da consulta e o resumo do perfil."""
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "reason": reason,
+            "seconds": round(seconds, 6),
+            "sql": sql,
+            "fingerprint": fingerprint(sql),
+            **details,
+            **summarize_profile(profile),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        # O lock do handler serializa as threads do pool, inclusive durante a rotação
+        self._handler.handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+        with self._lock:
+            self.recorded[reason] += 1
+        if reason == SLOW:
+            logger.info("Consulta lenta (%.2fs) registrada em %s: %s", seconds, self.path, entry["fingerprint"][:200])
+
+    def stats(self) -> dict:
+        return {"profiled_total": self.profiled, **{f"{reason}_total": count for reason, count in self.recorded.items()}}
+
+    def close(self) -> None:
+        self._handler.close()
+
+
+def log_files(path: str = DEFAULT_PATH) -> List[str]:
+    """Arquivo, cópias giradas e arquivos dos workers, do mais antigo para o mais recente."""
+    root, ext = os.path.splitext(path)
+    files = set(glob.glob(glob.escape(root) + "*" + ext)) | set(glob.glob(glob.escape(root) + "*" + ext + ".*"))
+    return sorted(files, key=os.path.getmtime)
+
+
+def read_entries(path: str = DEFAULT_PATH) -> List[dict]:
+    """Registros de todos os arquivos de ``log_files``; linhas corrompidas são ignoradas."""
+    entries = []
+    for name in log_files(path):
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def slowest_operator(entry: dict) -> Optional[dict]:
+    operators = entry.get("operators") or []
+    return max(operators, key=lambda op: op.get("seconds") or 0.0) if operators else None
+
+
+def top_offenders(entries: List[dict], by: str = "total", limit: int = 10) -> List[dict]:
+    """Agrupa os registros por ``fingerprint`` e ordena os grupos.
+
+    Args:
+        entries (List[dict]): Registros lidos por ``read_entries``.
+        by (str): Critério (chave de ``SORT_KEYS``): tempo total, tempo máximo, execuções,
+            CPU total ou máximo de linhas lidas.
+        limit (int): Grupos devolvidos.
+
+    Returns:
+        List[dict]: Grupos com contagens, tempos e o registro mais lento (``worst``).
+    """
+    groups: Dict[str, dict] = {}
+    for entry in entries:
+        key = entry.get("fingerprint") or fingerprint(entry.get("sql", ""))
+        group = groups.setdefault(key, {
+            "fingerprint": key, "count": 0, "seconds_total": 0.0, "seconds_max": 0.0,
+            "cpu_total": 0.0, "rows_scanned_max": 0, "worst": entry,
+        })
+        seconds = entry.get("seconds") or 0.0
+        group["count"] += 1
+        group["seconds_total"] += seconds
+        group["cpu_total"] += entry.get("cpu_seconds") or 0.0
+        group["rows_scanned_max"] = max(group["rows_scanned_max"], entry.get("rows_scanned") or 0)
+        if seconds >= group["seconds_max"]:
+            group["seconds_max"], group["worst"] = seconds, entry
+    return sorted(groups.values(), key=SORT_KEYS[by], reverse=True)[:limit]
+
+
+def _brief_info(info: dict) -> str:
+    parts = []
+    for key in ("Table", "Function", "Filters", "Aggregates", "Groups", "Join Type", "Conditions"):
+        value = info.get(key)
+        if value:
+            text = "; ".join(value) if isinstance(value, list) else str(value)
+            parts.append(f"{key}: {_WHITESPACE.sub(' ', text)[:120]}")
+    return " | ".join(parts)
+
+
+def format_plan(entry: dict) -> str:
+    """Plano do registro em árvore, com tempo, linhas produzidas e linhas lidas por operador."""
+    lines = [
+        f"Pergunta: {entry.get('question', '')}",
+        f"SQL: {entry.get('sql', '')}",
+    ]
+    if entry.get("executed_sql") and entry["executed_sql"] != entry.get("sql"):
+        lines.append(f"Executada: {entry['executed_sql']}")
+    lines.append(
+        f"Tempo {entry.get('seconds', 0):.3f}s (DuckDB {entry.get('wall_seconds') or 0:.3f}s, "
+        f"CPU {entry.get('cpu_seconds') or 0:.3f}s), {entry.get('rows_scanned') or 0} linhas lidas, "
+        f"pico de memória {(entry.get('peak_memory') or 0) / 1024 ** 2:.0f} MB, trace {entry.get('trace_id') or '-'}"
+    )
+    for op in entry.get("operators", []):
+        info = _brief_info(op.get("info") or {})
+        lines.append(
+            f"{'  ' * op['depth']}{op['operator']} {op['seconds'] * 1000:.1f}ms "
+            f"linhas={op['rows']} lidas={op['rows_scanned']}" + (f"  [{info}]" if info else "")
+        )
+    return "\n".join(lines)
+
+
+def format_offenders(groups: List[dict]) -> str:
+    lines = [f"{'#':>3} {'exec':>5} {'total s':>9} {'máx s':>8} {'CPU s':>8} {'linhas lidas':>13}  operador mais lento / SQL"]
+    for i, group in enumerate(groups, 1):
+        hottest = slowest_operator(group["worst"])
+        operator = f"{hottest['operator']} {hottest['seconds']:.2f}s" if hottest else "-"
+        lines.append(
+            f"{i:>3} {group['count']:>5} {group['seconds_total']:>9.2f} {group['seconds_max']:>8.2f} "
+            f"{group['cpu_total']:>8.2f} {group['rows_scanned_max']:>13}  {operator}"
+        )
+        lines.append(f"{'':>52}{group['fingerprint'][:160]}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lista as consultas mais custosas do registro de consultas lentas.")
+    parser.add_argument("--log", default=DEFAULT_PATH, help="Arquivo do registro (inclui cópias giradas e workers).")
+    parser.add_argument("--top", type=int, default=10, help="Grupos de consultas listados.")
+    parser.add_argument("--by", choices=sorted(SORT_KEYS), default="total", help="Critério de ordenação.")
+    parser.add_argument("--reason", choices=(SLOW, SAMPLED), help="Só registros por limite de tempo ou por amostragem.")
+    parser.add_argument("--show", type=int, metavar="N", help="Mostra o plano da execução mais lenta do grupo N.")
+    args = parser.parse_args()
+
+    entries = read_entries(args.log)
+    if args.reason:
+        entries = [entry for entry in entries if entry.get("reason") == args.reason]
+    if not entries:
+        print(f"Nenhuma consulta registrada em {args.log}.")
+        return
+    groups = top_offenders(entries, by=args.by, limit=args.top)
+    if args.show:
+        if not 1 <= args.show <= len(groups):
+            parser.error(f"--show deve estar entre 1 e {len(groups)}")
+        print(format_plan(groups[args.show - 1]["worst"]))
+        return
+    print(f"{len(entries)} registros em {len(log_files(args.log))} arquivo(s).")
+    print(format_offenders(groups))
+
+
+if __name__ == "__main__":
+    main()
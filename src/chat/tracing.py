@@ -0,0 +1,244 @@
+# tracing.py
+"""
+Rastreamento por nó do pipeline e trace id propagado pelo gRPC.
+
+Cada RPC recebe um trace id: o enviado pelo cliente no metadata
+``x-trace-id`` ou um novo, devolvido ao cliente no metadata inicial da
+resposta. Cada nó do grafo (e a consulta direta por CNPJ) roda dentro de um
+span que mede a duração e acumula as dimensões informadas pelo código
+chamado durante o nó:
+
+- tokens do LLM enviados e recebidos (``add_tokens``, pelo ``llm_pool``);
+- linhas retornadas e bytes lidos pela consulta (``set_result``);
+- acertos de cache e execuções coalescidas (``cache_hit``);
+- esperas em filas: LLM, escalonador de consultas e governador de memória
+  (``record_wait``).
+
+Ao fim do span as dimensões viram histogramas em ``metrics.REGISTRY``, com o
+nó como rótulo, e ao fim do RPC o resumo do trace vai para o log. Trace e
+span atual ficam em ``contextvars``: tarefas criadas durante o nó (como as
+execuções do single-flight) herdam o span de quem as criou.
+"""
+
+import functools
+import inspect
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TRACE_METADATA_KEY = "x-trace-id"
+SUMMARY_MAX_SPANS = 12  # Traces maiores (lotes) são resumidos por nó
+
+NODE_SECONDS = metrics.REGISTRY.histogram(
+    "chat_node_duration_seconds", "Duração de cada nó do pipeline.", ["node", "outcome"]
+)
+NODE_TOKENS = metrics.REGISTRY.histogram(
+    "chat_node_llm_tokens", "Tokens do LLM por execução do nó.", ["node", "direction"], metrics.TOKEN_BUCKETS
+)
+NODE_ROWS = metrics.REGISTRY.histogram(
+    "chat_node_rows", "Linhas retornadas pela consulta do nó.", ["node"], metrics.ROW_BUCKETS
+)
+NODE_BYTES = metrics.REGISTRY.histogram(
+    "chat_node_bytes_fetched", "Bytes do resultado lido pelo nó.", ["node"], metrics.BYTE_BUCKETS
+)
+CACHE_HITS = metrics.REGISTRY.counter(
+    "chat_node_cache_hits_total", "Acertos de cache e execuções coalescidas por nó.", ["node", "cache"]
+)
+QUEUE_WAIT_SECONDS = metrics.REGISTRY.histogram(
+    "chat_queue_wait_seconds", "Espera em filas (llm, query_slot, memory) por nó.", ["node", "queue"]
+)
+RPC_SECONDS = metrics.REGISTRY.histogram(
+    "chat_rpc_duration_seconds", "Duração dos RPCs do GenAiService.", ["method", "outcome"]
+)
+
+
+class Span:
+    """Execução de um nó e as dimensões registradas durante ela."""
+
+    __slots__ = ("name", "seconds", "failed", "tokens_in", "tokens_out", "rows", "bytes", "cache_hits", "waits")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.failed = False
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.rows: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.cache_hits: List[str] = []
+        self.waits: Dict[str, float] = {}
+
+    def describe(self) -> str:
+        details = []
+        if self.tokens_in or self.tokens_out:
+            details.append(f"tokens {self.tokens_in}/{self.tokens_out}")
+        if self.rows is not None:
+            details.append(f"{self.rows} linhas")
+        if self.bytes is not None:
+            details.append(f"{self.bytes / 1024:.0f} KB")
+        details += [f"cache {name}" for name in self.cache_hits]
+        details += [f"fila {queue} {seconds * 1000:.0f}ms" for queue, seconds in self.waits.items() if seconds >= 0.001]
+        if self.failed:
+            details.append("erro")
+        suffix = f" ({', '.join(details)})" if details else ""
+        return f"{self.name}={self.seconds * 1000:.0f}ms{suffix}"
+
+
+class Trace:
+    """Spans de uma requisição."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+
+    def summary(self) -> str:
+        if len(self.spans) <= SUMMARY_MAX_SPANS:
+            return " ".join(span.describe() for span in self.spans)
+        # Lotes: um total por nó em vez de cada span
+        totals: Dict[str, List[float]] = {}
+        for current in self.spans:
+            entry = totals.setdefault(current.name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += current.seconds
+        return " ".join(f"{name}={count}x {seconds * 1000:.0f}ms" for name, (count, seconds) in totals.items())
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_trace_id() -> str:
+    trace = _trace.get()
+    return trace.trace_id if trace is not None else ""
+
+
+@contextmanager
+def span(name: str):
+    """Mede o nó ``name`` e publica as dimensões registradas durante ele."""
+    current = Span(name)
+    token = _span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.failed = True
+        raise
+    finally:
+        current.seconds = time.perf_counter() - start
+        _span.reset(token)
+        _finish(current)
+
+
+def _finish(current: Span) -> None:
+    node = current.name
+    NODE_SECONDS.observe(current.seconds, node=node, outcome="error" if current.failed else "ok")
+    if current.tokens_in or current.tokens_out:
+        NODE_TOKENS.observe(current.tokens_in, node=node, direction="in")
+        NODE_TOKENS.observe(current.tokens_out, node=node, direction="out")
+    if current.rows is not None:
+        NODE_ROWS.observe(current.rows, node=node)
+    if current.bytes is not None:
+        NODE_BYTES.observe(current.bytes, node=node)
+    trace = _trace.get()
+    if trace is not None:
+        trace.spans.append(current)
+
+
+def traced_node(name: str, node):
+    """Envolve um nó assíncrono do grafo em um span (preserva a assinatura, com ou sem ``config``)."""
+    @functools.wraps(node)
+    async def wrapper(*args, **kwargs):
+        with span(name):
+            return await node(*args, **kwargs)
+    return wrapper
+
+
+def _node_name() -> str:
+    current = _span.get()
+    return current.name if current is not None else ""
+
+
+def add_tokens(tokens_in: int, tokens_out: int) -> None:
+    current = _span.get()
+    if current is not None:
+        current.tokens_in += tokens_in
+        current.tokens_out += tokens_out
+
+
+def set_result(rows: int, size: int) -> None:
+    current = _span.get()
+    if current is not None:
+        current.rows, current.bytes = rows, size
+
+
+def cache_hit(cache: str) -> None:
+    CACHE_HITS.inc(node=_node_name(), cache=cache)
+    current = _span.get()
+    if current is not None:
+        current.cache_hits.append(cache)
+
+
+def record_wait(queue: str, seconds: float) -> None:
+    QUEUE_WAIT_SECONDS.observe(seconds, node=_node_name(), queue=queue)
+    current = _span.get()
+    if current is not None:
+        current.waits[queue] = current.waits.get(queue, 0.0) + seconds
+
+
+def _incoming_trace_id(context) -> str:
+    for key, value in context.invocation_metadata() or ():
+        if key == TRACE_METADATA_KEY and value:
+            return value
+    return new_trace_id()
+
+
+def traced_rpc(method):
+    """Decorador de método do servicer: trace id do metadata, duração do RPC e resumo no log.
+
+    Cada RPC do servidor gRPC assíncrono roda em uma tarefa própria, então o
+    trace definido aqui vale só para a requisição.
+    """
+    if inspect.isasyncgenfunction(method):
+        @functools.wraps(method)
+        async def stream(self, request, context):
+            trace, start, outcome = Trace(_incoming_trace_id(context)), time.perf_counter(), "error"
+            _trace.set(trace)
+            await context.send_initial_metadata(((TRACE_METADATA_KEY, trace.trace_id),))
+            try:
+                async for item in method(self, request, context):
+                    yield item
+                outcome = "ok"
+            finally:
+                _end_rpc(method.__name__, trace, time.perf_counter() - start, outcome)
+        return stream
+
+    @functools.wraps(method)
+    async def unary(self, request, context):
+        trace, start, outcome = Trace(_incoming_trace_id(context)), time.perf_counter(), "error"
+        token = _trace.set(trace)
+        await context.send_initial_metadata(((TRACE_METADATA_KEY, trace.trace_id),))
+        try:
+            response = await method(self, request, context)
+            outcome = "ok"
+            return response
+        finally:
+            _trace.reset(token)
+            _end_rpc(method.__name__, trace, time.perf_counter() - start, outcome)
+    return unary
+
+
+def _end_rpc(method: str, trace: Trace, seconds: float, outcome: str) -> None:
+    RPC_SECONDS.observe(seconds, method=method, outcome=outcome)
+    if trace.spans:
+        logger.info("Trace %s %s %.0fms: %s", trace.trace_id, method, seconds * 1000, trace.summary())
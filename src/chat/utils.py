@@ -30,6 +30,9 @@ def setup_logging() -> logging.Logger:
         logging.Logger: O logger configurado para o aplicativo.
     """
     logger = logging.getLogger("chat_app")
+    if logger.handlers:
+        # O Streamlit reexecuta o script a cada interação; os handlers já existem.
+        return logger
     logger.setLevel(logging.DEBUG)  # Defina o nível de log conforme necessário
 
     # Formato do log
@@ -0,0 +1,126 @@
+# warmup.py
+"""
+Aquecimento do servidor antes de ele se declarar pronto.
+
+A primeira requisição após um reinício pagava a criação da view, o
+``DESCRIBE``, a leitura dos footers de milhares de Parquets e o cache de
+páginas do sistema operacional frio. As funções daqui executam essas etapas
+no boot:
+
+- ativam o cache de metadados dos Parquets (``parquet_metadata_cache`` ou,
+  nas versões que o têm, ``enable_object_cache``) e o pré-populam lendo os
+  footers de todos os arquivos;
+- executam uma lista configurável de consultas de aquecimento;
+- opcionalmente pré-leem arquivos (banco, índices, Parquets) para o cache de
+  páginas com ``posix_fadvise(WILLNEED)``.
+
+O servidor só passa a responder ``SERVING`` no serviço de health do gRPC ao
+fim do aquecimento.
+"""
+
+import glob
+import logging
+import os
+import time
+from typing import Iterable, List, NamedTuple
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# Em ordem de preferência; só as existentes na versão instalada são ativadas.
+METADATA_CACHE_SETTINGS = ("parquet_metadata_cache", "enable_object_cache", "enable_external_file_cache")
+PREFETCH_CHUNK_BYTES = 8 * 1024 ** 2
+
+
+class WarmupStep(NamedTuple):
+    """Resultado de uma etapa do aquecimento."""
+
+    name: str
+    seconds: float
+    ok: bool
+    detail: str = ""
+
+
+def enable_metadata_cache(conn: duckdb.DuckDBPyConnection) -> List[str]:
+    """Ativa, para a instância inteira, os caches de metadados de arquivos disponíveis.
+
+    Returns:
+        List[str]: Nomes das configurações ativadas.
+    """
+    available = {
+        row[0] for row in conn.execute(
+            "SELECT name FROM duckdb_settings() WHERE name IN ?", [list(METADATA_CACHE_SETTINGS)]
+        ).fetchall()
+    }
+    enabled = []
+    for name in METADATA_CACHE_SETTINGS:
+        if name in available:
+            conn.execute(f"SET GLOBAL {name} = true")
+            enabled.append(name)
+    return enabled
+
+
+def parquet_files(data_dir: str) -> List[str]:
+    """Arquivos Parquet lidos pela view de ``resultados_consulta``."""
+    return sorted(glob.glob(os.path.join(data_dir, "parquet_*", "*.parquet")))
+
+
+def prime_parquet_metadata(conn: duckdb.DuckDBPyConnection, data_dir: str) -> int:
+    """Lê o footer de todos os Parquets para que fiquem no cache de metadados.
+
+    Returns:
+        int: Número de arquivos lidos.
+    """
+    count = 0
+    for folder in sorted(glob.glob(os.path.join(data_dir, "parquet_*"))):
+        pattern = os.path.join(folder, "*.parquet")
+        if glob.glob(pattern):
+            count += conn.execute(
+                "SELECT COUNT(DISTINCT file_name) FROM parquet_file_metadata(?)", [pattern]
+            ).fetchone()[0]
+    return count
+
+
+def parse_queries(text: str) -> List[str]:
+    """Separa um arquivo de consultas de aquecimento (separadas por ``;``; linhas ``--`` são comentários)."""
+    lines = [line for line in text.splitlines() if not line.strip().startswith("--")]
+    return [query.strip() for query in "\n".join(lines).split(";") if query.strip()]
+
+
+def prefetch_files(paths: Iterable[str]) -> int:
+    """Traz arquivos para o cache de páginas do sistema operacional.
+
+    Usa ``posix_fadvise(WILLNEED)``, que agenda a leitura sem copiar os dados
+    para o processo; onde não existe, lê os arquivos em blocos.
+
+    Returns:
+        int: Bytes pré-lidos (ou agendados).
+    """
+    total = 0
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), 0, size, os.POSIX_FADV_WILLNEED)
+                else:
+                    while f.read(PREFETCH_CHUNK_BYTES):
+                        pass
+                total += size
+        except OSError as e:
+            logger.warning("Não foi possível pré-ler %s: %s", path, e)
+    return total
+
+
+def timed_step(name: str, fn, *args) -> WarmupStep:
+    """Executa uma etapa registrando duração e falha (o aquecimento nunca interrompe o boot)."""
+    start = time.perf_counter()
+    try:
+        detail = fn(*args)
+        step = WarmupStep(name, time.perf_counter() - start, True, "" if detail is None else str(detail))
+        logger.info("Aquecimento: %s em %.2fs %s", name, step.seconds, step.detail)
+    except Exception as e:
+        step = WarmupStep(name, time.perf_counter() - start, False, str(e))
+        logger.warning("Aquecimento: %s falhou em %.2fs: %s", name, step.seconds, e)
+    return step
@@ -0,0 +1,241 @@
+# workers.py
+"""
+Modo multiprocesso do servidor gRPC.
+
+Com um único processo, a orquestração do LangGraph, a montagem dos prompts e
+a conversão dos resultados disputam o mesmo GIL enquanto os demais núcleos
+ficam ociosos. Aqui um supervisor cria N processos (``fork``) que escutam na
+mesma porta com ``SO_REUSEPORT``: o kernel distribui as conexões entre eles.
+Cada worker tem seu próprio event loop e seu próprio pool do DuckDB, aberto
+somente leitura sobre o mesmo arquivo.
+
+O supervisor:
+
+- recebe de cada worker, por uma fila, um relatório periódico de saúde
+  (requisições, erros, requisições em andamento, RSS, filas) e registra um
+  resumo por worker;
+- recria workers que terminarem inesperadamente;
+- no SIGTERM/SIGINT encerra os workers um de cada vez (rolling shutdown):
+  cada um para de aceitar conexões e conclui as requisições em andamento
+  enquanto os demais continuam atendendo.
+
+Nenhum objeto gRPC ou conexão do DuckDB pode ser criado no supervisor antes
+do ``fork``; os workers criam os seus ao iniciar.
+"""
+
+import functools
+import inspect
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEALTH_INTERVAL = 10.0
+
+
+class RequestCounter:
+    """Contadores de requisições do processo, enviados no relatório de saúde."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        """Conta a requisição enquanto ela está em andamento (exceções contam como erro)."""
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+        try:
+            yield
+        except Exception:
+            self.failed()
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def tracked(self, method):
+        """Decorador que aplica ``track`` a um método assíncrono do servicer (unário ou de stream)."""
+        if inspect.isasyncgenfunction(method):
+            @functools.wraps(method)
+            async def stream(*args, **kwargs):
+                with self.track():
+                    async for item in method(*args, **kwargs):
+                        yield item
+            return stream
+
+        @functools.wraps(method)
+        async def unary(*args, **kwargs):
+            with self.track():
+                return await method(*args, **kwargs)
+        return unary
+
+    def failed(self) -> None:
+        """Registra um erro tratado pela própria requisição."""
+        with self._lock:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "requests_total": self.requests,
+            "errors_total": self.errors,
+            "in_flight": self.in_flight,
+            "uptime_seconds": time.time() - self.started,
+        }
+
+
+class WorkerSupervisor:
+    """Cria, monitora e encerra os processos do servidor."""
+
+    def __init__(
+        self,
+        count: int,
+        target: Callable[[int, multiprocessing.Queue], None],
+        health_interval: float = DEFAULT_HEALTH_INTERVAL,
+        stop_timeout: float = 30.0,
+    ):
+        """Inicializa o supervisor.
+
+        Args:
+            count (int): Número de workers.
+            target: Função executada em cada worker, chamada com ``(índice, fila_de_saúde)``.
+            health_interval (float): Intervalo, em segundos, entre os relatórios de saúde.
+            stop_timeout (float): Espera máxima pelo encerramento de cada worker antes do SIGKILL.
+        """
+        self.count = count
+        self.target = target
+        self.health_interval = health_interval
+        self.stop_timeout = stop_timeout
+        self._context = multiprocessing.get_context("fork")
+        self.health = self._context.Queue()
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.reports: Dict[int, dict] = {}
+        self.restarts = 0
+        self._stopping = threading.Event()
+
+    def _bootstrap(self, index: int) -> None:
+        # O Ctrl+C chega a todo o grupo de processos; quem coordena o encerramento
+        # é o supervisor. O SIGTERM volta ao padrão até o worker instalar o seu.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        self.target(index, self.health)
+
+    def _start(self, index: int) -> None:
+        process = self._context.Process(target=self._bootstrap, args=(index,), name=f"worker-{index}")
+        process.start()
+        self.processes[index] = process
+        self.reports.pop(index, None)
+        logger.info("Worker %d iniciado (pid %d).", index, process.pid)
+
+    def _drain_reports(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                report = self.health.get(timeout=remaining)
+            except queue.Empty:
+                return
+            report["received_at"] = time.monotonic()
+            self.reports[report["worker"]] = report
+
+    def log_health(self) -> None:
+        """Registra o último relatório de cada worker e avisa sobre os que pararam de reportar."""
+        now = time.monotonic()
+        for index, process in sorted(self.processes.items()):
+            report = self.reports.get(index)
+            if report is None:
+                logger.info("Worker %d (pid %d): aguardando o primeiro relatório.", index, process.pid)
+                continue
+            age = now - report["received_at"]
+            level = logging.WARNING if age > 3 * self.health_interval else logging.INFO
+            logger.log(
+                level,
+                "Worker %d (pid %d): %d requisições, %d em andamento, %d erros, RSS %d MB, "
+                "consultas na fila %d, LLM na fila %d, %d execuções coalescidas, último relatório há %.0fs.",
+                index, report["pid"], report["requests_total"], report["in_flight"], report["errors_total"],
+                report["rss_bytes"] // 1024 ** 2, report["queries_waiting"], report["llm_queue_depth"],
+                report.get("coalesced_total", 0), age,
+            )
+
+    def stats(self) -> dict:
+        """Totais somados dos últimos relatórios dos workers."""
+        keys = ("requests_total", "errors_total", "in_flight", "rss_bytes", "coalesced_total")
+        totals = {key: sum(report.get(key, 0) for report in self.reports.values()) for key in keys}
+        return {"workers": len(self.processes), "restarts": self.restarts, **totals}
+
+    def _respawn_dead(self) -> None:
+        for index, process in list(self.processes.items()):
+            if not process.is_alive() and not self._stopping.is_set():
+                logger.error("Worker %d (pid %d) terminou com código %s; reiniciando.", index, process.pid, process.exitcode)
+                self.restarts += 1
+                self._start(index)
+
+    def stop(self, *_) -> None:
+        """Pede o encerramento (chamado pelos handlers de SIGTERM/SIGINT)."""
+        if not self._stopping.is_set():
+            logger.info("Encerramento solicitado; parando os workers um de cada vez.")
+        self._stopping.set()
+
+    def _rolling_shutdown(self) -> None:
+        for index, process in sorted(self.processes.items()):
+            if not process.is_alive():
+                continue
+            logger.info("Encerrando worker %d (pid %d)...", index, process.pid)
+            process.terminate()
+            process.join(self.stop_timeout)
+            if process.is_alive():
+                logger.warning("Worker %d não encerrou em %.0fs; forçando.", index, self.stop_timeout)
+                process.kill()
+                process.join()
+            logger.info("Worker %d encerrado (código %s).", index, process.exitcode)
+
+    def run(self) -> None:
+        """Inicia os workers e os supervisiona até o SIGTERM/SIGINT."""
+        previous = {sig: signal.signal(sig, self.stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for index in range(self.count):
+                self._start(index)
+            next_log = time.monotonic() + self.health_interval
+            while not self._stopping.is_set():
+                self._drain_reports(min(1.0, self.health_interval))
+                self._respawn_dead()
+                if time.monotonic() >= next_log:
+                    self.log_health()
+                    next_log = time.monotonic() + self.health_interval
+            self._rolling_shutdown()
+            logger.info("Todos os workers encerrados: %s", self.stats())
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+
+def run_workers(
+    count: int,
+    target: Callable[[int, multiprocessing.Queue], None],
+    health_interval: float = DEFAULT_HEALTH_INTERVAL,
+    stop_timeout: float = 30.0,
+) -> None:
+    """Executa ``target`` em ``count`` processos até o encerramento do supervisor."""
+    WorkerSupervisor(count, target, health_interval=health_interval, stop_timeout=stop_timeout).run()
+
+
+def report_health(health: Optional[multiprocessing.Queue], worker: int, stats: dict) -> None:
+    """Envia o relatório de saúde do worker ao supervisor (descarta se a fila estiver cheia)."""
+    if health is None:
+        return
+    try:
+        health.put_nowait({"worker": worker, **stats})
+    except queue.Full:
+        pass
@@ -0,0 +1,9 @@
+# conftest.py
+"""Configuração dos testes: os módulos de src/chat e src/bench são importados pelo nome, como no servidor."""
+
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC_DIR / "bench"))
+sys.path.insert(0, str(SRC_DIR / "chat"))
@@ -0,0 +1,158 @@
+# test_checkpointer.py
+"""A retenção dos checkpointers depende de detalhes internos do LangGraph; estes testes os fixam."""
+
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+import checkpointer
+from checkpointer import BoundedMemorySaver, open_checkpointer, prune_sqlite_checkpoints
+
+
+class State(TypedDict):
+    messages: Annotated[list, operator.add]
+
+
+def build_graph(saver):
+    graph = StateGraph(State)
+    graph.add_node("reply", lambda state: {"messages": [f"resposta {len(state['messages'])}"]})
+    graph.add_edge(START, "reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=saver)
+
+
+def config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def ask(graph, thread_id: str, turns: int) -> None:
+    for turn in range(turns):
+        graph.invoke({"messages": [f"pergunta {turn}"]}, config(thread_id))
+
+
+def blob_threads(saver) -> set:
+    return {key[0] for key in saver.blobs}
+
+
+def test_trims_each_thread_and_keeps_the_state_readable():
+    saver = BoundedMemorySaver(max_checkpoints_per_thread=3)
+    graph = build_graph(saver)
+    ask(graph, "a", 5)
+
+    assert len(list(saver.list(config("a")))) == 3
+    assert saver.stats()["pruned_checkpoints"] > 0
+    state = graph.get_state(config("a"))
+    assert len(state.values["messages"]) == 10
+    assert state.values["messages"][-1] == "resposta 9"
+    # Os checkpoints que sobraram ainda encontram os valores de canal que referenciam.
+    history = list(graph.get_state_history(config("a")))
+    assert len(history) == 3
+    assert all("messages" in snapshot.values for snapshot in history)
+
+    ask(graph, "a", 1)
+    assert graph.get_state(config("a")).values["messages"][-1] == "resposta 11"
+
+
+def test_trim_drops_unreferenced_blobs():
+    saver = BoundedMemorySaver(max_checkpoints_per_thread=2)
+    graph = build_graph(saver)
+    ask(graph, "a", 20)
+    unbounded = BoundedMemorySaver(max_checkpoints_per_thread=1000)
+    ask(build_graph(unbounded), "a", 20)
+    assert len(saver.blobs) < len(unbounded.blobs)
+
+
+def test_evicts_least_recently_used_threads():
+    saver = BoundedMemorySaver(max_threads=2)
+    graph = build_graph(saver)
+    ask(graph, "a", 1)
+    ask(graph, "b", 1)
+    ask(graph, "a", 1)
+    ask(graph, "c", 1)
+
+    assert saver.get_tuple(config("b")) is None
+    assert "b" not in blob_threads(saver)
+    assert saver.stats()["threads"] == 2
+    assert saver.stats()["evicted_threads"] == 1
+    assert len(graph.get_state(config("a")).values["messages"]) == 4
+    # Uma thread descartada recomeça do zero.
+    ask(graph, "b", 1)
+    assert graph.get_state(config("b")).values["messages"] == ["pergunta 0", "resposta 1"]
+
+
+def test_evicts_idle_threads(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(checkpointer.time, "monotonic", lambda: now[0])
+    saver = BoundedMemorySaver(idle_seconds=60)
+    graph = build_graph(saver)
+    ask(graph, "a", 1)
+    now[0] += 30
+    ask(graph, "b", 1)
+    now[0] += 45
+    ask(graph, "c", 1)
+
+    assert saver.get_tuple(config("a")) is None
+    assert "a" not in blob_threads(saver)
+    assert saver.get_tuple(config("b")) is not None
+    assert saver.stats()["threads"] == 2
+
+
+def test_delete_thread():
+    saver = BoundedMemorySaver()
+    graph = build_graph(saver)
+    ask(graph, "a", 2)
+    saver.delete_thread("a")
+    assert saver.get_tuple(config("a")) is None
+    assert saver.stats()["checkpoints"] == 0
+    assert saver.stats()["blobs"] == 0
+
+
+def test_prune_sqlite_checkpoints(tmp_path):
+    async def scenario():
+        async with open_checkpointer("sqlite", str(tmp_path / "checkpoints.sqlite")) as saver:
+            graph = build_graph(saver)
+            for thread_id in ("a", "b", "c"):
+                for turn in range(3):
+                    await graph.ainvoke({"messages": [f"pergunta {turn}"]}, config(thread_id))
+            # Escrita pendente de um checkpoint que a retenção vai remover.
+            oldest = [c async for c in saver.alist(config("a"))][-1]
+            await saver.aput_writes(oldest.config, [("messages", ["pendente"])], "tarefa")
+
+            removed = await prune_sqlite_checkpoints(saver, max_threads=2, max_checkpoints_per_thread=2)
+
+            async def count(sql):
+                async with saver.conn.execute(sql) as cursor:
+                    return (await cursor.fetchone())[0]
+
+            threads = await count("SELECT COUNT(DISTINCT thread_id) FROM checkpoints")
+            checkpoints = await count("SELECT COUNT(*) FROM checkpoints")
+            orphans = await count(
+                "SELECT COUNT(*) FROM writes w WHERE NOT EXISTS (SELECT 1 FROM checkpoints c "
+                "WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns "
+                "AND c.checkpoint_id = w.checkpoint_id)"
+            )
+            state = await graph.aget_state(config("c"))
+            evicted = await saver.aget_tuple(config("a"))
+            again = await prune_sqlite_checkpoints(saver, max_threads=2, max_checkpoints_per_thread=2)
+            return removed, threads, checkpoints, orphans, state, evicted, again
+
+    removed, threads, checkpoints, orphans, state, evicted, again = asyncio.run(scenario())
+    # Cada turno grava 3 checkpoints (entrada, início e passo): 3 threads x 9, sobram 2 threads x 2.
+    assert (threads, checkpoints) == (2, 4)
+    assert removed == 27 - 4
+    assert orphans == 0
+    assert evicted is None
+    assert state.values["messages"][-1] == "resposta 5"
+    assert again == 0
+
+
+def test_unknown_mode():
+    async def scenario():
+        async with open_checkpointer("redis"):
+            pass
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
@@ -0,0 +1,57 @@
+# test_cost_gate.py
+"""Decisões do controle de custo a partir das estimativas do plano."""
+
+import duckdb
+import pytest
+
+import cost_gate
+
+TABLE_ROWS = 200_000
+
+
+@pytest.fixture(scope="module")
+def conn():
+    conn = duckdb.connect()
+    conn.execute(
+        f"""
+        CREATE TABLE resultados_consulta AS
+        SELECT lpad((i * 7919 % 1000003)::VARCHAR, 8, '0') AS CNPJ_BASICO, (i % 27)::VARCHAR AS UF
+        FROM range({TABLE_ROWS}) r(i)
+        """
+    )
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def gate():
+    return cost_gate.CostGate(limit_rows=10_000, approx_rows=TABLE_ROWS // 2, refuse_rows=10 * TABLE_ROWS)
+
+
+def test_scanned_rows_use_filtered_estimate(conn):
+    full = cost_gate.explain(conn, "SELECT COUNT(DISTINCT CNPJ_BASICO) FROM resultados_consulta")
+    point = cost_gate.explain(
+        conn, "SELECT COUNT(DISTINCT CNPJ_BASICO) FROM resultados_consulta WHERE CNPJ_BASICO = '00012345'"
+    )
+    assert full.scanned_rows == TABLE_ROWS
+    assert point.scanned_rows < 100
+
+
+def test_point_lookup_count_distinct_stays_exact(conn, gate):
+    sql = "SELECT COUNT(DISTINCT CNPJ_BASICO) FROM resultados_consulta WHERE CNPJ_BASICO = '00012345'"
+    decision = gate.check(conn, sql)
+    assert decision.action == cost_gate.OK
+    assert decision.sql == sql
+
+
+def test_full_scan_count_distinct_is_approximated(conn, gate):
+    decision = gate.check(conn, "SELECT COUNT(DISTINCT CNPJ_BASICO) FROM resultados_consulta")
+    assert decision.action == cost_gate.APPROXIMATE
+    assert "approx_count_distinct" in decision.sql.lower()
+    assert conn.execute(decision.sql).fetchone()[0] > 0
+
+
+def test_plan_above_refuse_rows_is_refused(conn):
+    gate = cost_gate.CostGate(refuse_rows=TABLE_ROWS // 2)
+    with pytest.raises(cost_gate.QueryRefusedError):
+        gate.check(conn, "SELECT * FROM resultados_consulta")
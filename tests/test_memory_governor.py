@@ -0,0 +1,69 @@
+# test_memory_governor.py
+"""A admissão considera a memória de trabalho medida no DuckDB, não só as fatias reservadas."""
+
+import asyncio
+
+import duckdb
+import pytest
+
+from memory_governor import MemoryGovernor, MemoryPressureError
+
+MB = 1024 ** 2
+
+
+@pytest.fixture
+def governor(tmp_path):
+    # Orçamento grande para que o RSS do processo de testes não interfira.
+    return MemoryGovernor(
+        budget_bytes=64 * 1024 * MB, duckdb_fraction=0.5, max_concurrent_queries=4,
+        temp_directory=str(tmp_path / "spill"),
+    )
+
+
+def test_duckdb_bytes_ignores_the_block_cache(tmp_path):
+    path = str(tmp_path / "dados.duckdb")
+    with duckdb.connect(path) as conn:
+        conn.execute("CREATE TABLE t AS SELECT range AS i, random() AS r FROM range(2000000)")
+    with duckdb.connect(path) as conn:
+        conn.execute("SELECT SUM(r) FROM t").fetchone()
+        cached = conn.execute(
+            "SELECT memory_usage_bytes FROM duckdb_memory() WHERE tag = 'BASE_TABLE'"
+        ).fetchone()[0]
+        assert cached > 0
+        assert MemoryGovernor.duckdb_bytes(conn) < cached
+
+        conn.execute("CREATE TEMP TABLE grande AS SELECT range AS i FROM range(5000000)")
+        assert MemoryGovernor.duckdb_bytes(conn) > 10 * MB
+
+
+def test_admission_waits_while_duckdb_reports_no_room(governor):
+    async def scenario():
+        async with governor.admit():
+            # Outra consulta em andamento usa quase todo o memory_limit.
+            governor._duckdb_bytes = governor.duckdb_limit_bytes - governor.query_slice_bytes // 2
+            with pytest.raises(MemoryPressureError):
+                async with governor.admit(timeout=0.05):
+                    pass
+            governor._duckdb_bytes = 0
+            async with governor.admit(timeout=0.05):
+                assert governor.stats()["running"] == 2
+
+    asyncio.run(scenario())
+    assert governor.stats()["rejected_total"] == 1
+
+
+def test_admits_the_first_query_regardless_of_the_measurement(governor):
+    governor._duckdb_bytes = 10 * governor.duckdb_limit_bytes
+
+    async def scenario():
+        async with governor.admit(timeout=0.05):
+            return governor.stats()["running"]
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_configure_samples_duckdb(governor):
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE t AS SELECT range AS i FROM range(5000000)")
+    governor.configure(conn)
+    assert governor.stats()["duckdb_bytes"] == MemoryGovernor.duckdb_bytes(conn) > 0
@@ -0,0 +1,64 @@
+# test_name_index.py
+"""A reescrita pelo índice de trigramas não pode mudar o resultado das consultas."""
+
+import duckdb
+import pytest
+
+from name_index import NameIndex, build_name_index
+
+SURNAMES = ["SILVA", "SOUZA", "OLIVEIRA", "SANTOS", "PEREIRA", "LIMA"]
+
+QUERIES = [
+    "SELECT COUNT(*) FROM resultados_consulta WHERE NOME_SOCIO LIKE '%SILVA%'",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE UF = 'SP' AND NOME_SOCIO LIKE '%SILVA%'",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE UF = 'SP' AND (RAZAO_SOCIAL LIKE '%COMERCIO%' AND NOME_SOCIO LIKE '%OLIVEIRA%')",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE NOT (NOME_SOCIO LIKE '%SILVA%')",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE NOME_SOCIO LIKE '%SILVA%' OR UF = 'RJ'",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE UF = 'SP' AND (NOME_SOCIO LIKE '%SOUZA%' OR RAZAO_SOCIAL LIKE '%COMERCIO%')",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE CASE WHEN NOME_SOCIO LIKE '%SANTOS%' THEN FALSE ELSE TRUE END",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE (CASE WHEN RAZAO_SOCIAL LIKE '%COMERCIO%' THEN 1 ELSE 0 END) = 0",
+    "SELECT COUNT(*) FROM resultados_consulta WHERE NOT (UF = 'SP' AND NOME_SOCIO LIKE '%PEREIRA%')",
+]
+
+
+@pytest.fixture(scope="module")
+def conn():
+    conn = duckdb.connect()
+    conn.execute(
+        f"""
+        CREATE TABLE resultados_consulta AS
+        SELECT
+            lpad(i::VARCHAR, 8, '0') AS CNPJ_BASICO,
+            CASE i % 3 WHEN 0 THEN 'COMERCIO ' WHEN 1 THEN 'INDUSTRIA ' ELSE 'SERVICOS ' END
+                || {SURNAMES}[i % 6 + 1] || ' LTDA' AS RAZAO_SOCIAL,
+            NULL::VARCHAR AS NOME_FANTASIA,
+            'JOSE ' || {SURNAMES}[i % 5 + 1] AS NOME_SOCIO,
+            CASE WHEN i % 4 = 0 THEN 'SP' WHEN i % 4 = 1 THEN 'RJ' ELSE 'MG' END AS UF
+        FROM range(3000) r(i)
+        """
+    )
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def index(conn, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("name_index"))
+    build_name_index(conn, directory, version="teste")
+    return NameIndex(directory, max_candidates=10_000)
+
+
+@pytest.mark.parametrize("sql", QUERIES)
+def test_rewrite_keeps_results(conn, index, sql):
+    rewritten = index.rewrite_query(conn, sql) or sql
+    assert conn.execute(rewritten).fetchall() == conn.execute(sql).fetchall()
+
+
+def test_top_level_conjuncts_are_rewritten(conn, index):
+    assert index.rewrite_query(conn, QUERIES[1]) is not None
+    assert index.rewrite_query(conn, QUERIES[2]).count("CNPJ_BASICO IN") == 2
+
+
+@pytest.mark.parametrize("sql", QUERIES[3:])
+def test_like_under_not_or_case_is_left_alone(conn, index, sql):
+    assert index.rewrite_query(conn, sql) is None
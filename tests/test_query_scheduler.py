@@ -0,0 +1,27 @@
+# test_query_scheduler.py
+"""Dimensionamento das threads do DuckDB pelo escalonador."""
+
+import duckdb
+
+from query_scheduler import HEAVY, POINT, QueryScheduler, classify_query
+
+
+def test_single_heavy_scan_gets_whole_budget():
+    scheduler = QueryScheduler(max_running=4, cpu_budget=4)
+    assert scheduler.duckdb_threads == 4
+
+
+def test_budget_is_shared_between_processes():
+    assert QueryScheduler(max_running=4, cpu_budget=16, processes=4).duckdb_threads == 4
+    assert QueryScheduler(max_running=4, cpu_budget=2, processes=4).duckdb_threads == 1
+
+
+def test_configure_sets_instance_threads():
+    conn = duckdb.connect()
+    QueryScheduler(max_running=4, cpu_budget=3).configure(conn)
+    assert conn.execute("SELECT current_setting('threads')").fetchone()[0] == 3
+
+
+def test_classify_query():
+    assert classify_query("SELECT * FROM resultados_consulta WHERE CNPJ_BASICO = '12345678'") == POINT
+    assert classify_query("SELECT UF, COUNT(*) FROM resultados_consulta GROUP BY UF") == HEAVY
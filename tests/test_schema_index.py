@@ -0,0 +1,103 @@
+# test_schema_index.py
+"""O esquema reduzido precisa manter todas as colunas de que a pergunta depende."""
+
+import re
+
+import duckdb
+import pytest
+
+from schema_index import CORE_COLUMNS, SchemaIndex, load_code_descriptions
+from server import extract_metadata_from_pdf
+
+METADATA = extract_metadata_from_pdf("")
+COLUMNS = [
+    (match.group(1), match.group(2) or "VARCHAR")
+    for match in re.finditer(r"^- (\w+)(?: \((\w+)\))?", METADATA, re.MULTILINE)
+    if match.group(1).isupper()
+]
+DESCRIPTIONS = {
+    "CNAE_FISCAL_PRINCIPAL": [
+        "Desenvolvimento de programas de computador sob encomenda",
+        "Restaurantes e similares",
+        "Comércio varejista de mercadorias em geral",
+    ],
+    "NATUREZA_JURIDICA": ["Empresário (Individual)", "Sociedade Empresária Limitada", "Cooperativa"],
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SchemaIndex(COLUMNS, METADATA, descriptions=DESCRIPTIONS)
+
+
+def test_columns_come_from_metadata():
+    names = [name for name, _ in COLUMNS]
+    assert len(names) == 47
+    assert dict(COLUMNS)["DATA_INICIO_ATIVIDADE"] == "DATE"
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        (
+            "Quantas empresas de desenvolvimento de software existem em SP?",
+            {"CNAE_FISCAL_PRINCIPAL"},
+        ),
+        (
+            "Quantos restaurantes foram abertos em 2023 em SP?",
+            {"CNAE_FISCAL_PRINCIPAL", "DATA_INICIO_ATIVIDADE"},
+        ),
+        ("Quantos MEIs existem no RJ?", {"NATUREZA_JURIDICA", "PORTE_EMPRESA"}),
+        ("Quantas empresas optantes pelo Simples há em MG?", {"PORTE_EMPRESA"}),
+        ("Quantas empresas ativas existem em SP?", {"SITUACAO_CADASTRAL"}),
+        ("Qual a distribuição das empresas de Minas Gerais por porte?", {"PORTE_EMPRESA"}),
+    ],
+)
+def test_keeps_the_columns_the_question_needs(index, question, expected):
+    assert index.relevant_columns(question) == [
+        name for name, _ in COLUMNS if name in expected | set(CORE_COLUMNS)
+    ]
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        # "Farmácias" não corresponde a nenhuma coluna nem descrição conhecida.
+        "Quantas farmácias existem em SP?",
+        # Valores citados (aqui, parte do nome) também não são colunas.
+        "Quais empresas de SP têm BRASIL no nome?",
+        # O ano sozinho não diz qual coluna de data filtrar.
+        "Quantas empresas de SP em 2023?",
+        "Quantas empresas existem?",
+    ],
+)
+def test_falls_back_to_the_full_schema(index, question):
+    assert index.relevant_columns(question) is None
+    schema, metadata = index.prune(question, "completo", METADATA)
+    assert (schema, metadata) == ("completo", METADATA)
+
+
+def test_without_descriptions_activity_questions_use_the_full_schema():
+    index = SchemaIndex(COLUMNS, METADATA)
+    assert index.relevant_columns("Quantas empresas de desenvolvimento de software existem em SP?") is None
+
+
+def test_prune_sends_only_the_selected_columns(index):
+    schema, metadata = index.prune("Quantos restaurantes foram abertos em 2023 em SP?", "completo", METADATA)
+    assert " - CNAE_FISCAL_PRINCIPAL (VARCHAR)" in schema
+    assert " - DATA_INICIO_ATIVIDADE (DATE)" in schema
+    assert "NOME_SOCIO" not in schema
+    assert "- DATA_INICIO_ATIVIDADE (DATE)" in metadata
+
+
+def test_load_code_descriptions(tmp_path):
+    conn = duckdb.connect()
+    (tmp_path / "parquet_cnaes").mkdir()
+    conn.execute(
+        "COPY (SELECT '5611201' AS CODIGO_CNAE, 'Restaurantes e similares' AS DESCRICAO_CNAE) "
+        f"TO '{tmp_path}/parquet_cnaes/cnaes.parquet' (FORMAT PARQUET)"
+    )
+    descriptions = load_code_descriptions(conn, str(tmp_path))
+    assert descriptions == {"CNAE_FISCAL_PRINCIPAL": ["Restaurantes e similares"]}
+    index = SchemaIndex(COLUMNS, METADATA, descriptions=descriptions)
+    assert "CNAE_FISCAL_PRINCIPAL" in index.relevant_columns("Quantas lanchonetes e similares em SP?")
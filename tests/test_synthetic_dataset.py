@@ -0,0 +1,38 @@
+# test_synthetic_dataset.py
+"""As linhas malformadas do dump sintético são exatamente as que o conversor descarta."""
+
+import io
+
+import pandas as pd
+
+from synthetic_dataset import (
+    EMPRESA_FIELDS, ESTABELECIMENTO_FIELDS, SOCIO_FIELDS, Generator, LineCounter, basico_for,
+)
+
+
+def read_like_converter(text: str, fields: int) -> pd.DataFrame:
+    # Mesmas opções do log_and_parse em src/download_empresa/convert_toparquet.py.
+    return pd.read_csv(
+        io.StringIO(text), sep=";", names=[f"C{i}" for i in range(fields)], dtype=str, on_bad_lines="skip"
+    )
+
+
+def test_malformed_lines_are_the_ones_the_converter_skips():
+    generator = Generator(seed=7, malformed_rate=0.05)
+    files = [io.StringIO(), io.StringIO(), io.StringIO()]
+    writers = [LineCounter(f) for f in files]
+    for index in range(3000):
+        generator.company(basico_for(index), *writers)
+    assert generator.malformed > 100
+
+    empresas, estabelecimentos, socios = (
+        read_like_converter(f.getvalue(), fields)
+        for f, fields in zip(files, (EMPRESA_FIELDS, ESTABELECIMENTO_FIELDS, SOCIO_FIELDS))
+    )
+    written = sum(writer.lines for writer in writers)
+    assert len(empresas) + len(estabelecimentos) + len(socios) == written - generator.malformed
+
+    # As colunas-chave das linhas aceitas continuam íntegras.
+    assert empresas["C0"].str.fullmatch(r"\d{8}").all()
+    assert estabelecimentos["C1"].str.fullmatch(r"\d{4}").all()
+    assert socios["C1"].isin(["1", "2", "3"]).all()